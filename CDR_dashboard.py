@@ -6,11 +6,16 @@ from datetime import datetime
 import streamlit as st
 import numpy as np
 from streamlit_pagination import pagination_component
-import io
 import time
 import plotly.express as px
 import plotly.graph_objects as go
 import streamlit.components.v1 as components
+from cdr_data_store import ROWID_COLUMN, ContractsStore
+from cdr_export import EXPORT_FORMATS, start_export
+from cdr_facets import FacetIndex, option_label
+from cdr_pagination import ContractsPaginator
+from cdr_query import FILTER_COLUMNS, PAGE_SIZE, RANK_MAX_MATCHES, ContractsQuery
+from figure_cache import FigureCache
 # Page configuration
 # st.set_page_config(
 #     page_title="Contract Draft Request Tracker",
@@ -191,29 +196,98 @@ def navigation(reportdate):
     </html>
     """
     return navigation_component
-@st.cache_data(show_spinner=False)  # Disable default cache spinner since we'll use our own
+@st.cache_resource(show_spinner=False)
+def get_contracts_store():
+    """One columnar snapshot store per server process, shared by every session"""
+    return ContractsStore()
+
+@st.cache_resource(show_spinner=False)
+def get_contracts_query():
+    """Shared SQLite query backend for filtering, counting and paging"""
+    return ContractsQuery()
+
+@st.cache_resource(show_spinner=False)
+def get_contracts_paginator():
+    """Page cache with next-page prefetch, shared by every session"""
+    return ContractsPaginator(get_contracts_query())
+
+@st.cache_resource(show_spinner=False)
+def get_figure_cache():
+    """Built figures shared by every session"""
+    return FigureCache()
+
+def build_status_chart(status_counts, spec):
+    """Status bar chart for the popover; built only while the popover is open"""
+    fig = go.Figure(data=[
+        go.Bar(
+            x=status_counts.index,
+            y=status_counts.values,
+            text=status_counts.values,  # This will be displayed on top of bars
+            textposition='outside',     # Position the text above the bars
+            marker_color='rgb(143, 103, 230)',
+            opacity=0.8,
+            textfont=dict(size=12)
+        )
+    ])
+
+    # Update layout for better visibility
+    fig.update_layout(
+        title=spec['title'],
+        xaxis_title="Status",
+        yaxis_title="Number of Contracts",
+        height=500,  # Increased height for better visibility
+        width=1000,  # Increased width for better visibility
+        margin=dict(t=30, b=120, l=60, r=20),  # Increased bottom margin for rotated labels
+        xaxis=dict(
+            tickangle=-45,
+            tickfont=dict(size=10)
+        ),
+        yaxis=dict(
+            # Add gridlines for better readability
+            gridcolor='rgba(0,0,0,0.1)',
+            gridwidth=1
+        ),
+        showlegend=False,
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        # Add hover template
+        hovermode='x unified'
+    )
+
+    # Optional: Add custom hover template
+    fig.update_traces(
+        hovertemplate="<b>Status:</b> %{x}<br>" +
+                    "<b>Count:</b> %{y}<br>" +
+                    "<extra></extra>"  # This removes the trace name from hover
+    )
+    return fig
+
+def build_column_config(selected_columns):
+    """Grid column settings; replaces the per-cell pandas Styler"""
+    column_config = {
+        column: st.column_config.TextColumn(column, width="medium") for column in selected_columns
+    }
+    column_config["ID"] = st.column_config.TextColumn(
+        "CDR ID",
+        help="Contract Draft Request ID",
+        max_chars=50,
+        pinned=True
+    )
+    return column_config
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_facet_index(last_modified):
+    """Filter options and categorical codes, built once per data version"""
+    snapshot = get_contracts_store().snapshot(last_modified)
+    return FacetIndex.from_arrow(snapshot.table, FILTER_COLUMNS, ROWID_COLUMN, version=last_modified)
+
 def load_data(last_modified):
-    """Load data from SQLite database"""
+    """Column names and report date from the memory-mapped snapshot; rows are only read by query"""
     try:
-        # Get the absolute path to the database
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        db_path = os.path.join(current_dir, "data", "contracts.db")
-        
         with st.spinner("Loading data from database... Please wait"):
-            # Connect to SQLite database
-            conn = sqlite3.connect(db_path)
-            
-            # Load the main data table
-            df = pd.read_sql("SELECT * FROM contracts", conn)
-            
-            # Load the report date from metadata table
-            report_date_df = pd.read_sql("SELECT report_date FROM report_metadata", conn)
-            report_date = report_date_df['report_date'].iloc[0]
-            report_date = pd.to_datetime(report_date).strftime('%Y-%m-%d')
-
-            conn.close()
-            
-            return df, report_date
+            # Only rows changed since the last snapshot are read from SQLite
+            snapshot = get_contracts_store().snapshot(last_modified)
+            return snapshot.columns, snapshot.report_date
     except sqlite3.Error as e:
         st.error(f"Database error: {str(e)}")
         return None, None
@@ -221,62 +295,48 @@ def load_data(last_modified):
         st.error(f"Error loading data: {str(e)}")
         return None, None
     ## Export button
-@st.dialog("Download Excel File")
-def show_download_dialog(filtered_df, selected_columns):
-    with st.spinner("Preparing your Excel file..."):
-        try:
-            # Convert datetime back to datetime format for Excel
-            export_df = filtered_df[selected_columns].copy()
-            if 'Created On' in export_df.columns:
-                export_df['Created On'] = pd.to_datetime(export_df['Created On'])
-            
-            # Create Excel file in memory using BytesIO
-            buffer = io.BytesIO()
-            
-            with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-                export_df.to_excel(writer, index=False, sheet_name='Sheet1')
-                
-                # Access the XlsxWriter workbook and worksheet objects
-                workbook = writer.book
-                worksheet = writer.sheets['Sheet1']
-                
-                # Add a basic header format
-                header_format = workbook.add_format({
-                    'bold': True,
-                    'fg_color': '#D3D3D3',
-                    'border': 1
-                })
-                
-                # Set column widths based on header length
-                for idx, col in enumerate(export_df.columns):
-                    header_length = len(str(col))
-                    adjusted_width = header_length + 4
-                    adjusted_width = max(adjusted_width, 8)
-                    worksheet.set_column(idx, idx, adjusted_width)
-                    worksheet.write(0, idx, col, header_format)
-            
-            # Reset buffer position
-            buffer.seek(0)
-            
-            # Show success message in dialog
-            st.success("File is ready for download!")
-            
-            # Add download button to dialog
-            st.download_button(
-                label="⬇️ Click here to Download the Excel File",
-                data=buffer,
-                file_name="contract_tracker_export.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
-            
-            # Add close button
-            # if st.button("Close"):
-            #     st.rerun()
-            
-        except Exception as e:
-            st.error(f"Error exporting data: {str(e)}")
-            if st.button("Close"):
-                st.rerun()
+def filters_key(filters):
+    return tuple(sorted((column, tuple(values)) for column, values in filters.items() if values))
+
+@st.dialog("Download Export File")
+def show_download_dialog(filters, search_term, selected_columns, total_count):
+    export_format = st.radio("**File format:**", list(EXPORT_FORMATS), horizontal=True)
+    key = (filters_key(filters), search_term, tuple(selected_columns), export_format)
+
+    # The export runs on a background thread and survives reruns; only its progress is polled here
+    job = st.session_state.get('export_job')
+    if job is None or job.key != key:
+        if job is not None:
+            job.close()
+        with st.spinner("Starting export..."):
+            job = start_export(get_contracts_query(), filters, search_term, selected_columns,
+                               export_format, total_count, key=key)
+        st.session_state['export_job'] = job
+
+    progress_bar = st.progress(job.progress, text=f"Preparing your {export_format} file...")
+    while not job.done:
+        progress_bar.progress(job.progress, text=f"Written {job.rows_written:,} of {job.total_rows:,} rows...")
+        time.sleep(0.25)
+    progress_bar.empty()
+
+    if job.status == 'error':
+        st.error(f"Error exporting data: {job.error}")
+        st.session_state.pop('export_job', None)
+        if st.button("Close"):
+            st.rerun()
+        return
+
+    # Show success message in dialog
+    st.success("File is ready for download!")
+
+    # Add download button to dialog
+    job.file.seek(0)
+    st.download_button(
+        label=f"⬇️ Click here to Download the {export_format} File",
+        data=job.file,
+        file_name=job.file_name,
+        mime=job.mime
+    )
 def main():
 
     # Initialize loading state
@@ -286,6 +346,8 @@ def main():
         db_path = os.path.join(current_dir, "data", "contracts.db")
         
         try:
+            contracts_query = get_contracts_query()
+            contracts_query.ensure_indexes()  # Before reading the mtime, since adding indexes changes it
             last_modified = os.path.getmtime(db_path)
         except FileNotFoundError:
             st.error("Database file not found. Please check if the database exists in the data folder.")
@@ -295,9 +357,9 @@ def main():
             return
 
     # Load data
-    df, report_date = load_data(last_modified)
+    all_columns, report_date = load_data(last_modified)
     
-    if df is None:
+    if all_columns is None:
         st.error("Failed to load data. Please check the database connection.")
         return
 
@@ -327,25 +389,24 @@ def main():
     st.sidebar.header(":material/filter_list: Filters")
     #st.logo("images/Logo_WTW.png",icon_image="images/Logo_WTW.png",size="large")
     # Create filters for each specified column
-    filter_columns = ['Status', 'Agreement Type','WTW Business(s)','Requester Name', 'Legal Contact', 
-                      'COE Assessor']
-    
+    # Option lists and live counts come from the facet index; the widgets' current
+    # values are read from session state so the counts match this rerun's selections
+    facet_index = get_facet_index(last_modified)
+    facets = facet_index.counts(
+        {column: st.session_state.get(f"filter_{column}", []) for column in facet_index.columns},
+        st.session_state.get('search_term', ""),
+        contracts_query.search_rowids
+    )
     filters = {}
-    for column in filter_columns:
-        if column in df.columns:
-            unique_values = sorted(df[column].dropna().unique().tolist())
-            filters[column] = st.sidebar.multiselect(
-                f"**Select {column}:**",
-                options=unique_values,
-                default=[]
-            )
+    for column in facet_index.columns:
+        filters[column] = st.sidebar.multiselect(
+            f"**Select {column}:**",
+            options=facet_index.options[column],
+            format_func=option_label(facets['options'][column]),
+            default=[],
+            key=f"filter_{column}"
+        )
     
-    # Apply filters
-    filtered_df = df.copy()
-    for column, selected_values in filters.items():
-        if selected_values and column in filtered_df.columns:
-            filtered_df = filtered_df[filtered_df[column].isin(selected_values)]
-
     # Search functionality
     
     #st.markdown(":material/search: **Search by ID or Agreement Name**") # write the name of the icon 'Settings' next to the word Search (you can use any word you wish)
@@ -353,65 +414,24 @@ def main():
     #search_term = input(default_value="", type='text', placeholder="", key="input1")
     col3, col4 = st.columns([2, 2],vertical_alignment="center")
     #Search box    
-    search_term = col3.text_input(" :material/search:  **Search by Client Entity Name or Requester Name**:", "",placeholder="Search")
-    if search_term:
-            with st.spinner("Searching records..."):
-                mask = (
-                    filtered_df['Client Entity Name'].astype(str).str.contains(search_term, case=False) |
-                    filtered_df['Requester Name'].astype(str).str.contains(search_term, case=False)
-                )
-                filtered_df = filtered_df[mask]
-
-    status_counts = filtered_df['Status'].value_counts()
-    fig = go.Figure(data=[
-        go.Bar(
-            x=status_counts.index,
-            y=status_counts.values,
-            text=status_counts.values,  # This will be displayed on top of bars
-            textposition='outside',     # Position the text above the bars
-            marker_color='rgb(143, 103, 230)',
-            opacity=0.8,
-            textfont=dict(size=12)
-        )
-    ])
-
-    # Update layout for better visibility
-    fig.update_layout(
-        title="Contract Status Distribution",
-        xaxis_title="Status",
-        yaxis_title="Number of Contracts",
-        height=500,  # Increased height for better visibility
-        width=1000,  # Increased width for better visibility
-        margin=dict(t=30, b=120, l=60, r=20),  # Increased bottom margin for rotated labels
-        xaxis=dict(
-            tickangle=-45,
-            tickfont=dict(size=10)
-        ),
-        yaxis=dict(
-            # Add gridlines for better readability
-            gridcolor='rgba(0,0,0,0.1)',
-            gridwidth=1
-        ),
-        showlegend=False,
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(0,0,0,0)',
-        # Add hover template
-        hovermode='x unified'
-    )
-
-    # Optional: Add custom hover template
-    fig.update_traces(
-        hovertemplate="<b>Status:</b> %{x}<br>" +
-                    "<b>Count:</b> %{y}<br>" +
-                    "<extra></extra>"  # This removes the trace name from hover
-    )
-
-    
-    with col4.popover("Status Distribution",icon=":material/bar_chart:"):
-        #st.write("Click on a bar to filter the dataframe.")
-        #event_data = st.plotly_chart(fig, use_container_width=True, on_select="rerun", key="plotly_chart",selection_mode="points")
-        event_data = st.plotly_chart(fig, use_container_width=True)
-        #st.caption("*To clear the selection, click on the selected bar again*")
+    search_term = col3.text_input(" :material/search:  **Search by Client Entity Name, Requester Name or Agreement Name**:", "",placeholder="Search", key="search_term")
+
+    # Filters and search run in SQLite; only counts and the visible page come back
+    with st.spinner("Searching records..."):
+        total_count = contracts_query.count(filters, search_term)
+        status_counts = pd.Series(facets['applied'].get('Status', {}), dtype='int64')
+        status_counts = status_counts[status_counts > 0].sort_values(ascending=False)
+    # The chart is only built while the popover is open, and reused while the counts are unchanged
+    status_popover = col4.popover("Status Distribution", icon=":material/bar_chart:",
+                                  key="status_popover", on_change="rerun")
+    if status_popover.open:
+        with status_popover:
+            #st.write("Click on a bar to filter the dataframe.")
+            #event_data = st.plotly_chart(fig, use_container_width=True, on_select="rerun", key="plotly_chart",selection_mode="points")
+            fig = get_figure_cache().get('status_chart', status_counts, {'title': "Contract Status Distribution"},
+                                         build_status_chart)
+            event_data = get_figure_cache().show('status_chart', fig, st.plotly_chart, use_container_width=True)
+            #st.caption("*To clear the selection, click on the selected bar again*")
     
     
     # # Check for selection data
@@ -445,11 +465,10 @@ def main():
         'Legal Contact', 'WTW Business(s)'
     ]
     
-    # Ensure default columns exist in the dataframe
-    default_columns = [col for col in default_columns if col in df.columns]
+    # Ensure default columns exist in the table
+    default_columns = [col for col in default_columns if col in all_columns]
     
     # Column selector
-    all_columns = df.columns.tolist()
     selected_columns = st.multiselect(
         ":material/variable_add: **Select columns to display:**",
         options=all_columns,
@@ -463,52 +482,27 @@ def main():
         return st.session_state['foo']
     #st.session_state['foo']
     
-    n = 100
+    n = PAGE_SIZE
     
-    list_df = [filtered_df[i:i+n] for i in range(0,filtered_df.shape[0],n)] 
+    page_count = -(-total_count // n)  # Ceiling division
     
-    #st.write(f"Length of list_df: {len(list_df)}")
-    #reset page number selected if filtered_df is used 
-    if st.session_state['foo'] >= len(list_df):
+    #reset page number selected if the filters changed the page count
+    if st.session_state['foo'] >= page_count:
         st.session_state['foo'] = 0
     
-    if search_term and len(list_df)==0:
+    if search_term and page_count==0:
         st.warning("No search results found")
         return
     
-    data_l = list_df[data_chunk_choice()] 
+    # Only the visible page is read from the database
+    data_l = get_contracts_paginator().get_page(last_modified, filters, search_term, selected_columns,
+                                                data_chunk_choice(), page_count,
+                                                ranked=total_count <= RANK_MAX_MATCHES)
     # st.session_state['foo']
     pagecount =st.session_state['foo']
     # st.write(f"Length of list_df: {len(list_df)}")
     #st.write(f"Current page number: {pagecount}")
     
-    def style_dataframe(df):
-        # Define the CSS styles
-        styles = [
-            # Header style - darker gray (#404040) with black text
-            dict(selector="th", props=[
-                ("background-color", "#404040"),
-                ("color", "#000000"),
-                ("font-weight", "bold"),
-                ("padding", "15px")
-            ]),
-            # Row style
-            dict(selector="td", props=[
-                ("background-color", "white"),
-                ("padding", "15px")
-            ])
-        ]
-        
-        # Apply the styling
-        styled_df = df.style\
-            .set_table_styles(styles)\
-            .set_properties(**{
-                'background-color': 'white',
-                'color': 'black',
-            })
-        
-        return styled_df
-
     #Dataframe display
     if selected_columns:
         with st.spinner("Preparing data display..."):
@@ -519,17 +513,10 @@ def main():
             
 
                 
-            styled_df = style_dataframe(data_l[selected_columns])
+            # column_config styles the grid itself, so rendering cost stays with the page size
             st.dataframe(
-                styled_df,
-                column_config={
-                    "ID": st.column_config.TextColumn(
-                        "CDR ID",
-                        help="Contract Draft Request ID",
-                        max_chars=50,
-                        pinned=True
-                    )
-                },
+                data_l,
+                column_config=build_column_config(selected_columns),
                 use_container_width=True,
                 hide_index=True
             )
@@ -539,19 +526,19 @@ def main():
     col2, col1 = st.columns(2)
 
     #pagination
-    pagination_component(len(list_df)+1, layout=layout, key="foo")
+    pagination_component(page_count+1, layout=layout, key="foo")
 
     #page count and download excel button
     if pagecount == 0:
-        col2.caption(f"**Total records displayed**: {len(data_l)} of {len(filtered_df)}")
+        col2.caption(f"**Total records displayed**: {len(data_l)} of {total_count}")
     else:
-        if len(list_df)==pagecount:
-            FinalPageCount =   (len(filtered_df) - n*(pagecount-1)) + n*(pagecount-1)
-            col2.caption(f"Total records displayed: {FinalPageCount+1} of {len(filtered_df)}")
+        if page_count==pagecount:
+            FinalPageCount =   (total_count - n*(pagecount-1)) + n*(pagecount-1)
+            col2.caption(f"Total records displayed: {FinalPageCount+1} of {total_count}")
         else:
-            col2.caption(f"Total records displayed: {n*pagecount+1} of {len(filtered_df)}")
+            col2.caption(f"Total records displayed: {n*pagecount+1} of {total_count}")
     if col1.button(":material/download: Download Excel File"):
-            show_download_dialog(filtered_df, selected_columns)
+            show_download_dialog(filters, search_term, selected_columns, total_count)
             
 
 
@@ -1,10 +1,13 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
 import calendar
 import numpy as np
+from calendar_features import MONTH_ORDER
+from coe_cube import CoeCube, rollup, total
+from coe_data_store import get_coe_store
+from figure_cache import FigureCache
 
 # Page config
 st.set_page_config(layout="wide", page_title="Contract Management Dashboard")
@@ -56,33 +59,123 @@ st.markdown("""
     """, unsafe_allow_html=True)
 
 # Load data
-@st.cache_data
-def load_data():
-    # Change to read_excel instead of read_csv
-    df = pd.read_excel("for_coe_dashboard.xlsx")
-    
-    # Convert date column
-    df['Request Received Date'] = pd.to_datetime(df['Request Received Date'])
-    
-    # Replace blank or NaN values with a default value (e.g., empty string)
-   # df['Coordinator'] = df['Coordinator'].fillna('Unknown')
-    df['Contract Request'] = df['Contract Request'].fillna('Unknown')
-    df['Contract Type'] = df['Contract Type'].fillna('Unknown')
-    df['Region'] = df['Region'].fillna('Unknown')
-    df['Complexity'] = df['Complexity'].fillna('Unknown')
+# The snapshot is memory-mapped and already has typed dates, Unknown-filled categories and
+# Month/Year/MonthNum/Week; openpyxl only runs when the workbook's contents change.
+# Every metric and chart below is a roll-up of the cube built from it.
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_coe_cube(version):
+    """Request counts by day and filter dimension, built once per workbook version"""
+    return CoeCube(get_coe_store().snapshot(version).frame, version=version)
+
+snapshot = get_coe_store().snapshot()
+cube = get_coe_cube(snapshot.version)
+
+# Chart builders; each takes the aggregated input and a layout spec and returns a new figure.
+# Figures are cached on both, so a rerun with unchanged counts reuses the built figure.
+CHART_LAYOUT = {'plot_bgcolor': 'white', 'paper_bgcolor': 'white', 'margin': dict(t=40, l=20, r=20, b=20)}
+
+@st.cache_resource(show_spinner=False)
+def get_figure_cache():
+    """Built figures shared by every session"""
+    return FigureCache()
+
+def build_region_pie(counts, spec):
+    fig = px.pie(
+        counts,
+        names='Region',
+        values='Count',
+        hover_data=['Count'],
+        custom_data=['Count']
+    )
+    fig.update_traces(
+        hovertemplate="<b>Region:</b> %{label}<br>" +
+                     "<b>Count:</b> %{value}<br>" +
+                     "<b>Percentage:</b> %{percent}<extra></extra>"
+    )
+    fig.update_layout(**spec)
+    return fig
+
+def build_count_bar(counts, spec):
+    fig = px.bar(
+        counts,
+        labels={'value': 'Count', 'index': counts.index.name}
+    )
+    fig.update_layout(**spec)
+    return fig
+
+def build_weekly_heatmap(heatmap_data, spec):
+    # Create custom colorscale
+    colorscale = [
+        [0.0, '#ebedf0'],     # Light gray for zero values
+        [0.2, '#9be9a8'],     # Light green
+        [0.4, '#40c463'],     # Medium green
+        [0.6, '#30a14e'],     # Darker green
+        [1.0, '#216e39']      # Darkest green
+    ]
     
-    # Extract month and year from the date column
-    df['Month'] = df['Request Received Date'].dt.strftime('%b')  # Abbreviated month name (e.g., Jan, Feb)
-    df['Month'] = df['Month'].fillna('Unknown')  # Replace NaN values in the Month column
-    df['Year'] = df['Request Received Date'].dt.year  # Extract year
-    df['Year'] = df['Year'].fillna(0).astype(int)  # Replace NaN values with 0 and convert to integer
+    # Create text array for cell values
+    text_array = heatmap_data.values.astype(str)
+    text_array[heatmap_data.isna()] = ''  # Hide NaNs
+    text_array[heatmap_data.values == 0] = ''  # Hide zeros
     
-    # Rename 'In_COMET' to 'In COMET'
-    df = df.rename(columns={'In_COMET': 'In COMET'})
+    fig = go.Figure(data=go.Heatmap(
+        z=heatmap_data.values,
+        x=heatmap_data.columns,
+        y=heatmap_data.index,
+        colorscale=colorscale,
+        showscale=True,
+        text=text_array,
+        texttemplate="%{text}",
+        textfont={"size": 10},
+        hoverongaps=False,
+        hovertemplate='Week: %{x}<br>Month: %{y}<br>Count: %{z}<extra></extra>'
+    ))
     
-    return df
+    # Update layout
+    fig.update_layout(
+        title=dict(
+            text=spec['title'],
+            x=0.5,
+            y=0.95,
+            xanchor='center',
+            yanchor='top',
+            font=dict(size=16)
+        ),
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        margin=dict(t=80, l=50, r=50, b=20),
+        height=400,
+        xaxis=dict(
+            title='Week Number',
+            side='bottom',  # Move week labels to the bottom
+            tickmode='linear',
+            tickangle=0,
+            showgrid=False,
+            showline=False,
+        ),
+        yaxis=dict(
+            title='Month',
+            showgrid=False,
+            showline=False,
+            ticks='',
+            ticksuffix='  ',  # Add some padding
+        ),
+        coloraxis_colorbar=dict(
+            title='Count',
+            thicknessmode='pixels',
+            thickness=20,
+            lenmode='pixels',
+            len=300,
+            yanchor='top',
+            y=1,
+            ypad=0,
+            xpad=20
+        )
+    )
+    return fig
 
-df = load_data()
+figure_cache = get_figure_cache()
 
 # Sidebar filters with updated styling
 with st.sidebar:
@@ -95,78 +188,58 @@ with st.sidebar:
     # Date range filter
     date_range = st.date_input(
         "Request Received Date Range",
-        value=(df['Request Received Date'].min(), df['Request Received Date'].max()),
+        value=(cube.min_date, cube.max_date),
         key='date_range'
     )
     
     # Year filter
-    years = sorted(df[df['Year'] != 0]['Year'].unique(), reverse=True)  # Sort years in descending order, excluding 0
+    years = cube.options['Year']  # Sorted in descending order, excluding 0
     selected_years = st.multiselect("Year", years)
     
     # Month filter
-    # Sort months chronologically, handling 'Unknown' values
-    month_order = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-    months = sorted(df['Month'].unique(), key=lambda x: month_order.index(x) if x in month_order else len(month_order))
+    months = cube.options['Month']  # Sorted chronologically, with 'Unknown' last
     selected_months = st.multiselect("Month", months)
     
     # Other filters
-    contract_requests = sorted(df['Contract Request'].unique())
+    contract_requests = cube.options['Contract Request']
     selected_contract_request = st.multiselect("Contract Request", contract_requests)
     
-    contract_types = sorted(df['Contract Type'].unique())
+    contract_types = cube.options['Contract Type']
     selected_contract_type = st.multiselect("Contract Type", contract_types)
     
-    regions = sorted(df['Region'].unique())
+    regions = cube.options['Region']
     selected_region = st.multiselect("Region", regions)
     
-    complexity_levels = sorted(df['Complexity'].unique())
+    complexity_levels = cube.options['Complexity']
     selected_complexity = st.multiselect("Complexity", complexity_levels)
 
-# Apply filters
-filtered_df = df.copy()
-# if selected_coordinator:
-#     filtered_df = filtered_df[filtered_df['Coordinator'].isin(selected_coordinator)]
-if selected_contract_request:
-    filtered_df = filtered_df[filtered_df['Contract Request'].isin(selected_contract_request)]
-if selected_contract_type:
-    filtered_df = filtered_df[filtered_df['Contract Type'].isin(selected_contract_type)]
-if selected_region:
-    filtered_df = filtered_df[filtered_df['Region'].isin(selected_region)]
-if selected_complexity:
-    filtered_df = filtered_df[filtered_df['Complexity'].isin(selected_complexity)]
-if selected_months:
-    filtered_df = filtered_df[filtered_df['Month'].isin(selected_months)]
-if selected_years:
-    filtered_df = filtered_df[filtered_df['Year'].isin(selected_years)]
-
-# Apply date range filter
-if date_range and len(date_range) == 2:  # Ensure date_range has exactly two values
-    start_date, end_date = date_range
-    filtered_df = filtered_df[
-        (filtered_df['Request Received Date'] >= pd.to_datetime(start_date)) &
-        (filtered_df['Request Received Date'] <= pd.to_datetime(end_date))
-    ]
+# Apply filters to the cube; slices are cached per filter combination
+filtered_cells = cube.slice({
+    'Contract Request': selected_contract_request,
+    'Contract Type': selected_contract_type,
+    'Region': selected_region,
+    'Complexity': selected_complexity,
+    'Month': selected_months,
+    'Year': selected_years,
+}, date_range)
 
 # Top metrics in containers
 col1, col2, col3, col4 = st.columns(4)
 
 with col1:
-    total_requests = len(filtered_df)
+    total_requests = total(filtered_cells)
     st.metric("Request Received March - YTD", f"{total_requests:,}")
 
 with col2:
-    comet_coe = len(filtered_df[filtered_df['In COMET'] == 'Yes'])  # Updated column name
+    comet_coe = total(filtered_cells, **{'In COMET': 'Yes'})
     st.metric("COMET Contract Request with COE YTD", f"{comet_coe:,}")
 
 with col3:
-    contracts_uploaded = len(filtered_df[filtered_df['Contract Request'] == 'Contract Upload'])
+    contracts_uploaded = total(filtered_cells, **{'Contract Request': 'Contract Upload'})
     st.metric("Contracts Uploaded In_COMET YTD", f"{contracts_uploaded:,}")
 
 with col4:
-    coe_uploads = len(filtered_df[
-        (filtered_df['Contract Request'] == 'Contract Upload') & 
-        (filtered_df['In COMET'] == 'Yes')  # Updated column name
-    ])
+    coe_uploads = total(filtered_cells, **{'Contract Request': 'Contract Upload', 'In COMET': 'Yes'})
     st.metric("Contracts In_COMET uploaded by COE YTD", f"{coe_uploads:,}")
 
 # Visualizations in containers
@@ -175,55 +248,21 @@ col1, col2 = st.columns(2)
 with col1:
     pie_chart1_container = st.container(border=True)
     with pie_chart1_container:
-        region_counts = filtered_df['Region'].value_counts().reset_index()
+        region_counts = rollup(filtered_cells, 'Region').reset_index()
         region_counts.columns = ['Region', 'Count']
-        
-        fig_region = px.pie(
-            region_counts,
-            names='Region',
-            values='Count',
-            title='Contract Reviews by Region',
-            hover_data=['Count'],
-            custom_data=['Count']
-        )
-        fig_region.update_traces(
-            hovertemplate="<b>Region:</b> %{label}<br>" +
-                         "<b>Count:</b> %{value}<br>" +
-                         "<b>Percentage:</b> %{percent}<extra></extra>"
-        )
-        fig_region.update_layout(
-            plot_bgcolor='white',
-            paper_bgcolor='white',
-            margin=dict(t=40, l=20, r=20, b=20)
-        )
-        st.plotly_chart(fig_region, use_container_width=True)
+        fig_region = figure_cache.get('region_pie', region_counts,
+                                      {**CHART_LAYOUT, 'title': 'Contract Reviews by Region'}, build_region_pie)
+        figure_cache.show('region_pie', fig_region, st.plotly_chart, use_container_width=True)
 
 with col2:
     pie_chart2_container = st.container(border=True)
     with pie_chart2_container:
-        uploads_by_region = filtered_df[filtered_df['Contract Request'] == 'Contract Upload']
-        region_upload_counts = uploads_by_region['Region'].value_counts().reset_index()
+        uploads_by_region = filtered_cells[filtered_cells['Contract Request'] == 'Contract Upload']
+        region_upload_counts = rollup(uploads_by_region, 'Region').reset_index()
         region_upload_counts.columns = ['Region', 'Count']
-        
-        fig_uploads = px.pie(
-            region_upload_counts,
-            names='Region',
-            values='Count',
-            title='Contract Uploads by Region',
-            hover_data=['Count'],
-            custom_data=['Count']
-        )
-        fig_uploads.update_traces(
-            hovertemplate="<b>Region:</b> %{label}<br>" +
-                         "<b>Count:</b> %{value}<br>" +
-                         "<b>Percentage:</b> %{percent}<extra></extra>"
-        )
-        fig_uploads.update_layout(
-            plot_bgcolor='white',
-            paper_bgcolor='white',
-            margin=dict(t=40, l=20, r=20, b=20)
-        )
-        st.plotly_chart(fig_uploads, use_container_width=True)
+        fig_uploads = figure_cache.get('uploads_pie', region_upload_counts,
+                                       {**CHART_LAYOUT, 'title': 'Contract Uploads by Region'}, build_region_pie)
+        figure_cache.show('uploads_pie', fig_uploads, st.plotly_chart, use_container_width=True)
 
 # Bar charts - each in separate container
 col1, col2 = st.columns(2)
@@ -232,48 +271,27 @@ with col1:
     bar_chart1_container = st.container(border=True)
     with bar_chart1_container:
         # Use 'Contract Request' instead of 'Contract Type'
-        request_types = filtered_df['Contract Request'].value_counts()
-        fig_types = px.bar(
-            request_types,
-            title='Types of Requests',
-            labels={'value': 'Count', 'index': 'Contract Request'}  # Update label
-        )
-        fig_types.update_layout(
-            plot_bgcolor='white',
-            paper_bgcolor='white',
-            margin=dict(t=40, l=20, r=20, b=20)
-        )
-        st.plotly_chart(fig_types, use_container_width=True)
+        request_types = rollup(filtered_cells, 'Contract Request')
+        fig_types = figure_cache.get('request_types_bar', request_types,
+                                     {**CHART_LAYOUT, 'title': 'Types of Requests'}, build_count_bar)
+        figure_cache.show('request_types_bar', fig_types, st.plotly_chart, use_container_width=True)
 
 with col2:
     bar_chart2_container = st.container(border=True)
     with bar_chart2_container:
-        complexity_counts = filtered_df['Complexity'].value_counts()
-        fig_complexity = px.bar(
-            complexity_counts,
-            title='Requests by Complexity',
-            labels={'value': 'Count', 'index': 'Complexity'}
-        )
-        fig_complexity.update_layout(
-            plot_bgcolor='white',
-            paper_bgcolor='white',
-            margin=dict(t=40, l=20, r=20, b=20)
-        )
-        st.plotly_chart(fig_complexity, use_container_width=True)
+        complexity_counts = rollup(filtered_cells, 'Complexity')
+        fig_complexity = figure_cache.get('complexity_bar', complexity_counts,
+                                          {**CHART_LAYOUT, 'title': 'Requests by Complexity'}, build_count_bar)
+        figure_cache.show('complexity_bar', fig_complexity, st.plotly_chart, use_container_width=True)
 
 # Heatmap in its own container
 heatmap_container = st.container(border=True)
 with heatmap_container:
-    # Create date-related columns and week number
-    filtered_df['Week'] = pd.to_datetime(filtered_df['Request Received Date']).dt.isocalendar().week
-    filtered_df['Month'] = pd.to_datetime(filtered_df['Request Received Date']).dt.strftime('%b')
-    filtered_df['MonthNum'] = pd.to_datetime(filtered_df['Request Received Date']).dt.month
+    # Week, Month and MonthNum are carried by each cube cell; cells without a date have no week
+    dated_cells = filtered_cells[filtered_cells['Week'] != 0]
     
     # Aggregate counts by month and week
-    weekly_counts = filtered_df.groupby(['Month', 'MonthNum', 'Week']).size().reset_index(name='count')
-    
-    # Sort months in correct order
-    month_order = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+    weekly_counts = rollup(dated_cells, ['Month', 'MonthNum', 'Week']).reset_index(name='count')
     
     # Create pivot table for heatmap
     heatmap_data = weekly_counts.pivot_table(
@@ -284,75 +302,13 @@ with heatmap_container:
     )
     
     # Reorder months
-    heatmap_data = heatmap_data.reindex(month_order)
-    
-    # Create custom colorscale
-    colorscale = [
-        [0.0, '#ebedf0'],     # Light gray for zero values
-        [0.2, '#9be9a8'],     # Light green
-        [0.4, '#40c463'],     # Medium green
-        [0.6, '#30a14e'],     # Darker green
-        [1.0, '#216e39']      # Darkest green
-    ]
-    
-    # Create text array for cell values
-    text_array = heatmap_data.values.astype(str)
-    text_array[heatmap_data.isna()] = ''  # Hide NaNs
-    text_array[heatmap_data.values == 0] = ''  # Hide zeros
-    
-    fig = go.Figure(data=go.Heatmap(
-        z=heatmap_data.values,
-        x=heatmap_data.columns,
-        y=heatmap_data.index,
-        colorscale=colorscale,
-        showscale=True,
-        text=text_array,
-        texttemplate="%{text}",
-        textfont={"size": 10},
-        hoverongaps=False,
-        hovertemplate='Week: %{x}<br>Month: %{y}<br>Count: %{z}<extra></extra>'
-    ))
+    heatmap_data = heatmap_data.reindex(MONTH_ORDER)
     
-    # Update layout
-    fig.update_layout(
-        title=dict(
-            text='Weekly Request Counts by Month<br>2024',
-            x=0.5,
-            y=0.95,
-            xanchor='center',
-            yanchor='top',
-            font=dict(size=16)
-        ),
-        plot_bgcolor='white',
-        paper_bgcolor='white',
-        margin=dict(t=80, l=50, r=50, b=20),
-        height=400,
-        xaxis=dict(
-            title='Week Number',
-            side='bottom',  # Move week labels to the bottom
-            tickmode='linear',
-            tickangle=0,
-            showgrid=False,
-            showline=False,
-        ),
-        yaxis=dict(
-            title='Month',
-            showgrid=False,
-            showline=False,
-            ticks='',
-            ticksuffix='  ',  # Add some padding
-        ),
-        coloraxis_colorbar=dict(
-            title='Count',
-            thicknessmode='pixels',
-            thickness=20,
-            lenmode='pixels',
-            len=300,
-            yanchor='top',
-            y=1,
-            ypad=0,
-            xpad=20
-        )
-    )
-    
-    st.plotly_chart(fig, use_container_width=True)
\ No newline at end of file
+    fig = figure_cache.get('weekly_heatmap', heatmap_data, {'title': 'Weekly Request Counts by Month<br>2024'},
+                           build_weekly_heatmap)
+    figure_cache.show('weekly_heatmap', fig, st.plotly_chart, use_container_width=True)
+
+# Per-figure build and serialise times, shown with ?debug=1 in the URL; serialising is not cached
+if st.query_params.get('debug'):
+    with st.expander("Chart timings"):
+        st.dataframe(figure_cache.timings(), hide_index=True)
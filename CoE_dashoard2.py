@@ -1,23 +1,16 @@
-import pandas as pd
 import streamlit as st
 import plotly.express as px
 from calendar import month_abbr
 from datetime import datetime
+import numpy as np
+from calendar_features import week_range_labels
+from coe_data_store import get_coe_store
 
-# Load the data
-data = pd.read_excel("for_coe_dashboard.xlsx")
-
-# Ensure the date column is in datetime format
-data['Request Received Date'] = pd.to_datetime(data['Request Received Date'], errors='coerce')
+# Load the data from the snapshot shared with CoE_dashboard (typed dates, Year precomputed)
+data = get_coe_store().snapshot().frame
 
 # Filter rows with valid dates
-data = data.dropna(subset=['Request Received Date'])
-
-# Add a Year column for filtering
-data['Year'] = data['Request Received Date'].dt.year
-
-# Handle invalid years (if any)
-data['Year'] = data['Year'].fillna(0).astype(int)  # Replace NaN values with 0 and convert to integer
+data = data[data['Request Received Date'].notna()]
 
 # Get the current year as the default year
 current_year = datetime.now().year
@@ -36,46 +29,22 @@ selected_year = st.selectbox(
 # Filter data for the selected year
 filtered_data = data[data['Year'] == selected_year]
 
-# Define a function to calculate the week number within each month
-def get_week_in_month(date):
-    first_day = date.replace(day=1)
-    week_in_month = (date.day + first_day.weekday()) // 7 + 1
-    return week_in_month
-
-# Add week and month columns
-filtered_data['Week'] = filtered_data['Request Received Date'].apply(get_week_in_month)
-filtered_data['Month'] = filtered_data['Request Received Date'].dt.strftime('%b')
+# Week-of-month and Month are precomputed in the snapshot (calendar_features.week_of_month),
+# so the year's rows are only selected, never written to
 
 # Count requests per week and month
-heatmap_data = filtered_data.groupby(['Month', 'Week']).size().unstack(fill_value=0)
+heatmap_data = filtered_data.groupby(['Month', 'WeekOfMonth'], observed=True).size().unstack(fill_value=0)
 
 # Generate the full range of weeks and months for the selected year
 all_months = list(month_abbr)[1:]  # All months (Jan, Feb, ..., Dec)
-all_weeks = range(1, 6)  # Assume up to 5 weeks per month
-
-# Create a DataFrame with all possible combinations of months and weeks
-full_heatmap_data = pd.DataFrame(0, index=all_months, columns=all_weeks)
-
-# Update the full_heatmap_data with the actual data
-full_heatmap_data.update(heatmap_data)
-
-# Replace NaN values with 0 and convert to integers
-full_heatmap_data = full_heatmap_data.fillna(0).astype(int)
-
-# Melt the DataFrame for Plotly
-heatmap_melted = full_heatmap_data.reset_index().melt(id_vars='index', var_name='Week', value_name='Requests')
-heatmap_melted.rename(columns={'index': 'Month'}, inplace=True)
+all_weeks = range(1, 7)  # A month spans up to 6 Sunday-started weeks
 
-# Add a hover text column to show the week range
-def get_week_range(month, week):
-    # Get the first day of the month
-    first_day = datetime.strptime(f"{month} {selected_year}", "%b %Y")
-    # Calculate the start and end of the week
-    start = first_day.replace(day=1) + pd.Timedelta(days=(week - 1) * 7)
-    end = start + pd.Timedelta(days=6)
-    return f"Week {week}: {start.strftime('%b %d')} - {end.strftime('%b %d')}"
+# Full month x week grid, filled from the counts
+full_heatmap_data = heatmap_data.reindex(index=all_months, columns=all_weeks, fill_value=0).fillna(0).astype(int)
 
-heatmap_melted['Week Range'] = heatmap_melted.apply(lambda row: get_week_range(row['Month'], row['Week']), axis=1)
+# Hover text showing the date range of each week, built for the whole grid at once
+month_grid, week_grid = np.meshgrid(np.arange(1, len(all_months) + 1), np.array(all_weeks), indexing='ij')
+week_ranges = week_range_labels(selected_year, month_grid.ravel(), week_grid.ravel()).reshape(month_grid.shape)
 
 # Create the heatmap using Plotly
 fig = px.imshow(
@@ -89,7 +58,8 @@ fig = px.imshow(
 
 # Update hover template
 fig.update_traces(
-    hovertemplate="<b>%{y}</b><br>%{x}<br>Requests: %{z}<extra></extra>"
+    customdata=week_ranges,
+    hovertemplate="<b>%{y}</b><br>%{customdata}<br>Requests: %{z}<extra></extra>"
 )
 
 # Update layout
@@ -6,6 +6,11 @@ import os
 from dotenv import load_dotenv
 from datetime import datetime
 import pytz  # Add this import
+import copy
+import threading
+from db import bootstrap_once, get_pool
+from token_accounting import MAX_DOCUMENT_TOKENS, count_tokens, is_exact
+from userlogs import insert_userlog
 # Load environment variables
 load_dotenv()
 
@@ -14,73 +19,144 @@ COOKIE_NAME = 'contract_extractor_cookie'
 COOKIE_KEY = "abcde"
 COOKIE_EXPIRY_DAYS = 30
 
+# History rows, with the display timestamp formatted by SQLite from the epoch column
+USERLOG_HISTORY_SQL = '''
+    SELECT id, username, filename, filesize, token_count, document_length,
+    upload_time, parse_time, extract_time, total_process_time,
+    strftime('%Y-%m-%d %H:%M:%S UTC', upload_epoch, 'unixepoch') AS upload_timestamp,
+    request_type, cache_hits, cache_misses, first_result_time
+    FROM userlogs
+'''
+
+
+# Bumped by triggers on every write to users, from any process
+CREDENTIALS_VERSION_SQL = 'SELECT version FROM credentials_version WHERE id = 1'
+
+# Credentials dict built from the users table, shared by every session in this process.
+# db_path -> {'version', 'credentials'}; rebuilt only when the version stored in the database moves.
+_credentials_lock = threading.Lock()
+_credentials_cache = {}
+
 
 class AuthenticationManager:
-    def __init__(self):
-        self.db_path = 'userdata.db'
+    def __init__(self, db_path='userdata.db'):
+        self.db_path = db_path
+        self.pool = get_pool(self.db_path)
         self.names = []
         self.usernames = []
         self.passwords = []
         self.emails = []
         
-        # Create or connect to database and load data
-        self._ensure_database_exists()
-        self.load_user_data()
+        # Create the schema once per process, then load data
+        try:
+            bootstrap_once(self.db_path, self._ensure_database_exists)
+        except sqlite3.Error as e:
+            st.error(f"Database error: {e}")
+            raise
 
-    def _ensure_database_exists(self):
+    def _ensure_database_exists(self, conn):
         """Ensure database and tables exist"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+        cursor = conn.cursor()
 
-            # Create users table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    username TEXT UNIQUE NOT NULL,
-                    password TEXT NOT NULL,
-                    email TEXT UNIQUE NOT NULL
-                )
+        # Create users table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                username TEXT UNIQUE NOT NULL,
+                password TEXT NOT NULL,
+                email TEXT UNIQUE NOT NULL
+            )
+        ''')
+        
+        # Version of the users table, so every process can tell when its cached credentials are stale
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS credentials_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL
+            )
+        ''')
+        cursor.execute('INSERT OR IGNORE INTO credentials_version (id, version) VALUES (1, 0)')
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS users_version_{event.lower()} AFTER {event} ON users
+                BEGIN
+                    UPDATE credentials_version SET version = version + 1 WHERE id = 1;
+                END
             ''')
-            
-            # Create userlogs table
-            # Inside the _ensure_database_exists method
+
+        # Create userlogs table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS userlogs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                filesize INTEGER NOT NULL,
+                token_count INTEGER NOT NULL,
+                document_length INTEGER NOT NULL,
+                upload_time FLOAT,
+                parse_time FLOAT,
+                extract_time FLOAT,
+                total_process_time FLOAT,
+                upload_timestamp TEXT NOT NULL,
+                request_type TEXT NOT NULL,  -- Add this line
+                cache_hits INTEGER NOT NULL DEFAULT 0,
+                cache_misses INTEGER NOT NULL DEFAULT 0,
+                first_result_time FLOAT,
+                upload_epoch INTEGER,  -- Unix seconds (UTC), used for sorting and the rate limit
+                FOREIGN KEY (username) REFERENCES users(username)
+            )
+        ''')
+
+        # Add columns to userlogs tables created before they existed
+        cursor.execute('PRAGMA table_info(userlogs)')
+        userlogs_columns = {row[1] for row in cursor.fetchall()}
+        added_columns = {
+            'cache_hits': 'INTEGER NOT NULL DEFAULT 0',
+            'cache_misses': 'INTEGER NOT NULL DEFAULT 0',
+            'first_result_time': 'FLOAT',
+            'upload_epoch': 'INTEGER',
+        }
+        for column, definition in added_columns.items():
+            if column not in userlogs_columns:
+                cursor.execute(f'ALTER TABLE userlogs ADD COLUMN {column} {definition}')
+
+        if 'upload_epoch' not in userlogs_columns:
+            # Backfill from the text timestamps, which are always stored in UTC
             cursor.execute('''
-                CREATE TABLE IF NOT EXISTS userlogs (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    username TEXT NOT NULL,
-                    filename TEXT NOT NULL,
-                    filesize INTEGER NOT NULL,
-                    token_count INTEGER NOT NULL,
-                    document_length INTEGER NOT NULL,
-                    upload_time FLOAT,
-                    parse_time FLOAT,
-                    extract_time FLOAT,
-                    total_process_time FLOAT,
-                    upload_timestamp TEXT NOT NULL,
-                    request_type TEXT NOT NULL,  -- Add this line
-                    FOREIGN KEY (username) REFERENCES users(username)
-                )
+                UPDATE userlogs
+                SET upload_epoch = CAST(strftime('%s', substr(upload_timestamp, 1, 19)) AS INTEGER)
+                WHERE upload_epoch IS NULL
             ''')
-            
-            # Check if users table is empty and add default users if needed
-            cursor.execute('SELECT COUNT(*) FROM users')
-            if cursor.fetchone()[0] == 0:
-                default_users = [
-                    ('Test User', 'testuser', 'testpass', 'email@example.com'),
-                    ('Test User 2', 'testuser2', 'testpass2', 'email2@example.com')
-                ]
-                cursor.executemany(
-                    'INSERT INTO users (name, username, password, email) VALUES (?, ?, ?, ?)',
-                    default_users
-                )
-            
-            conn.commit()
-            conn.close()
-        except sqlite3.Error as e:
-            st.error(f"Database error: {e}")
-            raise
+
+        # History listing, newest first per user
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_userlogs_username_epoch
+            ON userlogs (username, upload_epoch)
+        ''')
+        # Uploads are admitted by rate_limiter.py now; this index only slowed every insert
+        cursor.execute('DROP INDEX IF EXISTS idx_userlogs_rate_limit')
+        
+        # Check if users table is empty and add default users if needed
+        cursor.execute('SELECT COUNT(*) FROM users')
+        if cursor.fetchone()[0] == 0:
+            default_users = [
+                ('Test User', 'testuser', 'testpass', 'email@example.com'),
+                ('Test User 2', 'testuser2', 'testpass2', 'email2@example.com')
+            ]
+            cursor.executemany(
+                'INSERT INTO users (name, username, password, email) VALUES (?, ?, ?, ?)',
+                default_users
+            )
+
+        # Migrate plaintext passwords to bcrypt hashes (one-off per row)
+        cursor.execute('SELECT id, password FROM users')
+        plaintext_rows = [(row_id, password) for row_id, password in cursor.fetchall()
+                          if not stauth.Hasher.is_hash(password)]
+        cursor.executemany(
+            'UPDATE users SET password = ? WHERE id = ?',
+            [(stauth.Hasher.hash(password), row_id) for row_id, password in plaintext_rows]
+        )
 
     def get_utc_now(self):
         """Get current time in UTC"""
@@ -96,73 +172,26 @@ class AuthenticationManager:
         """Parse stored timestamp string back to datetime object (in UTC)"""
         return datetime.strptime(timestamp_str, '%Y-%m-%d %H:%M:%S %z').astimezone(pytz.UTC)
 
-    def check_upload_timeout(self, username):
-        """Check if user can upload based on their last upload time"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT upload_timestamp 
-                FROM userlogs 
-                WHERE username = ? 
-                ORDER BY upload_timestamp DESC 
-                LIMIT 1
-            ''', (username,))
-            
-            result = cursor.fetchone()
-            conn.close()
-            
-            if result:
-                last_upload = self.parse_timestamp(result[0])
-                current_time = self.get_utc_now()
-                time_diff = current_time - last_upload
-                seconds_since_last_upload = time_diff.total_seconds()
-                
-                if seconds_since_last_upload < 60:  # 1 minute timeout
-                    seconds_to_wait = int(60 - seconds_since_last_upload)
-                    return False, seconds_to_wait
-            
-            return True, 0
-            
-        except sqlite3.Error as e:
-            st.error(f"Error checking upload timeout: {e}")
-            return False, 60
-
     def check_token_limit(self, parsed_text):
         """
         Check if the document exceeds token limit
         Returns: bool - True if within limit, False if exceeded
         """
-        estimated_tokens = len(parsed_text) / 4  # Approximate token count
-        if estimated_tokens > 70000:  # 100k token limit
-            st.error(f"File exceeds token limit of 100,000 tokens. Estimated tokens: {int(estimated_tokens)}")
+        token_count = count_tokens(parsed_text)
+        if token_count > MAX_DOCUMENT_TOKENS:  # Longer documents are extracted in chunks below this
+            label = "Tokens" if is_exact() else "Estimated tokens"
+            st.error(f"File exceeds token limit of {MAX_DOCUMENT_TOKENS:,} tokens. {label}: {token_count:,}")
             return False
         return True
 
     def log_file_upload(self, username, filename, filesize, token_count, document_length, 
                     upload_time=None, parse_time=None, extract_time=None, 
-                    total_process_time=None, request_type=None):  # Add request_type parameter
+                    total_process_time=None, request_type=None, cache_hits=0, cache_misses=0,
+                    first_result_time=None):  # Add request_type parameter
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Store timestamp in UTC
-            current_time = self.get_utc_now()
-            formatted_timestamp = self.format_timestamp(current_time)
-            
-            cursor.execute('''
-                INSERT INTO userlogs 
-                (username, filename, filesize, token_count, document_length, 
-                upload_time, parse_time, extract_time, total_process_time, 
-                upload_timestamp, request_type)  -- Add request_type to the query
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (username, filename, filesize, token_count, document_length, 
-                upload_time, parse_time, extract_time, total_process_time, 
-                formatted_timestamp, request_type))  # Add request_type to the values
-            
-            conn.commit()
-            conn.close()
+            insert_userlog(self.pool, username, filename, filesize, token_count, document_length,
+                           upload_time, parse_time, extract_time, total_process_time, request_type,
+                           cache_hits, cache_misses, first_result_time)
             return True
         except sqlite3.Error as e:
             st.error(f"Error logging file upload: {e}")
@@ -171,37 +200,26 @@ class AuthenticationManager:
     def get_user_logs(self, username=None, limit=None):
         """Retrieve user logs (all timestamps in UTC)"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            
-            query = 'SELECT * FROM userlogs'
+            query = USERLOG_HISTORY_SQL
             params = []
             
             if username:
                 query += ' WHERE username = ?'
                 params.append(username)
             
-            query += ' ORDER BY upload_timestamp DESC'
+            query += ' ORDER BY upload_epoch DESC'
             
             if limit:
                 query += ' LIMIT ?'
                 params.append(limit)
             
-            cursor.execute(query, params)
-            logs = cursor.fetchall()
+            with self.pool.connection() as conn:
+                cursor = conn.execute(query, params)
+                columns = [description[0] for description in cursor.description]
+                logs = cursor.fetchall()
             
-            # Keep timestamps in UTC format for display
-            result = []
-            for row in logs:
-                row_dict = dict(row)
-                # Parse and format the timestamp to ensure consistent UTC display
-                utc_timestamp = self.parse_timestamp(row_dict['upload_timestamp'])
-                row_dict['upload_timestamp'] = utc_timestamp.strftime('%Y-%m-%d %H:%M:%S UTC')
-                result.append(row_dict)
-            
-            conn.close()
-            return result
+            # Timestamps are already formatted in UTC by the query
+            return [dict(zip(columns, row)) for row in logs]
         except sqlite3.Error as e:
             st.error(f"Error retrieving logs: {e}")
             return []
@@ -209,9 +227,6 @@ class AuthenticationManager:
     def load_user_data(self):
         """Load user data from the database"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
             # Clear existing data
             self.names = []
             self.usernames = []
@@ -219,8 +234,8 @@ class AuthenticationManager:
             self.emails = []
             
             # Load data from database
-            cursor.execute('SELECT name, username, password, email FROM users')
-            users = cursor.fetchall()
+            with self.pool.connection() as conn:
+                users = conn.execute('SELECT name, username, password, email FROM users').fetchall()
             
             # Populate lists
             for user in users:
@@ -228,8 +243,6 @@ class AuthenticationManager:
                 self.usernames.append(user[1])
                 self.passwords.append(user[2])
                 self.emails.append(user[3])
-            
-            conn.close()
         except sqlite3.Error as e:
             st.error(f"Error loading user data: {e}")
             raise
@@ -237,18 +250,11 @@ class AuthenticationManager:
     def add_user(self, name, username, password, email):
         """Add a new user to the database"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute(
-                'INSERT INTO users (name, username, password, email) VALUES (?, ?, ?, ?)',
-                (name, username, password, email)
-            )
-            
-            conn.commit()
-            conn.close()
-            
-            self.load_user_data()
+            with self.pool.connection() as conn:
+                conn.execute(
+                    'INSERT INTO users (name, username, password, email) VALUES (?, ?, ?, ?)',
+                    (name, username, stauth.Hasher.hash(password), email)
+                )
             return True
         except sqlite3.IntegrityError:
             st.error("Username or email already exists")
@@ -260,14 +266,13 @@ class AuthenticationManager:
     def update_user(self, username, updates):
         """Update user information"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
             update_query = 'UPDATE users SET '
             update_values = []
             
             for field, value in updates.items():
                 if field in ['name', 'password', 'email']:
+                    if field == 'password':
+                        value = stauth.Hasher.hash(value)
                     update_query += f"{field} = ?, "
                     update_values.append(value)
             
@@ -276,12 +281,8 @@ class AuthenticationManager:
                 update_query += ' WHERE username = ?'
                 update_values.append(username)
                 
-                cursor.execute(update_query, update_values)
-                conn.commit()
-            
-            conn.close()
-            
-            self.load_user_data()
+                with self.pool.connection() as conn:
+                    conn.execute(update_query, update_values)
             return True
         except Exception as e:
             st.error(f"Error updating user: {e}")
@@ -290,37 +291,48 @@ class AuthenticationManager:
     def delete_user(self, username):
         """Delete a user from the database"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('DELETE FROM users WHERE username = ?', (username,))
-            conn.commit()
-            conn.close()
-            
-            self.load_user_data()
+            with self.pool.connection() as conn:
+                conn.execute('DELETE FROM users WHERE username = ?', (username,))
             return True
         except Exception as e:
             st.error(f"Error deleting user: {e}")
             return False
 
+    def get_credentials(self):
+        """
+        Return the streamlit-authenticator credentials dict.
+        Passwords are stored as bcrypt hashes, so nothing is hashed here; the dict is built
+        once per process and rebuilt only after a user is added, changed or deleted, by any process.
+        """
+        with _credentials_lock:
+            # The version is read before the users, so a change that lands in between is picked up next time
+            with self.pool.connection() as conn:
+                version = conn.execute(CREDENTIALS_VERSION_SQL).fetchone()[0]
+            cached = _credentials_cache.get(self.db_path)
+            if cached is None or cached['version'] != version:
+                self.load_user_data()
+                cached = _credentials_cache[self.db_path] = {
+                    'version': version,
+                    'credentials': {
+                        'usernames': {
+                            username: {
+                                'name': name,
+                                'password': hashed_password,
+                                'email': email
+                            }
+                            for username, name, hashed_password, email in zip(
+                                self.usernames, self.names, self.passwords, self.emails
+                            )
+                        }
+                    }
+                }
+            # stauth writes login state into the dict, so each session gets its own copy
+            return copy.deepcopy(cached['credentials'])
+
     def setup_authentication(self):
         """Setup Streamlit authentication"""
         try:
-            hasher = stauth.Hasher(self.passwords)
-            hashed_passwords = [hasher.hash(password) for password in self.passwords]
-            
-            credentials = {
-                'usernames': {
-                    username: {
-                        'name': name,
-                        'password': hashed_password,
-                        'email': email
-                    }
-                    for username, name, hashed_password, email in zip(
-                        self.usernames, self.names, hashed_passwords, self.emails
-                    )
-                }
-            }
+            credentials = self.get_credentials()
 
             self._initialize_session_state()
             
@@ -0,0 +1,175 @@
+# batch_pipeline.py
+# Overlapping upload -> parse -> extract pipeline for a batch of contracts.
+# Nothing in here touches Streamlit widgets, so it is safe to run on worker threads.
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+
+from chunked_extraction import extract_document
+from extraction_cache import ExtractionCache, make_cache_key
+from extraction_prompts import PROMPT_VERSION, REVIEW_PROMPT, UPLOAD_PROMPT, WRITER_MODEL_NAME
+from telemetry import start_trace
+from token_accounting import MAX_DOCUMENT_TOKENS, count_tokens
+
+# Default number of documents allowed in each stage at the same time
+UPLOAD_CONCURRENCY = 4
+PARSE_CONCURRENCY = 4
+EXTRACT_CONCURRENCY = 3
+
+
+class BatchPipeline:
+    def __init__(self, file_processor, extract_fn, section_names, request_type,
+                 upload_concurrency=UPLOAD_CONCURRENCY,
+                 parse_concurrency=PARSE_CONCURRENCY,
+                 extract_concurrency=EXTRACT_CONCURRENCY, rate_limiter=None):
+        """
+        file_processor: FileProcessor used for the Writer upload and parse calls
+        extract_fn: callable taking document text and returning the completion text (raises WriterCallError)
+        rate_limiter: if given, each Writer stage of each document holds one of its in-flight slots
+        """
+        self.file_processor = file_processor
+        self.rate_limiter = rate_limiter
+        self.extract_fn = extract_fn
+        self.section_names = section_names
+        self.request_type = request_type
+        self.upload_limit = threading.BoundedSemaphore(upload_concurrency)
+        self.parse_limit = threading.BoundedSemaphore(parse_concurrency)
+        self.extract_limit = threading.BoundedSemaphore(extract_concurrency)
+        # Enough threads for every stage to be full at once
+        self.max_workers = upload_concurrency + parse_concurrency + extract_concurrency
+
+    @contextmanager
+    def _writer_slot(self):
+        """Hold an in-flight slot for one Writer stage of one document"""
+        if self.rate_limiter is None:
+            yield
+            return
+        self.rate_limiter.acquire_slot()
+        try:
+            yield
+        finally:
+            self.rate_limiter.release()
+
+    def process_document(self, file_name, raw_bytes, on_stage=None):
+        """
+        Run one document through all stages; each stage waits for a free slot.
+        on_stage(stage_name) is called as the document enters each stage, always in the order
+        'parse', 'upload', 'ocr', 'extract'; only scanned PDFs go through 'upload' and 'ocr'.
+        """
+        report_stage = on_stage or (lambda stage: None)
+        result = {
+            'filename': file_name,
+            'filesize': len(raw_bytes),
+            'status': 'error',
+            'error': None,
+            'retryable': True,  # False when a retry cannot fix the error (bad input, rejected request)
+            'parsed_text': None,
+            'extracted_data': None,
+            'upload_time': 0.0,
+            'parse_time': 0.0,
+            'extract_time': 0.0,
+            'total_time': 0.0,
+            'cache_hit': False,
+            'token_count': 0,
+            'warnings': [],  # Shown by the caller on the script thread
+        }
+        trace = start_trace('process', request_type=self.request_type, file_size=len(raw_bytes), mode='batch')
+        try:
+            extraction_cache = ExtractionCache()
+            with trace.span('hash', bytes=len(raw_bytes)):
+                cache_key = make_cache_key(raw_bytes, self.request_type, PROMPT_VERSION, WRITER_MODEL_NAME)
+            with trace.span('cache_lookup') as lookup_span:
+                cached = extraction_cache.get(cache_key)
+                lookup_span.set(hit=bool(cached))
+            if cached:
+                result.update(cached)
+                result['status'] = 'done'
+                result['cache_hit'] = True
+                result['token_count'] = count_tokens(result['parsed_text'])
+                return result
+
+            is_pdf = file_name.endswith(".pdf")
+            parsed_text = None
+
+            # Local parse stage: Word files and text-layer PDFs never leave the process
+            report_stage('parse')
+            with self.parse_limit, trace.span('parse', source='local', bytes=len(raw_bytes)) as parse_span:
+                if is_pdf:
+                    parsed_text = self.file_processor.extract_text_from_pdf_locally(raw_bytes)
+                else:
+                    parsed_text = self.file_processor.extract_text_from_word_bytes(raw_bytes, file_name)
+            result['parse_time'] = parse_span.duration
+
+            if parsed_text is None:
+                # Upload stage, only for scanned PDFs
+                report_stage('upload')
+                with self.upload_limit, self._writer_slot(), \
+                        trace.span('upload', bytes=len(raw_bytes)) as upload_span:
+                    file_id = self.file_processor.upload_bytes_to_writer(raw_bytes, file_name)
+                result['upload_time'] = upload_span.duration
+
+                # Remote parse (OCR) stage
+                report_stage('ocr')
+                with self.parse_limit, self._writer_slot(), trace.span('parse', source='writer') as parse_span:
+                    parsed_text = self.file_processor.parse_file_with_writer(file_id, "pdf")
+                result['parse_time'] += parse_span.duration
+
+            if not parsed_text:
+                result['error'] = "Error during file parsing"
+                return result
+            if parsed_text.startswith("Error"):
+                # The local Word reader returns its failures as text; the same bytes would fail again
+                result['error'] = parsed_text
+                result['retryable'] = False
+                return result
+            token_count = count_tokens(parsed_text)
+            parse_span.set(chars=len(parsed_text), tokens=token_count)
+            if token_count > MAX_DOCUMENT_TOKENS:
+                result['error'] = f"File exceeds token limit of {MAX_DOCUMENT_TOKENS:,} tokens"
+                result['retryable'] = False
+                return result
+            result['parsed_text'] = parsed_text
+            result['token_count'] = token_count
+
+            # Extract stage
+            report_stage('extract')
+            with self.extract_limit, self._writer_slot(), trace.span('extract', tokens=token_count) as extract_span:
+                prompt = REVIEW_PROMPT if self.request_type == "Review" else UPLOAD_PROMPT
+                extracted_data = extract_document(parsed_text, self.extract_fn, self.section_names, prompt)
+                extract_span.set(output_chars=len(extracted_data or ''))
+            result['extract_time'] = extract_span.duration
+
+            if not extracted_data:
+                result['error'] = "Error during information extraction."
+                return result
+
+            result['extracted_data'] = extracted_data
+            result['status'] = 'done'
+            extraction_cache.put(cache_key, parsed_text, extracted_data)
+            return result
+        except Exception as e:
+            result['error'] = str(e)
+            # WriterCallError says whether it is retryable; ValueError is the upload rejecting the file itself
+            result['retryable'] = getattr(e, 'retryable', not isinstance(e, ValueError))
+            return result
+        finally:
+            if 'extraction_cache' in locals():
+                result['warnings'].extend(extraction_cache.warnings)
+            if result['error']:
+                trace.set_error(result['error'])
+            result['total_time'] = trace.finish()
+
+    def run(self, documents):
+        """
+        Process (file_name, raw_bytes) pairs concurrently.
+        Yields each result as soon as its document finishes, in completion order.
+        """
+        if not documents:
+            return
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(documents))) as executor:
+            futures = [
+                executor.submit(self.process_document, file_name, raw_bytes)
+                for file_name, raw_bytes in documents
+            ]
+            for future in as_completed(futures):
+                yield future.result()
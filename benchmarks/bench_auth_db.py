@@ -0,0 +1,109 @@
+"""
+Micro-benchmark for the userlogs write path and the upload rate-limit check.
+
+Compares opening a fresh sqlite3 connection per operation (the old
+AuthenticationManager behaviour) with the pooled connections from db.py,
+under N concurrent threads. The rate-limit check is the old last-upload
+query against rate_limiter.RateLimiter.try_acquire, which replaced it.
+
+    python benchmarks/bench_auth_db.py --threads 1 4 16 --ops 500
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from auth_manager import AuthenticationManager  # noqa: E402
+from rate_limiter import RateLimiter  # noqa: E402
+from userlogs import INSERT_USERLOG_SQL  # noqa: E402
+
+# The rate-limit query exactly as the original check_upload_timeout ran it
+LEGACY_LAST_UPLOAD_SQL = '''
+    SELECT upload_timestamp
+    FROM userlogs
+    WHERE username = ?
+    ORDER BY upload_timestamp DESC
+    LIMIT 1
+'''
+
+
+def legacy_log(db_path, auth_manager, username):
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute(INSERT_USERLOG_SQL, (
+        username, 'bench.pdf', 1024, 100, 400, 0.1, 0.1, 0.1, 0.3,
+        auth_manager.format_timestamp(auth_manager.get_utc_now()), 'Review', 0, 1, None, int(time.time())
+    ))
+    conn.commit()
+    conn.close()
+
+
+def legacy_check(db_path, auth_manager, username):
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute(LEGACY_LAST_UPLOAD_SQL, (username,)).fetchone()
+    conn.close()
+
+
+def pooled_log(db_path, auth_manager, username):
+    auth_manager.log_file_upload(username, 'bench.pdf', 1024, 100, 400, 0.1, 0.1, 0.1, 0.3,
+                                 request_type='Review', cache_misses=1)
+
+
+def bucket_check(limiter, username):
+    allowed, _, _ = limiter.try_acquire(username)
+    if allowed:
+        limiter.release()
+
+
+def run(operation, db_path, auth_manager, threads, ops_per_thread):
+    """Run ops_per_thread calls on each of `threads` threads; returns (ops/sec, errors)"""
+    errors = []
+
+    def worker(index):
+        username = f"bench{index}"
+        for _ in range(ops_per_thread):
+            try:
+                operation(db_path, auth_manager, username)
+            except sqlite3.Error as e:
+                errors.append(e)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return threads * ops_per_thread / elapsed, len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--ops', type=int, default=500, help='operations per thread')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench_userdata.db')
+        auth_manager = AuthenticationManager(db_path=db_path)
+        limiter = RateLimiter(db_path=db_path)
+
+        print(f"{'path':<22}{'threads':>8}{'ops/sec':>12}{'errors':>8}")
+        for label, operation in [
+            ('legacy log_upload', legacy_log),
+            ('pooled log_upload', pooled_log),
+            ('legacy rate_check', legacy_check),
+            ('bucket rate_check', lambda db_path, auth_manager, username: bucket_check(limiter, username)),
+        ]:
+            for threads in args.threads:
+                ops_per_sec, errors = run(operation, db_path, auth_manager, threads, args.ops)
+                print(f"{label:<22}{threads:>8}{ops_per_sec:>12,.0f}{errors:>8}")
+        limiter.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Per-rerun cost of the week-of-month heatmap in CoE_dashoard2.py.
+
+"legacy" reproduces the old page: Week via Series.apply(get_week_in_month) and
+Month via strftime on the year's rows (written into a filtered slice), then a
+row-wise apply calling datetime.strptime for every Week Range label.
+"vectorised" computes the same columns with calendar_features, which the
+snapshot now does once per workbook version. "snapshot" is what a rerun does
+today: select the precomputed columns and group them. The legacy grid has 5
+weeks and put the 1st of Sunday-started months in week 2, so it is timed but
+not compared; the other two must agree and keep every row of the year.
+
+    python benchmarks/bench_calendar_features.py --rows 10000 1000000
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+from calendar import month_abbr
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from calendar_features import calendar_columns, week_range_labels  # noqa: E402
+
+YEAR = 2024
+
+
+def build_frame(rows, seed=7):
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp(f'{YEAR}-01-01') + pd.to_timedelta(rng.integers(0, 366, rows), unit='D')
+    return pd.DataFrame({'Request Received Date': dates, 'Year': YEAR, 'Region': rng.choice(['EMEA', 'APAC'], rows)})
+
+
+def legacy(data):
+    def get_week_in_month(date):
+        first_day = date.replace(day=1)
+        return (date.day + first_day.weekday()) // 7 + 1
+
+    def get_week_range(month, week):
+        first_day = datetime.strptime(f"{month} {YEAR}", "%b %Y")
+        start = first_day.replace(day=1) + pd.Timedelta(days=(week - 1) * 7)
+        end = start + pd.Timedelta(days=6)
+        return f"Week {week}: {start.strftime('%b %d')} - {end.strftime('%b %d')}"
+
+    filtered_data = data[data['Year'] == YEAR]
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        filtered_data['Week'] = filtered_data['Request Received Date'].apply(get_week_in_month)
+        filtered_data['Month'] = filtered_data['Request Received Date'].dt.strftime('%b')
+    heatmap_data = filtered_data.groupby(['Month', 'Week']).size().unstack(fill_value=0)
+    full = pd.DataFrame(0, index=list(month_abbr)[1:], columns=range(1, 6))
+    full.update(heatmap_data)
+    melted = full.reset_index().melt(id_vars='index', var_name='Week', value_name='Requests')
+    melted['Week Range'] = melted.apply(lambda row: get_week_range(row['index'], row['Week']), axis=1)
+    return full
+
+
+def heatmap(filtered_data):
+    counts = filtered_data.groupby(['Month', 'WeekOfMonth'], observed=True).size().unstack(fill_value=0)
+    full = counts.reindex(index=list(month_abbr)[1:], columns=range(1, 7), fill_value=0).fillna(0).astype(int)
+    months, weeks = np.meshgrid(np.arange(1, 13), np.arange(1, 7), indexing='ij')
+    week_range_labels(YEAR, months.ravel(), weeks.ravel())
+    return full
+
+
+def vectorised(data):
+    filtered_data = data[data['Year'] == YEAR]
+    return heatmap(filtered_data.assign(**calendar_columns(filtered_data['Request Received Date'])))
+
+
+def timed(fn, arg, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn(arg)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 1000000])
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10}  {'path':<11}{'ms per rerun':>14}")
+    for rows in args.rows:
+        data = build_frame(rows)
+        prepared = data.assign(**calendar_columns(data['Request Received Date']))
+        results = {}
+        for name, fn, arg in [('legacy', legacy, data), ('vectorised', vectorised, data),
+                              ('snapshot', lambda d: heatmap(d[d['Year'] == YEAR]), prepared)]:
+            ms, results[name] = timed(fn, arg, args.repeats)
+            print(f"{rows:>10,}  {name:<11}{ms:>14.1f}")
+        if not results['vectorised'].equals(results['snapshot']):
+            raise AssertionError("heatmap grids differ")
+        if results['snapshot'].to_numpy().sum() != (data['Year'] == YEAR).sum():
+            raise AssertionError("heatmap grid dropped rows")
+
+
+if __name__ == '__main__':
+    main()
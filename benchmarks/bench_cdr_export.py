@@ -0,0 +1,102 @@
+"""
+Peak memory and wall time of exporting the CDR grid, old dialog vs streaming export.
+
+"legacy" reproduces the old show_download_dialog: the filtered frame is copied,
+'Created On' converted, and pd.ExcelWriter(engine='xlsxwriter') writes it into
+a BytesIO. The other paths use cdr_export, which streams rows from SQLite in
+chunks into a spooled temporary file. Each path runs in its own process;
+"extra MB" is peak RSS above the process's RSS after imports.
+
+    python benchmarks/bench_cdr_export.py --rows 100000 1000000
+"""
+import argparse
+import io
+import multiprocessing
+import os
+import resource
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd  # noqa: E402
+
+from bench_cdr_load import build_database  # noqa: E402
+from cdr_export import start_export  # noqa: E402
+from cdr_query import ContractsQuery  # noqa: E402
+
+EXPORT_COLUMNS = ['ID', 'Status', 'Created On', 'Agreement Name', 'Client Entity Name', 'Requester Name',
+                  'Agreement Type', 'COE Assessor', 'Legal Contact', 'WTW Business(s)']
+
+
+def peak_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def legacy_export(db_path):
+    conn = sqlite3.connect(db_path)
+    filtered_df = pd.read_sql("SELECT * FROM contracts", conn)
+    conn.close()
+    export_df = filtered_df[EXPORT_COLUMNS].copy()
+    export_df['Created On'] = pd.to_datetime(export_df['Created On'])
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
+        export_df.to_excel(writer, index=False, sheet_name='Sheet1')
+        workbook = writer.book
+        worksheet = writer.sheets['Sheet1']
+        header_format = workbook.add_format({'bold': True, 'fg_color': '#D3D3D3', 'border': 1})
+        for idx, col in enumerate(export_df.columns):
+            worksheet.set_column(idx, idx, max(len(str(col)) + 4, 8))
+            worksheet.write(0, idx, col, header_format)
+    return buffer.getbuffer().nbytes
+
+
+def streaming_export(db_path, export_format):
+    contracts_query = ContractsQuery(db_path)
+    total = contracts_query.count({})
+    job = start_export(contracts_query, {}, '', EXPORT_COLUMNS, export_format, total)
+    while not job.done:
+        time.sleep(0.05)
+    if job.status == 'error':
+        raise RuntimeError(job.error)
+    job.file.seek(0, 2)
+    return job.file.tell()
+
+
+def scenario(name, db_path, queue):
+    baseline = peak_mb()
+    start = time.perf_counter()
+    size = legacy_export(db_path) if name == 'legacy' else streaming_export(db_path, name)
+    queue.put((time.perf_counter() - start, peak_mb() - baseline, size))
+
+
+def run(name, db_path):
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=scenario, args=(name, db_path, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--paths', nargs='+', default=['legacy', 'Excel', 'CSV', 'Parquet'])
+    args = parser.parse_args()
+
+    print(f"{'rows':>10}  {'path':<9}{'seconds':>9}{'extra MB':>10}{'file MB':>9}")
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'contracts.db')
+            build_database(db_path, rows)
+            for name in args.paths:
+                seconds, extra_mb, size = run(name, db_path)
+                print(f"{rows:>10,}  {name:<9}{seconds:>9.1f}{extra_mb:>10,.0f}{size / 1e6:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Cold start, warm start, rerun cost and peak RSS of loading the CDR contracts table.
+
+"legacy" is the old load_data: pd.read_sql("SELECT * FROM contracts") held in
+st.cache_data, which pickles the frame on store and unpickles a copy on every
+hit. "cold" builds the Arrow snapshot from SQLite, "warm" is a new server
+process that memory-maps an existing snapshot, and "incremental" refreshes
+after 1% of rows were modified. The snapshot paths load what the page does:
+the column names and the facet index, read from Arrow without a pandas frame.
+Each scenario runs in its own process so its peak RSS is not polluted by the
+others.
+
+    python benchmarks/bench_cdr_load.py --rows 100000 1000000
+"""
+import argparse
+import multiprocessing
+import os
+import pickle
+import random
+import resource
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+
+from cdr_data_store import ROWID_COLUMN, ContractsStore  # noqa: E402
+from cdr_facets import FacetIndex  # noqa: E402
+from cdr_query import FILTER_COLUMNS  # noqa: E402
+
+STATUSES = ['Draft', 'In Review', 'With Client', 'Signed', 'Cancelled', 'On Hold']
+AGREEMENT_TYPES = ['MSA', 'SOW', 'NDA', 'Amendment', 'Renewal', 'Data Processing']
+BUSINESSES = ['Health & Benefits', 'Retirement', 'Risk & Broking', 'Reinsurance', 'Technology']
+
+
+def build_database(db_path, rows):
+    conn = sqlite3.connect(db_path)
+    conn.execute('''
+        CREATE TABLE contracts (
+            "ID" TEXT, "Status" TEXT, "Created On" TEXT, "Modified On" TEXT, "Agreement Name" TEXT,
+            "Client Entity Name" TEXT, "Requester Name" TEXT, "Agreement Type" TEXT, "COE Assessor" TEXT,
+            "Legal Contact" TEXT, "WTW Business(s)" TEXT, "Comments" TEXT
+        )
+    ''')
+    conn.execute('CREATE TABLE report_metadata (report_date TEXT)')
+    conn.execute("INSERT INTO report_metadata VALUES ('2025-01-31')")
+    rng = random.Random(7)
+    conn.executemany(
+        'INSERT INTO contracts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        (
+            (f'CDR-{i:08d}', rng.choice(STATUSES), f'2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+             '2025-01-01 00:00:00', f'Agreement {i}', f'Client {rng.randrange(rows // 4 + 1)} Ltd',
+             f'Requester {rng.randrange(800)}', rng.choice(AGREEMENT_TYPES), f'Assessor {rng.randrange(40)}',
+             f'Counsel {rng.randrange(60)}', rng.choice(BUSINESSES), 'Awaiting signature from client contact')
+            for i in range(rows)
+        )
+    )
+    conn.commit()
+    conn.close()
+
+
+def touch_rows(db_path, fraction):
+    conn = sqlite3.connect(db_path)
+    total = conn.execute('SELECT COUNT(*) FROM contracts').fetchone()[0]
+    conn.execute(
+        "UPDATE contracts SET \"Status\" = 'Signed', \"Modified On\" = '2025-02-01 00:00:00' WHERE rowid % ? = 0",
+        (max(int(1 / fraction), 1),)
+    )
+    conn.commit()
+    conn.close()
+    future = time.time() + 10
+    os.utime(db_path, (future, future))
+    return total
+
+
+def scenario(name, db_path, snapshot_dir, reruns, queue):
+    start = time.perf_counter()
+    if name == 'legacy':
+        conn = sqlite3.connect(db_path)
+        df = pd.read_sql('SELECT * FROM contracts', conn)
+        conn.close()
+        cached = pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL)  # st.cache_data store
+        rows = len(df)
+        load_s = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(reruns):
+            pickle.loads(cached)  # st.cache_data hit
+    else:
+        store = ContractsStore(db_path, snapshot_dir)
+        snapshot = store.snapshot()
+        FacetIndex.from_arrow(snapshot.table, FILTER_COLUMNS, ROWID_COLUMN)  # st.cache_resource, once per version
+        rows = snapshot.table.num_rows
+        load_s = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(reruns):
+            store.snapshot().columns
+    rerun_ms = (time.perf_counter() - start) * 1000 / reruns
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    queue.put((load_s, rerun_ms, peak_mb, rows))
+
+
+def run(name, db_path, snapshot_dir, reruns):
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=scenario, args=(name, db_path, snapshot_dir, reruns, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--reruns', type=int, default=10)
+    parser.add_argument('--modified-fraction', type=float, default=0.01)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10}  {'path':<12}{'load s':>9}{'rerun ms':>11}{'peak RSS MB':>13}")
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'contracts.db')
+            snapshot_dir = os.path.join(tmp, '.cache')
+            build_database(db_path, rows)
+
+            for name in ['legacy', 'cold', 'warm']:
+                load_s, rerun_ms, peak_mb, _ = run(name, db_path, snapshot_dir, args.reruns)
+                print(f"{rows:>10,}  {name:<12}{load_s:>9.2f}{rerun_ms:>11.3f}{peak_mb:>13,.0f}")
+
+            touch_rows(db_path, args.modified_fraction)
+            load_s, rerun_ms, peak_mb, _ = run('incremental', db_path, snapshot_dir, args.reruns)
+            print(f"{rows:>10,}  {'incremental':<12}{load_s:>9.2f}{rerun_ms:>11.3f}{peak_mb:>13,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Chunked extraction under a telemetry trace: wall time, span overhead and span coverage.
+
+A long synthetic contract is extracted with chunked_extraction.extract_document and a stub
+extract_fn that opens prompt_build and completion spans like the real extract_info_*
+functions, then sleeps --completion-ms. After a warm-up run it runs once without a trace
+and once inside one, and fails if the traced run did not record exactly one completion
+span per chunk, or if a run with one failing chunk does not raise that chunk's error.
+Spans are written to a temporary database and metrics directory.
+
+    python benchmarks/bench_chunked_extraction.py --sections 400
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import telemetry  # noqa: E402
+from chunked_extraction import build_chunks, CHUNK_TARGET_TOKENS, extract_document  # noqa: E402
+from resilience import TransientWriterError  # noqa: E402
+from telemetry import span, start_trace  # noqa: E402
+from token_accounting import chars_per_token, count_tokens  # noqa: E402
+
+SECTION_NAMES = ['Payment Terms', 'Termination Clauses']
+PROMPT = "Extract the payment and termination terms."
+CLAUSE = ("The Supplier shall invoice monthly in arrears and the Client shall pay each undisputed invoice "
+          "within 45 days. Either party may terminate this Agreement on 90 days' written notice. ") * 40
+
+
+def build_document(sections):
+    return ''.join(f"## {number}. Clause {number}\n\n{CLAUSE}\n\n" for number in range(1, sections + 1))
+
+
+def make_extract_fn(completion_ms):
+    def extract_fn(text):
+        with span('prompt_build') as prompt_span:
+            prompt = f"{PROMPT}\n\nDocument Content:\n{text}"
+            prompt_span.set(chars=len(prompt))
+        with span('completion', tokens=count_tokens(prompt)):
+            time.sleep(completion_ms / 1000)
+        return ("<Payment Terms><results>Net 45</results><raw>45 days</raw></Payment Terms>"
+                "<Termination Clauses><results>90 days</results><raw>90 days</raw></Termination Clauses>")
+    return extract_fn
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sections', type=int, default=400)
+    parser.add_argument('--completion-ms', type=float, default=50)
+    args = parser.parse_args()
+
+    document = build_document(args.sections)
+    chunk_count = len(build_chunks(document, target_chars=int(CHUNK_TARGET_TOKENS * chars_per_token(document))))
+    extract_fn = make_extract_fn(args.completion_ms)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        telemetry.TELEMETRY_DB_PATH = os.path.join(tmp, 'bench_userdata.db')
+        telemetry.METRICS_DIR = os.path.join(tmp, 'metrics')
+
+        extract_document(document, extract_fn, SECTION_NAMES, PROMPT)  # Warm the token count cache
+        start = time.perf_counter()
+        extract_document(document, extract_fn, SECTION_NAMES, PROMPT)
+        untraced_ms = (time.perf_counter() - start) * 1000
+
+        trace = start_trace('process', request_type='Review', file_size=len(document.encode('utf-8')))
+        with trace.span('extract'):
+            extract_document(document, extract_fn, SECTION_NAMES, PROMPT)
+        traced_ms = trace.finish() * 1000
+
+        rows = telemetry.get_span_store().spans_since(0)
+        completions = [row for row in rows if row['name'] == 'completion']
+        extract_id = next(row['span_id'] for row in rows if row['name'] == 'extract')
+
+    print(f"{'tokens':>10}{'chunks':>8}{'untraced ms':>13}{'traced ms':>11}{'completion spans':>18}")
+    print(f"{count_tokens(document):>10,}{chunk_count:>8}{untraced_ms:>13.0f}{traced_ms:>11.0f}{len(completions):>18}")
+    if len(completions) != chunk_count:
+        raise AssertionError(f"{len(completions)} completion spans recorded for {chunk_count} chunks")
+    if any(row['parent_id'] != extract_id for row in rows if row['name'] == 'prompt_build'):
+        raise AssertionError("prompt_build spans are not children of the extract span")
+
+    # The last chunk fails; the document must raise its error rather than merge the others
+    failing_chunk = build_chunks(document, target_chars=int(CHUNK_TARGET_TOKENS * chars_per_token(document)))[-1]
+    def failing_extract_fn(text):
+        if text == failing_chunk:
+            raise TransientWriterError('completion', "rate limited")
+        return extract_fn(text)
+
+    try:
+        extract_document(document, failing_extract_fn, SECTION_NAMES, PROMPT)
+    except TransientWriterError:
+        pass
+    else:
+        raise AssertionError("a failed chunk was merged away instead of failing the document")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Per-rerun cost of the CoE_dashboard metrics and charts, raw rows vs the cube.
+
+"legacy" reproduces the old rerun: the isin filter chain and date range over
+the snapshot frame, four len(filtered_df[...]) metrics, four value_counts and
+the Month/MonthNum/Week groupby. "cube" is the same work as roll-ups over
+coe_cube.CoeCube; "cube hit" repeats a filter combination already sliced.
+The workbook is skipped: rows are generated directly into the snapshot layout.
+
+    python benchmarks/bench_coe_cube.py --rows 100000 1000000 5000000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from coe_cube import CoeCube, rollup, total  # noqa: E402
+from coe_data_store import prepare_frame  # noqa: E402
+
+FILTERS = {'Contract Request': ['Contract Upload', 'Contract Review'], 'Region': ['EMEA', 'APAC'],
+           'Year': [2024], 'Contract Type': [], 'Complexity': [], 'Month': []}
+DATE_RANGE = (pd.Timestamp('2023-03-01'), pd.Timestamp('2024-12-31'))
+
+
+def build_frame(rows, seed=7):
+    rng = np.random.default_rng(seed)
+    dates = pd.Series(pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 1826, rows), unit='D'))
+    return prepare_frame(pd.DataFrame({
+        'Request Received Date': dates,
+        'Contract Request': rng.choice(['Contract Upload', 'Contract Review', 'Amendment', 'Template Request'], rows),
+        'Contract Type': rng.choice(['MSA', 'SOW', 'NDA', 'Renewal', 'Data Processing'], rows),
+        'Region': rng.choice(['North America', 'EMEA', 'APAC', 'LATAM'], rows),
+        'Complexity': rng.choice(['Low', 'Medium', 'High'], rows),
+        'In_COMET': rng.choice(['Yes', 'No'], rows),
+    }))
+
+
+def legacy(df):
+    filtered_df = df
+    for column, values in FILTERS.items():
+        if values:
+            filtered_df = filtered_df[filtered_df[column].isin(values)]
+    filtered_df = filtered_df[(filtered_df['Request Received Date'] >= DATE_RANGE[0]) &
+                              (filtered_df['Request Received Date'] <= DATE_RANGE[1])]
+    metrics = (
+        len(filtered_df),
+        len(filtered_df[filtered_df['In COMET'] == 'Yes']),
+        len(filtered_df[filtered_df['Contract Request'] == 'Contract Upload']),
+        len(filtered_df[(filtered_df['Contract Request'] == 'Contract Upload') & (filtered_df['In COMET'] == 'Yes')]),
+    )
+    filtered_df['Region'].value_counts()
+    filtered_df[filtered_df['Contract Request'] == 'Contract Upload']['Region'].value_counts()
+    filtered_df['Contract Request'].value_counts()
+    filtered_df['Complexity'].value_counts()
+    filtered_df.groupby(['Month', 'MonthNum', 'Week'], observed=True).size()
+    return metrics
+
+
+def cube_rerun(cube):
+    cells = cube.slice(FILTERS, DATE_RANGE)
+    metrics = (
+        total(cells),
+        total(cells, **{'In COMET': 'Yes'}),
+        total(cells, **{'Contract Request': 'Contract Upload'}),
+        total(cells, **{'Contract Request': 'Contract Upload', 'In COMET': 'Yes'}),
+    )
+    rollup(cells, 'Region')
+    rollup(cells[cells['Contract Request'] == 'Contract Upload'], 'Region')
+    rollup(cells, 'Contract Request')
+    rollup(cells, 'Complexity')
+    rollup(cells[cells['Week'] != 0], ['Month', 'MonthNum', 'Week'])
+    return metrics
+
+
+def timed(fn, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000, 1000000, 5000000])
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10}  {'cells':>8}  {'build ms':>9}{'legacy ms':>11}{'cube ms':>9}{'cube hit ms':>13}")
+    for rows in args.rows:
+        df = build_frame(rows)
+        start = time.perf_counter()
+        cube = CoeCube(df)
+        build_ms = (time.perf_counter() - start) * 1000
+        legacy_ms, expected = timed(lambda: legacy(df), args.repeats)
+        cube._slices.clear()
+        cube_ms, actual = timed(lambda: (cube._slices.clear(), cube_rerun(cube))[1], args.repeats)
+        hit_ms, _ = timed(lambda: cube_rerun(cube), args.repeats)
+        if actual != expected:
+            raise AssertionError(f"metrics differ: {actual} != {expected}")
+        print(f"{rows:>10,}  {len(cube.cells):>8,}  {build_ms:>9,.0f}{legacy_ms:>11.1f}{cube_ms:>9.1f}{hit_ms:>13.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Cold start, warm start and rerun cost of loading the CoE workbook.
+
+"legacy" is the old CoE_dashboard.load_data: pd.read_excel plus the Month/Year
+derivations, held in st.cache_data, which unpickles a copy on every hit
+(CoE_dashoard2.py had no cache, so its rerun cost is the legacy load time).
+"cold" parses the workbook once into the Arrow snapshot, "warm" is a new server
+process that memory-maps an existing snapshot, and "touched" is a warm start
+after the workbook was re-saved unchanged, which only costs a hash.
+
+    python benchmarks/bench_coe_load.py --rows 10000 100000
+"""
+import argparse
+import multiprocessing
+import os
+import pickle
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from coe_data_store import CoeStore  # noqa: E402
+
+CONTRACT_REQUESTS = ['Contract Upload', 'Contract Review', 'Amendment', 'Template Request', None]
+CONTRACT_TYPES = ['MSA', 'SOW', 'NDA', 'Renewal', 'Data Processing']
+REGIONS = ['North America', 'EMEA', 'APAC', 'LATAM', None]
+COMPLEXITIES = ['Low', 'Medium', 'High']
+
+
+def build_workbook(path, rows, seed=7):
+    rng = np.random.default_rng(seed)
+    dates = pd.Series(pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 730, rows), unit='D'))
+    dates[rng.random(rows) < 0.01] = pd.NaT
+    pd.DataFrame({
+        'Request Received Date': dates,
+        'Contract Request': rng.choice(np.array(CONTRACT_REQUESTS, dtype=object), rows),
+        'Contract Type': rng.choice(CONTRACT_TYPES, rows),
+        'Region': rng.choice(np.array(REGIONS, dtype=object), rows),
+        'Complexity': rng.choice(COMPLEXITIES, rows),
+        'In_COMET': rng.choice(['Yes', 'No'], rows),
+        'Coordinator': [f'Coordinator {i}' for i in rng.integers(0, 30, rows)],
+    }).to_excel(path, index=False)
+
+
+def legacy_load(path):
+    df = pd.read_excel(path)
+    df['Request Received Date'] = pd.to_datetime(df['Request Received Date'])
+    for column in ['Contract Request', 'Contract Type', 'Region', 'Complexity']:
+        df[column] = df[column].fillna('Unknown')
+    df['Month'] = df['Request Received Date'].dt.strftime('%b').fillna('Unknown')
+    df['Year'] = df['Request Received Date'].dt.year.fillna(0).astype(int)
+    return df.rename(columns={'In_COMET': 'In COMET'})
+
+
+def scenario(name, path, snapshot_dir, reruns, queue):
+    start = time.perf_counter()
+    if name == 'legacy':
+        cached = pickle.dumps(legacy_load(path), protocol=pickle.HIGHEST_PROTOCOL)  # st.cache_data store
+        load_s = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(reruns):
+            frame = pickle.loads(cached)  # st.cache_data hit
+    else:
+        store = CoeStore(path, snapshot_dir)
+        frame = store.snapshot().frame
+        load_s = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(reruns):
+            frame = store.snapshot().frame
+    rerun_ms = (time.perf_counter() - start) * 1000 / reruns
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    queue.put((load_s, rerun_ms, peak_mb, len(frame)))
+
+
+def run(name, path, snapshot_dir, reruns):
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=scenario, args=(name, path, snapshot_dir, reruns, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--reruns', type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10}  {'path':<9}{'load s':>9}{'rerun ms':>11}{'peak RSS MB':>13}")
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'for_coe_dashboard.xlsx')
+            snapshot_dir = os.path.join(tmp, '.cache')
+            build_workbook(path, rows)
+
+            for name in ['legacy', 'cold', 'warm', 'touched']:
+                if name == 'touched':
+                    future = time.time() + 10
+                    os.utime(path, (future, future))
+                load_s, rerun_ms, peak_mb, _ = run(name, path, snapshot_dir, args.reruns)
+                print(f"{rows:>10,}  {name:<9}{load_s:>9.2f}{rerun_ms:>11.3f}{peak_mb:>13,.0f}")
+
+
+if __name__ == '__main__':
+    main()
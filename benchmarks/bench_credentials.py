@@ -0,0 +1,84 @@
+"""
+Rerun latency of building the login credentials at 10, 100 and 1,000 users.
+
+"legacy" bcrypt-hashes every password on every rerun, as setup_authentication
+used to. "cached" is what a rerun costs now: AuthenticationManager() plus
+get_credentials() against stored hashes. Legacy timings above --legacy-max
+users are extrapolated from the measured per-hash cost.
+
+    python benchmarks/bench_credentials.py --users 10 100 1000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import streamlit_authenticator as stauth  # noqa: E402
+
+from auth_manager import AuthenticationManager  # noqa: E402
+from db import get_pool  # noqa: E402
+
+
+def seed_users(db_path, count):
+    """Create `count` users; one precomputed hash is reused so seeding stays fast"""
+    AuthenticationManager(db_path=db_path)
+    password_hash = stauth.Hasher.hash('benchpass')
+    with get_pool(db_path).connection() as conn:
+        conn.execute('DELETE FROM users')
+        conn.executemany(
+            'INSERT INTO users (name, username, password, email) VALUES (?, ?, ?, ?)',
+            [(f'User {i}', f'user{i}', password_hash, f'user{i}@example.com') for i in range(count)]
+        )
+
+
+def legacy_rerun(passwords):
+    return [stauth.Hasher.hash(password) for password in passwords]
+
+
+def cached_rerun(db_path):
+    auth_manager = AuthenticationManager(db_path=db_path)
+    return auth_manager.get_credentials()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--legacy-max', type=int, default=100,
+                        help='largest user count to actually bcrypt; larger counts are extrapolated')
+    parser.add_argument('--reruns', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'users':>7}{'legacy ms/rerun':>18}{'cached ms/rerun':>18}")
+    per_hash = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in args.users:
+            db_path = os.path.join(tmp, f'bench_{count}.db')
+            seed_users(db_path, count)
+
+            if count <= args.legacy_max:
+                start = time.perf_counter()
+                legacy_rerun(['benchpass'] * count)
+                legacy_ms = (time.perf_counter() - start) * 1000
+                per_hash = legacy_ms / count
+                legacy_label = f"{legacy_ms:,.0f}"
+            else:
+                if per_hash is None:
+                    start = time.perf_counter()
+                    legacy_rerun(['benchpass'] * 5)
+                    per_hash = (time.perf_counter() - start) * 1000 / 5
+                legacy_label = f"~{per_hash * count:,.0f} (est.)"
+
+            cached_rerun(db_path)  # First call builds the shared dict
+            start = time.perf_counter()
+            for _ in range(args.reruns):
+                cached_rerun(db_path)
+            cached_ms = (time.perf_counter() - start) * 1000 / args.reruns
+
+            print(f"{count:>7}{legacy_label:>18}{cached_ms:>18.2f}")
+
+
+if __name__ == '__main__':
+    main()
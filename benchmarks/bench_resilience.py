@@ -0,0 +1,92 @@
+"""
+Success rate and tail latency of Writer calls against a simulated backend, one attempt vs resilience.call_writer.
+
+The backend answers in a lognormal time around --median-ms, a --slow-rate share of calls
+stall for 20x that, and an --error-rate share fail with a 503. "single" makes one attempt
+per call like the old code; "resilient" retries with jittered backoff and hedges after the
+p95 of the parse stage, the only hedged one. Backoff is scaled down with the latencies so
+the run stays short.
+
+    python benchmarks/bench_resilience.py --calls 400
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+import writerai  # noqa: E402
+
+import resilience  # noqa: E402
+
+REQUEST = httpx.Request('POST', 'https://api.writer.com/v1/tools/pdf-parser')
+
+
+def make_backend(median_ms, slow_rate, error_rate, seed):
+    rng = random.Random(seed)
+
+    def backend():
+        delay = rng.lognormvariate(0, 0.3) * median_ms / 1000
+        if rng.random() < slow_rate:
+            delay *= 20
+        time.sleep(delay)
+        if rng.random() < error_rate:
+            raise writerai.InternalServerError("overloaded", response=httpx.Response(503, request=REQUEST), body=None)
+        return 'ok'
+    return backend
+
+
+def run(calls, fn, concurrency):
+    latencies, failures = [], 0
+
+    def one(_):
+        start = time.perf_counter()
+        try:
+            fn()
+            return time.perf_counter() - start
+        except Exception:
+            return None
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for latency in executor.map(one, range(calls)):
+            if latency is None:
+                failures += 1
+            else:
+                latencies.append(latency)
+    latencies.sort()
+    pick = lambda q: latencies[min(len(latencies) - 1, int(len(latencies) * q / 100))] * 1000  # noqa: E731
+    return 100 * (calls - failures) / calls, pick(50), pick(95), pick(99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--median-ms', type=float, default=20)
+    parser.add_argument('--slow-rate', type=float, default=0.03)
+    parser.add_argument('--error-rate', type=float, default=0.05)
+    args = parser.parse_args()
+
+    resilience.RETRY_BASE_SECONDS = args.median_ms / 1000
+    resilience.HEDGE_MIN_DELAY_SECONDS = args.median_ms / 1000
+    # Keep the circuit closed: this measures retries and hedging, not fast-failing
+    resilience.get_breaker('parse').failure_threshold = args.calls
+
+    print(f"{'mode':>10}  {'success %':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    single = make_backend(args.median_ms, args.slow_rate, args.error_rate, seed=1)
+    results = run(args.calls, single, args.concurrency)
+    print(f"{'single':>10}  {results[0]:>9.1f}{results[1]:>9.1f}{results[2]:>9.1f}{results[3]:>9.1f}")
+
+    backend = make_backend(args.median_ms, args.slow_rate, args.error_rate, seed=1)
+    # Warm the stage's latency window so hedging has a p95 to work from
+    run(resilience.HEDGE_MIN_SAMPLES * 2, lambda: resilience.call_writer('parse', backend), args.concurrency)
+    results = run(args.calls, lambda: resilience.call_writer('parse', backend), args.concurrency)
+    print(f"{'resilient':>10}  {results[0]:>9.1f}{results[1]:>9.1f}{results[2]:>9.1f}{results[3]:>9.1f}")
+    print(resilience.latency_summary())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Section parsing of a long completion: one-shot parse_sections against streamed feeds.
+
+A synthetic completion with --sections blocks in the '[Section] [results] ... [raw extracted] ...
+[Section]' markup is parsed in one call and again fed to StreamingSectionParser in --chunk-chars
+pieces, as the completion stream delivers it. The raw text of every block quotes another section's
+name mid-line ("as set out in [Renewal]"), which must not end the block. The run fails if either
+parse loses a block, completes blocks out of order, or cuts a block's raw text short at a quoted name.
+
+    python benchmarks/bench_section_parser.py --sections 200 --chunk-chars 7
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from section_parser import StreamingSectionParser, parse_sections  # noqa: E402
+
+RAW_TEXT = ("Either party may terminate this Agreement on 90 days' written notice, save that the term "
+            "renews as set out in [Renewal] unless notice is given. ") * 4
+
+
+def build_completion(section_names):
+    blocks = []
+    for name in section_names:
+        blocks.append(f"[{name}]\n[results]\n<b>{name}:</b> 90 days<br>\n[raw extracted]\n{RAW_TEXT}\n[{name}]\n")
+    return '\n'.join(blocks)
+
+
+def check(sections, section_names, label):
+    for name in section_names:
+        if name not in sections:
+            raise AssertionError(f"{label}: block '{name}' was not parsed")
+        if sections[name]['raw'] != RAW_TEXT.strip():
+            raise AssertionError(f"{label}: raw text of '{name}' was cut short: {sections[name]['raw'][-60:]!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sections', type=int, default=200)
+    parser.add_argument('--chunk-chars', type=int, default=7)
+    args = parser.parse_args()
+
+    section_names = ['Renewal'] + [f'Clause {number}' for number in range(1, args.sections)]
+    completion = build_completion(section_names)
+
+    start = time.perf_counter()
+    sections = parse_sections(completion, section_names)
+    one_shot_ms = (time.perf_counter() - start) * 1000
+    check(sections, section_names, 'one-shot')
+
+    streaming = StreamingSectionParser(section_names)
+    completed = []
+    start = time.perf_counter()
+    for offset in range(0, len(completion), args.chunk_chars):
+        completed.extend(streaming.feed(completion[offset:offset + args.chunk_chars]))
+    streamed_ms = (time.perf_counter() - start) * 1000
+    check(streaming.sections, section_names, 'streamed')
+    if completed != section_names:
+        raise AssertionError(f"streamed: blocks completed out of order: {completed[:5]}...")
+
+    print(f"{'sections':>10}{'chars':>11}{'one-shot ms':>13}{'streamed ms':>13}{'feeds':>8}")
+    print(f"{len(section_names):>10}{len(completion):>11,}{one_shot_ms:>13.1f}{streamed_ms:>13.1f}"
+          f"{-(-len(completion) // args.chunk_chars):>8,}")
+
+
+if __name__ == '__main__':
+    main()
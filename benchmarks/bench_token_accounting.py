@@ -0,0 +1,91 @@
+"""
+Tokenization throughput on ~1 MB documents, and how far the old len(text) / 4 estimate is off.
+
+Four synthetic contracts: English prose, markdown tables, German and Japanese. Each is
+counted with token_accounting.count_tokens (LRU cache bypassed), using the BPE tokenizer
+when its vocabulary is cached, else the pre-tokenizer estimate. When the BPE tokenizer is
+available the estimate is also timed and compared against it.
+
+    python benchmarks/bench_token_accounting.py --size-mb 1
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import token_accounting  # noqa: E402
+from token_accounting import count_tokens, estimate_tokens, tokenizer_name  # noqa: E402
+
+ENGLISH = ("The Supplier shall indemnify and hold harmless the Client against all losses, damages and expenses "
+           "arising out of any breach of this Agreement. Payment is due within 45 days of receipt of a valid "
+           "invoice. Either party may terminate this Agreement on 90 days' written notice. ")
+GERMAN = ("Der Auftragnehmer verpflichtet sich, sämtliche Schäden zu ersetzen, die durch schuldhafte Verletzung "
+          "dieser Vereinbarung entstehen. Die Vergütung ist innerhalb von 45 Tagen nach Rechnungseingang fällig. ")
+JAPANESE = ("受託者は、本契約の違反により生じた一切の損害を賠償するものとする。支払いは請求書受領後四十五日以内とする。"
+            "いずれの当事者も、九十日前の書面による通知により本契約を解除することができる。")
+
+
+def table_rows(rng):
+    header = "| Role | Location | Hourly Rate (USD) | Effective Date |\n|---|---|---|---|\n"
+    row = "| {role} | {city} | {rate:,.2f} | 2024-{month:02d}-01 |\n"
+    roles, cities = ['Consultant', 'Senior Analyst', 'Director', 'Actuary'], ['London', 'New York', 'Manila', 'Berlin']
+    while True:
+        yield header + ''.join(row.format(role=rng.choice(roles), city=rng.choice(cities),
+                                          rate=rng.uniform(50, 900), month=rng.randint(1, 12)) for _ in range(20))
+
+
+def build_document(kind, size, seed=3):
+    rng = random.Random(seed)
+    parts, length = [], 0
+    tables = table_rows(rng)
+    while length < size:
+        if kind == 'tables':
+            part = next(tables)
+        else:
+            base = {'english': ENGLISH, 'german': GERMAN, 'japanese': JAPANESE}[kind]
+            part = f"## {rng.randint(1, 40)}. Clause\n\n{base * rng.randint(1, 4)}\n\n"
+        parts.append(part)
+        length += len(part.encode('utf-8'))
+    return ''.join(parts)
+
+
+def timed(fn, text, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        tokens = fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best, tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=float, default=1.0)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+    size = int(args.size_mb * 1024 * 1024)
+    exact = token_accounting.is_exact()
+
+    print(f"tokenizer: {tokenizer_name()}")
+    header = f"{'document':>10}{'chars':>10}{'tokens':>10}{'len/4':>10}{'len/4 err':>11}{'ms':>8}{'MB/s':>7}"
+    if exact:
+        header += f"{'estimate':>10}{'est err':>9}{'est ms':>8}"
+    print(header)
+    for kind in ('english', 'tables', 'german', 'japanese'):
+        text = build_document(kind, size)
+        megabytes = len(text.encode('utf-8')) / 1024 / 1024
+        seconds, tokens = timed(count_tokens.__wrapped__, text, args.repeats)
+        quarter = len(text) / 4
+        line = (f"{kind:>10}{len(text):>10,}{tokens:>10,}{quarter:>10,.0f}{(quarter - tokens) / tokens:>+11.0%}"
+                f"{seconds * 1000:>8.0f}{megabytes / seconds:>7.1f}")
+        if exact:
+            estimate_seconds, estimate = timed(estimate_tokens, text, args.repeats)
+            line += f"{estimate:>10,}{(estimate - tokens) / tokens:>+9.0%}{estimate_seconds * 1000:>8.0f}"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+Rate-limit check and history listing on a large userlogs table.
+
+Builds a userlogs table in the pre-migration shape (text timestamps, no
+indexes), times the old queries, then runs the AuthenticationManager
+bootstrap migration (epoch column + index) and times the new history query.
+The rate-limit check no longer reads userlogs; its "after" column is
+rate_limiter.RateLimiter.try_acquire for the same random users.
+
+    python benchmarks/bench_userlogs.py --rows 1000000 --users 1000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from auth_manager import USERLOG_HISTORY_SQL, AuthenticationManager  # noqa: E402
+from rate_limiter import RateLimiter  # noqa: E402
+
+LEGACY_SCHEMA = '''
+    CREATE TABLE userlogs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL,
+        filename TEXT NOT NULL,
+        filesize INTEGER NOT NULL,
+        token_count INTEGER NOT NULL,
+        document_length INTEGER NOT NULL,
+        upload_time FLOAT,
+        parse_time FLOAT,
+        extract_time FLOAT,
+        total_process_time FLOAT,
+        upload_timestamp TEXT NOT NULL,
+        request_type TEXT NOT NULL
+    )
+'''
+LEGACY_LAST_UPLOAD_SQL = '''
+    SELECT upload_timestamp FROM userlogs WHERE username = ?
+    ORDER BY upload_timestamp DESC LIMIT 1
+'''
+LEGACY_HISTORY_SQL = 'SELECT * FROM userlogs WHERE username = ? ORDER BY upload_timestamp DESC'
+
+
+def build_legacy_table(db_path, rows, users):
+    conn = sqlite3.connect(db_path)
+    conn.execute(LEGACY_SCHEMA)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    conn.executemany(
+        'INSERT INTO userlogs (username, filename, filesize, token_count, document_length, upload_time, '
+        'parse_time, extract_time, total_process_time, upload_timestamp, request_type) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        (
+            (f'user{random.randrange(users)}', 'contract.pdf', 1024, 1000, 4000, 0.1, 0.2, 3.0, 3.3,
+             (start + timedelta(seconds=i * 30)).strftime('%Y-%m-%d %H:%M:%S %z'), 'Review')
+            for i in range(rows)
+        )
+    )
+    conn.commit()
+    conn.close()
+
+
+def time_query(conn, sql, users, repeats, post_process=None):
+    """Average milliseconds per query over `repeats` random users"""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        rows = conn.execute(sql, (f'user{random.randrange(users)}',)).fetchall()
+        if post_process:
+            post_process(rows)
+    return (time.perf_counter() - start) * 1000 / repeats
+
+
+def time_admission(limiter, users, repeats):
+    """Average milliseconds per token-bucket admission over `repeats` random users"""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        allowed, _, _ = limiter.try_acquire(f'user{random.randrange(users)}')
+        if allowed:
+            limiter.release()
+    return (time.perf_counter() - start) * 1000 / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--repeats', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench_userlogs.db')
+        print(f"Building {args.rows:,} userlogs rows for {args.users:,} users...")
+        build_legacy_table(db_path, args.rows, args.users)
+
+        conn = sqlite3.connect(db_path)
+        auth_parser = AuthenticationManager.parse_timestamp
+
+        def legacy_history_post_process(rows):
+            # The old get_user_logs re-parsed every timestamp with strptime
+            for row in rows:
+                auth_parser(None, row[10]).strftime('%Y-%m-%d %H:%M:%S UTC')
+
+        legacy_rate = time_query(conn, LEGACY_LAST_UPLOAD_SQL, args.users, args.repeats)
+        legacy_history = time_query(conn, LEGACY_HISTORY_SQL, args.users, args.repeats,
+                                    legacy_history_post_process)
+        conn.close()
+
+        start = time.perf_counter()
+        AuthenticationManager(db_path=db_path)  # Runs the migration
+        migration_s = time.perf_counter() - start
+
+        limiter = RateLimiter(db_path=db_path)
+        new_rate = time_admission(limiter, args.users, args.repeats)
+        limiter.close()
+
+        conn = sqlite3.connect(db_path)
+        new_history = time_query(conn, USERLOG_HISTORY_SQL + ' WHERE username = ? ORDER BY upload_epoch DESC',
+                                 args.users, args.repeats)
+        conn.close()
+
+        print(f"One-off migration: {migration_s:.1f}s")
+        print(f"{'query':<16}{'before ms':>12}{'after ms':>12}")
+        print(f"{'rate limit':<16}{legacy_rate:>12.3f}{new_rate:>12.3f}")
+        print(f"{'history':<16}{legacy_history:>12.3f}{new_history:>12.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+# calendar_features.py
+# Vectorised calendar columns for the CoE dashboards; every function takes whole columns
+import numpy as np
+import pandas as pd
+
+# Constants
+MONTH_ORDER = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+UNKNOWN_VALUE = 'Unknown'
+MISSING_NUMBER = 0  # Used for week and month numbers of rows without a date
+
+
+def month_number(dates):
+    """Month 1-12 as int8, 0 where the date is missing"""
+    return dates.dt.month.fillna(MISSING_NUMBER).astype('int8')
+
+
+def month_name(dates):
+    """Abbreviated month as a calendar-ordered categorical; missing dates become Unknown"""
+    codes = dates.dt.month.fillna(len(MONTH_ORDER) + 1).astype('int8').to_numpy() - 1
+    categories = pd.CategoricalDtype(MONTH_ORDER + [UNKNOWN_VALUE], ordered=True)
+    return pd.Series(pd.Categorical.from_codes(codes, dtype=categories), index=dates.index)
+
+
+def iso_week(dates):
+    """ISO 8601 week number as int8, 0 where the date is missing"""
+    return dates.dt.isocalendar().week.fillna(MISSING_NUMBER).astype('int8')
+
+
+def week_of_month(dates):
+    """
+    Week within the month: week 1 runs from the 1st to the first Saturday, and every later
+    week starts on a Sunday. A month has 4 to 6 weeks. Missing dates give 0.
+    """
+    day = dates.dt.day
+    first_weekday = (dates.dt.weekday + 1 - (day - 1)) % 7  # Weekday of the 1st, Sunday = 0
+    return ((day - 1 + first_weekday) // 7 + 1).fillna(MISSING_NUMBER).astype('int8')
+
+
+def calendar_columns(dates):
+    """All derived calendar columns for one date column, as a dict ready for DataFrame.assign"""
+    return {
+        'Month': month_name(dates),
+        'Year': dates.dt.year.fillna(MISSING_NUMBER).astype('int32'),
+        'MonthNum': month_number(dates),
+        'Week': iso_week(dates),
+        'WeekOfMonth': week_of_month(dates),
+    }
+
+
+def week_range_labels(year, month_numbers, weeks):
+    """
+    Hover labels like 'Week 2: Mar 03 - Mar 09' for the weeks counted by week_of_month. Week 1
+    starts on the 1st, later weeks on their Sunday, and every week ends by the month end. Weeks
+    past the end of the month get a label with no dates.
+    month_numbers and weeks are equal-length arrays; one label is returned per element.
+    """
+    month_numbers = np.asarray(month_numbers, dtype='int64')
+    weeks = np.asarray(weeks, dtype='int64')
+    months = np.datetime64(f'{int(year):04d}-01', 'M') + (month_numbers - 1)
+    month_starts = months.astype('datetime64[D]')
+    month_ends = (months + 1).astype('datetime64[D]') - 1
+    # 1970-01-04 was a Sunday, so this is the weekday of the 1st with Sunday = 0
+    first_weekday = (month_starts - np.datetime64('1970-01-04')).astype('int64') % 7
+    week_starts = month_starts + (weeks - 1) * 7 - first_weekday  # The Sunday on or before
+    starts = np.maximum(week_starts, month_starts)
+    ends = np.minimum(week_starts + 6, month_ends)
+    dates = (': ' + pd.DatetimeIndex(starts).strftime('%b %d') + ' - ' + pd.DatetimeIndex(ends).strftime('%b %d'))
+    labels = 'Week ' + pd.Index(weeks).astype(str) + dates.where(starts <= month_ends, '')
+    return labels.to_numpy(dtype=object)
@@ -0,0 +1,212 @@
+# cdr_data_store.py
+# Columnar snapshot of data/contracts.db shared by every CDR dashboard session
+import os
+import sqlite3
+import threading
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc as ipc
+
+# Constants
+CONTRACTS_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "contracts.db")
+SNAPSHOT_FILE_NAME = "contracts.arrow"
+ROWID_COLUMN = "_rowid"
+MODIFIED_AT_COLUMNS = ['Modified On', 'Modified', 'modified_at', 'Last Modified']  # First one present is used
+CATEGORICAL_COLUMNS = ['Status', 'Agreement Type', 'WTW Business(s)', 'Requester Name', 'Legal Contact',
+                       'COE Assessor']
+CATEGORICAL_MAX_RATIO = 0.5  # Other text columns become categorical when at most half their values are distinct
+CATEGORICAL_MAX_VALUES = 50000
+
+# Keys stored in the Arrow schema metadata
+META_SOURCE_MTIME = b'source_mtime'
+META_MAX_ROWID = b'max_rowid'
+META_MAX_MODIFIED = b'max_modified'
+META_ROW_COUNT = b'row_count'
+META_REPORT_DATE = b'report_date'
+
+
+class ContractsSnapshot:
+    """One immutable version of the contracts table"""
+
+    def __init__(self, table, report_date, version):
+        self.table = table  # Arrow table backed by the memory-mapped snapshot file
+        self.report_date = report_date
+        self.version = version  # Source mtime; changes whenever the snapshot does
+        self._frame = None
+        self._frame_lock = threading.Lock()
+
+    @property
+    def columns(self):
+        """Data column names in table order, read from the Arrow schema"""
+        return [name for name in self.table.column_names if name != ROWID_COLUMN]
+
+    @property
+    def frame(self):
+        """
+        pandas view of the snapshot, built once and shared by all sessions.
+        Callers must treat it as read-only.
+        """
+        if self._frame is None:
+            with self._frame_lock:
+                if self._frame is None:
+                    # Dictionary columns become pandas categoricals; numeric columns are not copied
+                    frame = self.table.drop_columns([ROWID_COLUMN]).to_pandas(split_blocks=True)
+                    frame.index = pd.Index(self.table.column(ROWID_COLUMN).to_numpy())
+                    self._frame = frame
+        return self._frame
+
+
+class ContractsStore:
+    """
+    Materialises the contracts table into an Arrow IPC file next to the database.
+    The file is memory-mapped, so a warm start reads no SQLite rows and every
+    session shares the same pages. When the database changes only rows with a
+    newer rowid or modified-at value are read, unless rows were deleted or the
+    table has no modified-at column, in which case the snapshot is rebuilt.
+    """
+
+    def __init__(self, db_path=CONTRACTS_DB_PATH, snapshot_dir=None):
+        self.db_path = db_path
+        self.snapshot_dir = snapshot_dir or os.path.join(os.path.dirname(db_path), ".cache")
+        self.snapshot_path = os.path.join(self.snapshot_dir, SNAPSHOT_FILE_NAME)
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self.last_refresh = None  # 'memory', 'warm', 'incremental' or 'full', for diagnostics
+
+    def snapshot(self, source_mtime=None):
+        """Return the snapshot for the current database file, refreshing it if the file changed"""
+        if source_mtime is None:
+            source_mtime = os.path.getmtime(self.db_path)
+        current = self._snapshot
+        if current is not None and current.version == source_mtime:
+            self.last_refresh = 'memory'
+            return current
+        with self._lock:
+            if self._snapshot is None or self._snapshot.version != source_mtime:
+                self._snapshot = self._refresh(source_mtime)
+            return self._snapshot
+
+    def _refresh(self, source_mtime):
+        previous = self._snapshot.table if self._snapshot is not None else self._open_snapshot_file()
+        if previous is not None and self._meta(previous, META_SOURCE_MTIME) == repr(source_mtime):
+            self.last_refresh = 'warm'
+            return ContractsSnapshot(previous, self._meta(previous, META_REPORT_DATE), source_mtime)
+
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        try:
+            report_date = pd.to_datetime(
+                conn.execute("SELECT report_date FROM report_metadata").fetchone()[0]
+            ).strftime('%Y-%m-%d')
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(contracts)")]
+            modified_column = next((c for c in MODIFIED_AT_COLUMNS if c in columns), None)
+
+            table = None
+            if previous is not None and modified_column is not None:
+                table = self._incremental(conn, previous, modified_column)
+            if table is None:
+                table = self._full(conn)
+                self.last_refresh = 'full'
+            else:
+                self.last_refresh = 'incremental'
+            row_count = conn.execute("SELECT COUNT(*) FROM contracts").fetchone()[0]
+        finally:
+            conn.close()
+
+        table = self._with_metadata(table, modified_column, source_mtime, row_count, report_date)
+        self._write_snapshot_file(table)
+        return ContractsSnapshot(self._open_snapshot_file(), report_date, source_mtime)
+
+    def _full(self, conn):
+        df = pd.read_sql(f'SELECT rowid AS "{ROWID_COLUMN}", * FROM contracts', conn)
+        return self._to_arrow(df)
+
+    def _incremental(self, conn, previous, modified_column):
+        """Upsert rows added or modified since the previous snapshot; None means rebuild instead"""
+        row_count = conn.execute("SELECT COUNT(*) FROM contracts").fetchone()[0]
+        max_rowid = int(self._meta(previous, META_MAX_ROWID) or 0)
+        max_modified = self._meta(previous, META_MAX_MODIFIED)
+        changed = pd.read_sql(
+            f'SELECT rowid AS "{ROWID_COLUMN}", * FROM contracts WHERE rowid > ? OR "{modified_column}" > ?',
+            conn, params=(max_rowid, max_modified or '')
+        )
+        new_rows = int((changed[ROWID_COLUMN] > max_rowid).sum())
+        if previous.num_rows + new_rows != row_count:
+            return None  # Rows were deleted (or rowids reused); the delta cannot express that
+        if changed.empty:
+            return previous
+
+        try:
+            changed_table = self._to_arrow(changed, previous.schema)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            changed_table = None
+        if changed_table is None:
+            return None  # Column set or types changed
+        keep = pc.invert(pc.is_in(previous.column(ROWID_COLUMN), value_set=changed_table.column(ROWID_COLUMN)))
+        merged = pa.concat_tables([previous.filter(keep), changed_table]).sort_by(ROWID_COLUMN)
+        return merged.unify_dictionaries().combine_chunks()
+
+    @staticmethod
+    def _to_arrow(df, schema=None):
+        """Convert a frame to Arrow, dictionary-encoding low-cardinality text columns"""
+        if schema is not None:
+            if list(df.columns) != schema.names:
+                return None
+            for field in schema:
+                if pa.types.is_dictionary(field.type):
+                    df[field.name] = df[field.name].astype('category')
+            return pa.Table.from_pandas(df, preserve_index=False).cast(schema.remove_metadata())
+
+        for column in df.columns:
+            if column == ROWID_COLUMN or not pd.api.types.is_string_dtype(df[column]):
+                continue
+            distinct = df[column].nunique(dropna=True)
+            if column in CATEGORICAL_COLUMNS or (
+                distinct <= CATEGORICAL_MAX_VALUES and distinct <= CATEGORICAL_MAX_RATIO * max(len(df), 1)
+            ):
+                df[column] = df[column].astype('category')
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        # Category codes from pandas may be int8/int16; widen them so later deltas always fit
+        fields = [
+            pa.field(f.name, pa.dictionary(pa.int32(), f.type.value_type)) if pa.types.is_dictionary(f.type) else f
+            for f in table.schema
+        ]
+        return table.cast(pa.schema(fields))
+
+    @staticmethod
+    def _with_metadata(table, modified_column, source_mtime, row_count, report_date):
+        max_rowid = pc.max(table.column(ROWID_COLUMN)).as_py() if table.num_rows else 0
+        max_modified = None
+        if modified_column is not None and table.num_rows:
+            max_modified = pc.max(table.column(modified_column).cast(pa.string())).as_py()
+        return table.replace_schema_metadata({
+            META_SOURCE_MTIME: repr(source_mtime),
+            META_MAX_ROWID: str(max_rowid),
+            META_MAX_MODIFIED: max_modified or '',
+            META_ROW_COUNT: str(row_count),
+            META_REPORT_DATE: report_date,
+        })
+
+    @staticmethod
+    def _meta(table, key):
+        value = (table.schema.metadata or {}).get(key)
+        return value.decode('utf-8') if value else None
+
+    def _open_snapshot_file(self):
+        """Memory-map the snapshot file; the returned table references the mapped pages directly"""
+        if not os.path.exists(self.snapshot_path):
+            return None
+        try:
+            # The mapping stays open for as long as the table's buffers are referenced
+            return ipc.open_file(pa.memory_map(self.snapshot_path, 'r')).read_all()
+        except (pa.ArrowInvalid, OSError):
+            return None  # Corrupt or partial file; rebuilt from SQLite
+
+    def _write_snapshot_file(self, table):
+        """Write to a temporary file and rename, so open memory maps keep seeing the old version"""
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        tmp_path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, self.snapshot_path)
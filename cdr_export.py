@@ -0,0 +1,154 @@
+# cdr_export.py
+# Streams filtered CDR rows to Excel, CSV or Parquet without building a DataFrame
+import csv
+import io
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import xlsxwriter
+
+# Constants
+EXPORT_FORMATS = {
+    'Excel': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'CSV': ('csv', 'text/csv'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet'),
+}
+EXPORT_FILE_STEM = "contract_tracker_export"
+EXPORT_CHUNK_ROWS = 10000
+SPOOL_MAX_BYTES = 16 * 1024 * 1024  # Exports larger than this are spooled to disk
+EXCEL_MAX_ROWS = 1048576  # Including the header row
+DATE_COLUMNS = ['Created On']
+EXPORT_WORKERS = 2
+
+_executor = ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix='cdr-export')
+
+
+def write_xlsx(chunks, columns, output, on_rows):
+    """Write rows with xlsxwriter's constant_memory mode, which flushes each row as it is written"""
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+    worksheet = workbook.add_worksheet('Sheet1')
+    header_format = workbook.add_format({'bold': True, 'fg_color': '#D3D3D3', 'border': 1})
+    date_format = workbook.add_format({'num_format': 'yyyy-mm-dd hh:mm:ss'})
+
+    # Set column widths based on header length
+    for idx, column in enumerate(columns):
+        worksheet.set_column(idx, idx, max(len(str(column)) + 4, 8))
+        worksheet.write(0, idx, column, header_format)
+
+    date_indexes = [idx for idx, column in enumerate(columns) if column in DATE_COLUMNS]
+    row_number = 1
+    for rows in chunks:
+        # Dates are parsed a chunk at a time so Excel gets real date cells
+        parsed_dates = {
+            idx: pd.to_datetime(pd.Series([row[idx] for row in rows]), errors='coerce').dt.to_pydatetime()
+            for idx in date_indexes
+        }
+        for offset, row in enumerate(rows):
+            for idx, value in enumerate(row):
+                if idx in parsed_dates and not pd.isna(parsed_dates[idx][offset]):
+                    worksheet.write_datetime(row_number, idx, parsed_dates[idx][offset], date_format)
+                elif value is not None:
+                    worksheet.write(row_number, idx, value)
+            row_number += 1
+        on_rows(len(rows))
+    workbook.close()
+
+
+def write_csv(chunks, columns, output, on_rows):
+    text = io.TextIOWrapper(output, encoding='utf-8-sig', newline='')  # BOM so Excel detects UTF-8
+    writer = csv.writer(text)
+    writer.writerow(columns)
+    for rows in chunks:
+        writer.writerows(rows)
+        on_rows(len(rows))
+    text.flush()
+    text.detach()  # Leave the spooled file open for the download
+
+
+def _arrow_column(values, data_type=None):
+    try:
+        return pa.array(values, type=data_type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # SQLite columns can mix types; retry through text, e.g. '12' into an integer column
+        text = pa.array([None if v is None else str(v) for v in values], type=pa.string())
+        return text if data_type is None else text.cast(data_type)
+
+
+def write_parquet(chunks, columns, output, on_rows):
+    """Write one row group per chunk; column types are taken from the first chunk"""
+    writer = None
+    for rows in chunks:
+        values = [list(v) for v in zip(*rows)]
+        if writer is None:
+            arrays = [_arrow_column(v) for v in values]
+            schema = pa.schema([
+                pa.field(c, pa.string() if pa.types.is_null(a.type) else a.type) for c, a in zip(columns, arrays)
+            ])
+            writer = pq.ParquetWriter(output, schema)
+        arrays = [_arrow_column(v, field.type) for v, field in zip(values, schema)]
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+        on_rows(len(rows))
+    if writer is None:
+        writer = pq.ParquetWriter(output, pa.schema([pa.field(c, pa.string()) for c in columns]))
+    writer.close()
+
+
+EXPORT_WRITERS = {'Excel': write_xlsx, 'CSV': write_csv, 'Parquet': write_parquet}
+
+
+class ExportJob:
+    """One export running on the background pool; progress is read by the dialog while it runs"""
+
+    def __init__(self, key, export_format, total_rows):
+        self.key = key
+        self.export_format = export_format
+        extension, self.mime = EXPORT_FORMATS[export_format]
+        self.file_name = f"{EXPORT_FILE_STEM}.{extension}"
+        self.total_rows = total_rows
+        self.rows_written = 0
+        self.status = 'running'
+        self.error = None
+        self.file = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+        self._lock = threading.Lock()
+
+    @property
+    def progress(self):
+        if self.total_rows == 0:
+            return 1.0
+        return min(self.rows_written / self.total_rows, 1.0)
+
+    @property
+    def done(self):
+        return self.status != 'running'
+
+    def _add_rows(self, count):
+        with self._lock:
+            self.rows_written += count
+
+    def run(self, chunks, columns):
+        try:
+            EXPORT_WRITERS[self.export_format](chunks, columns, self.file, self._add_rows)
+            self.file.seek(0)
+            self.status = 'done'
+        except Exception as e:
+            self.error = str(e)
+            self.status = 'error'
+
+    def close(self):
+        self.file.close()
+
+
+def start_export(contracts_query, filters, search_term, selected_columns, export_format, total_rows, key=None):
+    """Start streaming the filtered rows to a spooled file on the background pool"""
+    columns = [c for c in selected_columns if c in contracts_query.columns]
+    job = ExportJob(key, export_format, total_rows)
+    if export_format == 'Excel' and total_rows + 1 > EXCEL_MAX_ROWS:
+        job.status = 'error'
+        job.error = f"Excel files hold at most {EXCEL_MAX_ROWS - 1:,} rows; choose CSV or Parquet for {total_rows:,} rows."
+        return job
+    chunks = contracts_query.iter_rows(filters, search_term, columns, chunk_size=EXPORT_CHUNK_ROWS)
+    _executor.submit(job.run, chunks, columns)
+    return job
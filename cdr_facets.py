@@ -0,0 +1,153 @@
+# cdr_facets.py
+# Filter option lists and live per-option counts for the CDR sidebar
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Constants
+FACET_RESULT_CACHE_SIZE = 256  # Filter/search combinations whose counts are kept per data version
+
+
+class FacetIndex:
+    """
+    Categorical codes for the filter columns of one contracts snapshot.
+    Option lists are computed once; counts for a filter state are bincounts over the
+    rows that pass the other filters, so each multiselect shows how many rows choosing
+    an option would add. Results are cached per filter state, so reruns that only
+    page or change columns cost a dictionary lookup.
+    """
+
+    def __init__(self, frame, facet_columns, version=None):
+        encoded = {}
+        for column in facet_columns:
+            if column not in frame.columns:
+                continue
+            series = frame[column]
+            if not isinstance(series.dtype, pd.CategoricalDtype):
+                series = series.astype('category')
+            encoded[column] = (series.cat.categories, series.cat.codes.to_numpy().astype(np.int32) + 1)
+        self._build(frame.index.to_numpy(), encoded, version)
+
+    @classmethod
+    def from_arrow(cls, table, facet_columns, rowid_column, version=None):
+        """Index built from an Arrow table's dictionary columns, without converting the table to pandas"""
+        columns = [column for column in facet_columns if column in table.column_names]
+        facet_table = table.select(columns).unify_dictionaries().combine_chunks()
+        encoded = {}
+        for column in columns:
+            array = facet_table.column(column).combine_chunks()
+            if not pa.types.is_dictionary(array.type):
+                array = pc.dictionary_encode(array)
+            codes = array.indices.fill_null(-1).to_numpy(zero_copy_only=False).astype(np.int32) + 1
+            encoded[column] = (pd.Index(array.dictionary.to_pylist(), dtype=object), codes)
+        index = cls.__new__(cls)
+        index._build(table.column(rowid_column).to_numpy(), encoded, version)
+        return index
+
+    def _build(self, rowids, encoded, version):
+        """encoded maps each facet column to (categories, int32 codes shifted by one, 0 where missing)"""
+        self.version = version
+        self.row_count = len(rowids)
+        self.rowids = rowids
+        # Sorted copy of the rowids (and the permutation back to row positions) for search lookups
+        self._rowid_order = np.argsort(self.rowids, kind='stable')
+        self._sorted_rowids = self.rowids[self._rowid_order]
+
+        self.columns = list(encoded)
+        self.categories = {}  # column -> array of category values, indexed by code
+        self.codes = {}  # column -> int32 codes per row, shifted by one so missing values are 0
+        self.options = {}  # column -> sorted option list for the multiselect
+        for column, (categories, codes) in encoded.items():
+            present = np.bincount(codes, minlength=len(categories) + 1)[1:] > 0
+            self.categories[column] = categories
+            self.codes[column] = codes
+            self.options[column] = sorted(categories[present].tolist())
+        self._unfiltered = {column: self._count(column, None) for column in self.columns}
+
+        self._code_lookup = {column: {value: code + 1 for code, value in enumerate(self.categories[column])}
+                             for column in self.columns}
+        self._mask_cache = {}
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _filter_mask(self, column, values):
+        """Boolean row mask for one multiselect; cached because most reruns reuse the same selection"""
+        key = (column, tuple(sorted(values)))
+        mask = self._mask_cache.get(key)
+        if mask is None:
+            lookup = self._code_lookup[column]
+            selected = np.array([lookup[v] for v in values if v in lookup], dtype=np.int32)
+            mask = np.isin(self.codes[column], selected)
+            with self._lock:
+                if len(self._mask_cache) > FACET_RESULT_CACHE_SIZE:
+                    self._mask_cache.clear()
+                self._mask_cache[key] = mask
+        return mask
+
+    def _search_mask(self, search_rowids):
+        """Boolean row mask for the rows matched by the search box"""
+        mask = np.zeros(self.row_count, dtype=bool)
+        if len(search_rowids) == 0 or self.row_count == 0:
+            return mask
+        positions = np.minimum(np.searchsorted(self._sorted_rowids, search_rowids), self.row_count - 1)
+        found = positions[self._sorted_rowids[positions] == search_rowids]
+        mask[self._rowid_order[found]] = True
+        return mask
+
+    def _count(self, column, mask):
+        if mask is None and hasattr(self, '_unfiltered'):
+            return self._unfiltered[column]
+        codes = self.codes[column] if mask is None else self.codes[column][mask]
+        counts = np.bincount(codes, minlength=len(self.categories[column]) + 1)[1:]
+        return dict(zip(self.categories[column].tolist(), counts.tolist()))
+
+    def counts(self, filters, search_term="", search_fn=None):
+        """
+        Per-option counts for every facet column, plus counts with all filters applied.
+        search_fn(search_term) returns the matching rowids; it is only called on a cache miss.
+        Returns: {'options': {column: {value: n}}, 'applied': {column: {value: n}}, 'total': int}
+        'options' leaves each column's own selection out, so its other options stay meaningful.
+        """
+        active = {c: tuple(sorted(v)) for c, v in filters.items() if v and c in self.codes}
+        key = (tuple(sorted(active.items())), search_term.strip())
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None:
+                self._results.move_to_end(key)
+                return cached
+
+        masks = {column: self._filter_mask(column, values) for column, values in active.items()}
+        search_rowids = search_fn(search_term) if search_fn is not None and search_term.strip() else None
+        if search_rowids is not None:
+            masks[None] = self._search_mask(np.asarray(search_rowids))
+
+        def combined(excluding=()):
+            selected = [mask for name, mask in masks.items() if name not in excluding]
+            if not selected:
+                return None
+            return np.logical_and.reduce(selected) if len(selected) > 1 else selected[0]
+
+        full_mask = combined()
+        applied = {column: self._count(column, full_mask) for column in self.columns}
+        result = {
+            # Columns without a selection see the same rows either way
+            'options': {column: self._count(column, combined((column,))) if column in active else applied[column]
+                        for column in self.columns},
+            'applied': applied,
+            'total': self.row_count if full_mask is None else int(full_mask.sum()),
+        }
+        with self._lock:
+            self._results[key] = result
+            while len(self._results) > FACET_RESULT_CACHE_SIZE:
+                self._results.popitem(last=False)
+        return result
+
+
+def option_label(counts):
+    """format_func for a multiselect that shows the live count next to each option"""
+    def format_option(value):
+        return f"{value} ({counts.get(value, 0):,})"
+    return format_option
@@ -0,0 +1,90 @@
+# cdr_pagination.py
+# Page cache and background prefetch for the CDR grid
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from cdr_query import PAGE_SIZE
+
+# Constants
+PAGE_CACHE_SIZE = 64  # Pages kept across all sessions
+PREFETCH_WORKERS = 2
+
+
+def query_key(version, filters, search_term, selected_columns, ranked):
+    """Hashable identity of one result set; version is the database mtime, so new data never hits old pages"""
+    frozen_filters = tuple(sorted((column, tuple(values)) for column, values in filters.items() if values))
+    return version, frozen_filters, search_term.strip(), tuple(selected_columns), ranked
+
+
+class ContractsPaginator:
+    """
+    Serves one page at a time from ContractsQuery and loads the next page in the background.
+    Page boundaries (the last rowid of each page) are remembered, so paging forward in table
+    order seeks by rowid instead of re-reading every earlier row with OFFSET.
+    """
+
+    def __init__(self, contracts_query, page_size=PAGE_SIZE, cache_size=PAGE_CACHE_SIZE, workers=PREFETCH_WORKERS):
+        self.contracts_query = contracts_query
+        self.page_size = page_size
+        self.cache_size = cache_size
+        self._pages = OrderedDict()  # (query key, page number) -> Future of the page frame
+        self._boundaries = {}  # (query key, page number) -> last rowid on that page
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='cdr-prefetch')
+
+    def _fetch(self, key, filters, search_term, selected_columns, ranked, page_number):
+        after_rowid = self._boundaries.get((key, page_number - 1)) if page_number > 0 else None
+        frame = self.contracts_query.page(
+            filters, search_term, selected_columns,
+            limit=self.page_size, offset=page_number * self.page_size,
+            ranked=ranked, after_rowid=after_rowid
+        )
+        if len(frame):
+            with self._lock:
+                self._boundaries[(key, page_number)] = int(frame.index[-1])
+        return frame
+
+    def _cached(self, page_key):
+        with self._lock:
+            future = self._pages.get(page_key)
+            if future is not None:
+                self._pages.move_to_end(page_key)
+            return future
+
+    def _store(self, page_key, future):
+        """Cache a page future, dropping the least recently used pages; call with the lock held"""
+        self._pages[page_key] = future
+        while len(self._pages) > self.cache_size:
+            old_key, _ = self._pages.popitem(last=False)
+            self._boundaries.pop(old_key, None)
+
+    def _prefetch(self, key, filters, search_term, selected_columns, ranked, page_number):
+        page_key = (key, page_number)
+        with self._lock:
+            if page_key in self._pages:
+                return
+            # Registered before it runs, so the foreground request waits on it instead of querying again
+            self._store(page_key, self._executor.submit(
+                self._fetch, key, dict(filters), search_term, list(selected_columns), ranked, page_number
+            ))
+
+    def get_page(self, version, filters, search_term, selected_columns, page_number, page_count, ranked=True):
+        """Return one page as a DataFrame and start loading the page after it"""
+        key = query_key(version, filters, search_term, selected_columns, ranked)
+        page_key = (key, page_number)
+        future = self._cached(page_key)
+        frame = None
+        if future is not None:
+            try:
+                frame = future.result()
+            except Exception:
+                frame = None  # A failed prefetch is retried in the foreground
+        if frame is None:
+            frame = self._fetch(key, filters, search_term, selected_columns, ranked, page_number)
+            future = Future()
+            future.set_result(frame)
+            with self._lock:
+                self._store(page_key, future)
+        if page_number + 1 < page_count:
+            self._prefetch(key, filters, search_term, selected_columns, ranked, page_number + 1)
+        return frame
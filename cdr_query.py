@@ -0,0 +1,218 @@
+# cdr_query.py
+# Turns the CDR dashboard filters and search box into parameterised SQLite queries
+import os
+import sqlite3
+import threading
+import numpy as np
+import pandas as pd
+from cdr_data_store import CONTRACTS_DB_PATH, ROWID_COLUMN
+from cdr_search import FTS_SOURCE, FTS_TABLE, ContractsSearchIndex
+
+# Constants
+FILTER_COLUMNS = ['Status', 'Agreement Type', 'WTW Business(s)', 'Requester Name', 'Legal Contact', 'COE Assessor']
+SEARCH_COLUMNS = ['Client Entity Name', 'Requester Name']  # LIKE fallback when FTS5 is unavailable
+PAGE_SIZE = 100
+RANK_MAX_MATCHES = 20000  # Above this many search hits, bm25 ordering costs more than it helps
+
+
+def quote_identifier(name):
+    """Quote a column name for SQLite; names are also checked against the table schema before use"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def index_name(column):
+    return 'idx_contracts_' + ''.join(c if c.isalnum() else '_' for c in column.lower()).strip('_')
+
+
+class ContractsQuery:
+    """
+    Read-only query backend for the contracts table.
+    Only the rows for the visible page are fetched; totals come from a separate COUNT.
+    """
+
+    def __init__(self, db_path=CONTRACTS_DB_PATH):
+        self.db_path = db_path
+        self._columns = None
+        self._columns_version = None
+        self._lock = threading.Lock()
+        self.search_index = ContractsSearchIndex(db_path)
+        self.search_enabled = False
+        self._indexed_version = None  # Database mtime the indexes were last checked against
+
+    def _connect(self):
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        if self.search_enabled:
+            self.search_index.attach(conn)
+        return conn
+
+    @property
+    def columns(self):
+        """Column names of the contracts table, re-read whenever the database file changes"""
+        version = os.path.getmtime(self.db_path)
+        if self._columns_version != version:
+            conn = self._connect()
+            try:
+                self._columns = [row[1] for row in conn.execute("PRAGMA table_info(contracts)")]
+            finally:
+                conn.close()
+            self._columns_version = version
+        return self._columns
+
+    def ensure_indexes(self):
+        """
+        Create the filter indexes and the full-text search index if the database is missing them.
+        The contracts database is replaced by the nightly export, so this is checked once per
+        database version instead of once per process. A database this process cannot write
+        to is queried without the filter indexes.
+        """
+        version = os.path.getmtime(self.db_path)
+        if self._indexed_version == version:
+            return
+        with self._lock:
+            if self._indexed_version == os.path.getmtime(self.db_path):
+                return
+            wanted = {index_name(column): column for column in FILTER_COLUMNS if column in self.columns}
+            conn = self._connect()
+            try:
+                existing = {row[0] for row in conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'contracts'"
+                )}
+            finally:
+                conn.close()
+            missing = {name: column for name, column in wanted.items() if name not in existing}
+            if missing:
+                try:
+                    self._create_indexes(missing)
+                except sqlite3.OperationalError:
+                    pass  # Read-only or owned by another process; filters fall back to table scans
+            self.search_enabled = self.search_index.ensure(self.columns)
+            self._indexed_version = os.path.getmtime(self.db_path)  # Creating indexes changes the mtime
+
+    def _create_indexes(self, missing):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            for name, column in missing.items():
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON contracts ({quote_identifier(column)})")
+            conn.execute("ANALYZE contracts")  # Lets the planner pick the most selective filter index
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _query_parts(self, conn, filters, search_term, ranked=False):
+        """
+        Build the FROM clause, WHERE clause, ORDER BY and parameters; unknown columns are ignored.
+        With the full-text index, search hits are restricted by rowid, and joined in to be
+        ordered by bm25 when ranked.
+        """
+        columns = self.columns
+        source = "contracts"
+        order_by = "contracts.rowid"
+        clauses = []
+        params = []
+
+        match = rank_match = None
+        if search_term and self.search_enabled:
+            match, rank_match = self.search_index.match_expressions(conn, search_term)
+        if match == '':
+            clauses.append("0")  # A word with no close match anywhere in the index
+        elif match is not None:
+            if ranked and rank_match is not None:
+                source = (f"contracts JOIN (SELECT rowid AS match_rowid, rank AS match_rank FROM {FTS_SOURCE} "
+                          f"WHERE {FTS_TABLE} MATCH ?) AS matches ON contracts.rowid = matches.match_rowid")
+                order_by = "matches.match_rank, contracts.rowid"
+                params.append(rank_match)
+            clauses.append(f"contracts.rowid IN (SELECT rowid FROM {FTS_SOURCE} WHERE {FTS_TABLE} MATCH ?)")
+            params.append(match)
+        elif search_term:
+            # Substring scan, used when SQLite was built without FTS5
+            pattern = f"%{escape_like(search_term)}%"
+            search_clauses = [
+                f"{quote_identifier(column)} LIKE ? ESCAPE '\\'" for column in SEARCH_COLUMNS if column in columns
+            ]
+            if search_clauses:
+                clauses.append(f"({' OR '.join(search_clauses)})")
+                params.extend([pattern] * len(search_clauses))
+
+        for column, values in filters.items():
+            if values and column in columns:
+                clauses.append(f"{quote_identifier(column)} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return source, where, order_by, params
+
+    def _select_list(self, selected_columns):
+        columns = self.columns
+        return ', '.join(quote_identifier(c) for c in selected_columns if c in columns)
+
+    def count(self, filters, search_term=""):
+        conn = self._connect()
+        try:
+            source, where, _, params = self._query_parts(conn, filters, search_term)
+            return conn.execute(f"SELECT COUNT(*) FROM {source}{where}", params).fetchone()[0]
+        finally:
+            conn.close()
+
+    def page(self, filters, search_term, selected_columns, limit=PAGE_SIZE, offset=0, ranked=True, after_rowid=None):
+        """
+        Fetch one page of the filtered rows, best search matches first if ranked, otherwise in table order.
+        Rows are always tie-broken by rowid, which becomes the frame's index. In table order, after_rowid
+        (the last rowid of the previous page) seeks straight to the page instead of skipping offset rows.
+        """
+        select_list = self._select_list(selected_columns)
+        if not select_list:
+            return pd.DataFrame()
+        conn = self._connect()
+        try:
+            source, where, order_by, params = self._query_parts(conn, filters, search_term, ranked)
+            if after_rowid is not None and order_by == "contracts.rowid":
+                where = f"{where} AND contracts.rowid > ?" if where else " WHERE contracts.rowid > ?"
+                params = params + [after_rowid]
+                offset = 0
+            return pd.read_sql(
+                f'SELECT contracts.rowid AS "{ROWID_COLUMN}", {select_list} FROM {source}{where} '
+                f"ORDER BY {order_by} LIMIT ? OFFSET ?",
+                conn, params=params + [limit, offset], index_col=ROWID_COLUMN
+            )
+        finally:
+            conn.close()
+
+    def search_rowids(self, search_term):
+        """Rowids of the rows matching the search box, or None when there is nothing to search for"""
+        if not search_term.strip():
+            return None
+        conn = self._connect()
+        try:
+            match = None
+            if self.search_enabled:
+                match, _ = self.search_index.match_expressions(conn, search_term)
+            if match is not None:
+                # Read the hits straight from the index rather than probing it once per contract
+                rows = conn.execute(f"SELECT rowid FROM {FTS_SOURCE} WHERE {FTS_TABLE} MATCH ?", (match,)) \
+                    if match else []
+            else:
+                source, where, _, params = self._query_parts(conn, {}, search_term)
+                rows = conn.execute(f"SELECT contracts.rowid FROM {source}{where}", params)
+            return np.fromiter((row[0] for row in rows), dtype=np.int64)
+        finally:
+            conn.close()
+
+    def iter_rows(self, filters, search_term, selected_columns, chunk_size=10000):
+        """Yield the filtered rows for the selected columns as lists of tuples, chunk_size rows at a time"""
+        select_list = self._select_list(selected_columns)
+        if not select_list:
+            return
+        conn = self._connect()
+        try:
+            source, where, order_by, params = self._query_parts(conn, filters, search_term)
+            cursor = conn.execute(f"SELECT {select_list} FROM {source}{where} ORDER BY {order_by}", params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            conn.close()
@@ -0,0 +1,216 @@
+# cdr_search.py
+# FTS5 search index over the contracts table, with prefix and fuzzy matching
+import bisect
+import difflib
+import os
+import re
+import sqlite3
+import threading
+
+# Constants
+SEARCH_INDEX_COLUMNS = ['Client Entity Name', 'Requester Name', 'Agreement Name']
+SEARCH_DB_FILE_NAME = 'contracts_search.db'
+SEARCH_SCHEMA = 'search'  # Name the search database is attached under on contracts connections
+FTS_TABLE = 'contracts_fts'
+FTS_SOURCE = f'{SEARCH_SCHEMA}.{FTS_TABLE}'  # For FROM clauses; MATCH takes the bare FTS_TABLE name
+VOCAB_TABLE = 'contracts_fts_vocab'
+META_SOURCE_MTIME = 'source_mtime'
+META_COLUMNS = 'columns'
+# Objects older versions created inside contracts.db; dropped when that database is writable
+LEGACY_TRIGGER_NAMES = ['contracts_fts_insert', 'contracts_fts_delete', 'contracts_fts_update']
+FUZZY_CUTOFF = 0.75  # difflib similarity needed for a misspelt word to match an indexed one
+MAX_FUZZY_TERMS = 5
+MAX_PREFIX_EXPANSION = 16  # Prefixes matching fewer indexed words are expanded to exact-term ORs, which are faster
+COMMON_TERM_RATIO = 0.05  # Words in more rows than this barely change bm25 but make scoring scan their whole doclist
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+
+def quote_identifier(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def tokenize(search_term):
+    """Split a search box value into lower-case words, the same way the unicode61 tokenizer does"""
+    return TOKEN_PATTERN.findall(search_term.lower())
+
+
+def fts_available():
+    conn = sqlite3.connect(':memory:')
+    try:
+        conn.execute('CREATE VIRTUAL TABLE probe USING fts5(x)')
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        conn.close()
+
+
+class ContractsSearchIndex:
+    """
+    FTS5 table over the searchable contract columns, kept in a database of its own next to
+    the columnar snapshot, so contracts.db (owned by the nightly export) is only ever read.
+    The index is rebuilt from contracts.db whenever that file changes; query connections
+    attach it as SEARCH_SCHEMA.
+    """
+
+    def __init__(self, db_path, search_dir=None):
+        self.db_path = db_path
+        self.search_dir = search_dir or os.path.join(os.path.dirname(db_path), ".cache")
+        self.search_db_path = os.path.join(self.search_dir, SEARCH_DB_FILE_NAME)
+        self.available = fts_available()
+        self.columns = []
+        self._lock = threading.Lock()
+        self._vocab = []
+        self._doc_counts = {}
+        self._row_count = 0
+        self._vocab_version = None
+
+    def ensure(self, table_columns):
+        """Build the index if it is missing or older than contracts.db; returns whether search can use it"""
+        if not self.available:
+            return False
+        self.columns = [c for c in SEARCH_INDEX_COLUMNS if c in table_columns]
+        if not self.columns:
+            return False
+        source_mtime = repr(os.path.getmtime(self.db_path))
+        with self._lock:
+            if self._meta() != {META_SOURCE_MTIME: source_mtime, META_COLUMNS: repr(self.columns)}:
+                try:
+                    self._build(source_mtime)
+                except (sqlite3.Error, OSError):
+                    return False  # Searches use the LIKE fallback until the next database version
+        self._drop_legacy_objects()
+        return True
+
+    def attach(self, conn):
+        """Attach the search database, read-only, to a connection opened on contracts.db with uri=True"""
+        conn.execute(f"ATTACH DATABASE ? AS {SEARCH_SCHEMA}", (f"file:{self.search_db_path}?mode=ro",))
+
+    def _meta(self):
+        if not os.path.exists(self.search_db_path):
+            return None
+        try:
+            conn = sqlite3.connect(f"file:{self.search_db_path}?mode=ro", uri=True)
+            try:
+                return dict(conn.execute("SELECT key, value FROM search_meta"))
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            return None  # Partial or corrupt file; rebuilt
+
+    def _build(self, source_mtime):
+        """Build into a temporary file and rename it, so open connections keep the old index"""
+        os.makedirs(self.search_dir, exist_ok=True)
+        tmp_path = f"{self.search_db_path}.{os.getpid()}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        quoted = [quote_identifier(c) for c in self.columns]
+        column_list = ', '.join(quoted)
+        conn = sqlite3.connect(tmp_path)
+        try:
+            conn.execute("ATTACH DATABASE ? AS source", (f"file:{self.db_path}?mode=ro",))
+            conn.execute(f'''
+                CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+                    {column_list}, tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+                )
+            ''')
+            conn.execute(f"CREATE VIRTUAL TABLE {VOCAB_TABLE} USING fts5vocab({FTS_TABLE}, 'row')")
+            conn.execute(f"INSERT INTO {FTS_TABLE} (rowid, {column_list}) "
+                         f"SELECT rowid, {column_list} FROM source.contracts")
+            conn.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+            conn.execute("CREATE TABLE search_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            conn.executemany("INSERT INTO search_meta (key, value) VALUES (?, ?)",
+                             [(META_SOURCE_MTIME, source_mtime), (META_COLUMNS, repr(self.columns))])
+            conn.commit()
+            conn.execute("DETACH DATABASE source")
+        finally:
+            conn.close()
+        os.replace(tmp_path, self.search_db_path)
+
+    def _drop_legacy_objects(self):
+        """Remove the FTS table and triggers older versions put in contracts.db, if it can be written"""
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        try:
+            legacy = conn.execute(
+                "SELECT COUNT(*) FROM sqlite_master WHERE name IN (?, ?, ?, ?, ?)",
+                [FTS_TABLE, VOCAB_TABLE] + LEGACY_TRIGGER_NAMES
+            ).fetchone()[0]
+        finally:
+            conn.close()
+        if not legacy:
+            return
+        try:
+            conn = sqlite3.connect(self.db_path)
+            try:
+                for trigger in LEGACY_TRIGGER_NAMES:
+                    conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+                conn.execute(f"DROP TABLE IF EXISTS {VOCAB_TABLE}")
+                conn.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.OperationalError:
+            pass  # Read-only; the leftovers are harmless to this dashboard, which reads the search database
+
+    def _vocabulary(self, conn):
+        """Sorted list of indexed words and their row counts, reloaded whenever the index is rebuilt"""
+        version = os.path.getmtime(self.search_db_path)
+        if self._vocab_version != version:
+            rows = conn.execute(f"SELECT term, doc FROM {SEARCH_SCHEMA}.{VOCAB_TABLE} ORDER BY term").fetchall()
+            self._vocab = [term for term, _ in rows]
+            self._doc_counts = dict(rows)
+            self._row_count = conn.execute(f"SELECT COUNT(*) FROM {FTS_SOURCE}").fetchone()[0]
+            self._vocab_version = version
+        return self._vocab
+
+    def _prefix_terms(self, vocab, token, limit):
+        """Indexed words starting with token, or None if there are more than limit of them"""
+        position = bisect.bisect_left(vocab, token)
+        terms = []
+        while position < len(vocab) and vocab[position].startswith(token):
+            if len(terms) == limit:
+                return None
+            terms.append(vocab[position])
+            position += 1
+        return terms
+
+    def _close_terms(self, vocab, token):
+        """Indexed words within FUZZY_CUTOFF of a misspelt token, closest first"""
+        candidates = [term for term in vocab[bisect.bisect_left(vocab, token[0]):
+                                             bisect.bisect_left(vocab, chr(ord(token[0]) + 1))]
+                      if abs(len(term) - len(token)) <= 2]
+        return difflib.get_close_matches(token, candidates, n=MAX_FUZZY_TERMS, cutoff=FUZZY_CUTOFF)
+
+    def match_expressions(self, conn, search_term):
+        """
+        Build FTS5 MATCH expressions: every word must match as a prefix, and a
+        word that prefixes nothing in the index is swapped for its closest spellings.
+        Returns (match, rank_match): match selects the hits; rank_match leaves out very
+        common words so bm25 stays cheap, and is None when every word is common.
+        match is None when the search box holds no words and '' when nothing can match.
+        """
+        tokens = tokenize(search_term)
+        if not tokens:
+            return None, None
+        vocab = self._vocabulary(conn)
+        common_limit = COMMON_TERM_RATIO * self._row_count
+        groups = []
+        rank_groups = []
+        for token in tokens:
+            terms = self._prefix_terms(vocab, token, MAX_PREFIX_EXPANSION)
+            if terms is None:
+                groups.append(f'"{token}"*')
+                continue  # Short prefixes of many words are never selective enough to rank on
+            if not terms:
+                terms = self._close_terms(vocab, token)
+                if not terms:
+                    return '', None
+            group = '(' + ' OR '.join(f'"{term}"' for term in terms) + ')'
+            groups.append(group)
+            if sum(self._doc_counts.get(term, 0) for term in terms) <= common_limit:
+                rank_groups.append(group)
+
+        columns = '{' + ' '.join(quote_identifier(c) for c in self.columns) + '}'
+        match = f"{columns} : ({' AND '.join(groups)})"
+        rank_match = f"{columns} : ({' AND '.join(rank_groups)})" if rank_groups else None
+        return match, rank_match
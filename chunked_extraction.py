@@ -0,0 +1,152 @@
+# chunked_extraction.py
+# Map-reduce extraction for documents too long for a single completion
+import contextvars
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from extraction_prompts import WRITER_MODEL_NAME
+from resilience import TransientWriterError
+from section_parser import parse_sections
+from token_accounting import chars_per_token, plan_completion
+
+# Constants
+CHUNK_TARGET_TOKENS = 40000
+CHUNK_TARGET_CHARS = 160000  # CHUNK_TARGET_TOKENS at 4 characters per token, when no document is known
+CHUNK_OVERLAP_CHARS = 4000  # Tail of the previous chunk repeated so clauses are not cut in half
+MAX_CHUNK_WORKERS = 4
+
+# Markdown headings, "ARTICLE 4"/"Section 12" style headings and numbered clauses ("7. Termination")
+HEADING_PATTERN = re.compile(
+    r'^[ \t]*(?:#{1,6}[ \t]+\S|(?:ARTICLE|Article|SECTION|Section)[ \t]+[\dIVXLC]+|\d+(?:\.\d+)*\.?[ \t]+[A-Z])',
+    re.MULTILINE
+)
+NOT_FOUND_PATTERN = re.compile(
+    r'\b(?:no|not|none)\b.{0,40}\b(?:found|mentioned|available|specified|provided|included|present)\b|\bN/A\b',
+    re.IGNORECASE | re.DOTALL
+)
+
+
+def split_into_sections(parsed_text):
+    """Split the document at section headings, keeping each heading with its body"""
+    starts = [match.start() for match in HEADING_PATTERN.finditer(parsed_text)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    starts.append(len(parsed_text))
+    return [parsed_text[start:end] for start, end in zip(starts, starts[1:]) if parsed_text[start:end].strip()]
+
+
+def _split_oversized(section, target_chars):
+    """Split a section longer than target_chars on paragraph breaks, or hard-split as a last resort"""
+    pieces = []
+    current = ""
+    for paragraph in re.split(r'(?<=\n\n)', section):
+        while len(paragraph) > target_chars:
+            pieces.append(paragraph[:target_chars])
+            paragraph = paragraph[target_chars:]
+        if current and len(current) + len(paragraph) > target_chars:
+            pieces.append(current)
+            current = ""
+        current += paragraph
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def build_chunks(parsed_text, target_chars=CHUNK_TARGET_CHARS, overlap_chars=CHUNK_OVERLAP_CHARS):
+    """
+    Pack whole sections into chunks of roughly target_chars.
+    Every chunk after the first starts with the last overlap_chars of the previous one.
+    """
+    sections = []
+    for section in split_into_sections(parsed_text):
+        if len(section) > target_chars:
+            sections.extend(_split_oversized(section, target_chars))
+        else:
+            sections.append(section)
+
+    chunks = []
+    current = ""
+    for section in sections:
+        if current and len(current) + len(section) > target_chars:
+            chunks.append(current)
+            current = current[-overlap_chars:] if overlap_chars else ""
+        current += section
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+
+def _block_rank(block):
+    """Sort key for conflicting answers: a real finding beats 'not found', then more raw text wins"""
+    found = bool(block['raw']) and not NOT_FOUND_PATTERN.search(block['results'])
+    return (found, len(block['raw']))
+
+
+def merge_section_blocks(chunk_blocks, section_names):
+    """
+    Merge per-chunk answers into one answer per section.
+    Conflicts are resolved deterministically by _block_rank, ties going to the earliest chunk.
+    """
+    merged = {}
+    for section_name in section_names:
+        best = None
+        for blocks in chunk_blocks:
+            block = blocks.get(section_name)
+            if block is None:
+                continue
+            if best is None or _block_rank(block) > _block_rank(best):
+                best = block
+        if best is not None:
+            merged[section_name] = best
+    return merged
+
+
+def render_section_blocks(merged, section_names):
+    """Render merged blocks back into the tagged format the display functions expect"""
+    parts = []
+    for section_name in section_names:
+        block = merged.get(section_name)
+        if block:
+            parts.append(
+                f"[{section_name}]\n[results]\n{block['results']}\n"
+                f"[raw extracted]\n{block['raw']}\n[{section_name}]\n"
+            )
+    return "\n".join(parts)
+
+
+def extract_chunked(parsed_text, extract_fn, section_names, max_workers=MAX_CHUNK_WORKERS):
+    """
+    Run extract_fn over overlapping chunks of the document in parallel and merge the results.
+    extract_fn takes the chunk text and returns the completion text. If any chunk fails, its
+    error is raised instead of returning a partial merge.
+    """
+    # Dense text (tables, non-English) has fewer characters per token, so it gets shorter chunks
+    target_chars = int(CHUNK_TARGET_TOKENS * chars_per_token(parsed_text))
+    chunks = build_chunks(parsed_text, target_chars=target_chars)
+    if not chunks:
+        return None
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+        # Each chunk runs in a copy of this context, so spans opened in extract_fn join the current trace
+        futures = [executor.submit(contextvars.copy_context().run, extract_fn, chunk) for chunk in chunks]
+        # Results stay in chunk order, so merge ties always resolve the same way.
+        # A merge without every chunk would be cached as a complete extraction, so one failure fails the document
+        completions = [future.result() for future in futures]
+
+    for number, text in enumerate(completions, 1):
+        if not text:
+            raise TransientWriterError('completion', f"chunk {number} of {len(chunks)} returned no text")
+
+    chunk_blocks = [parse_sections(text, section_names) for text in completions]
+    return render_section_blocks(merge_section_blocks(chunk_blocks, section_names), section_names)
+
+
+def needs_chunking(parsed_text, prompt, model=WRITER_MODEL_NAME):
+    """True when prompt + document leave the model too little room to answer in one completion"""
+    return not plan_completion(prompt, parsed_text, model)['fits']
+
+
+def extract_document(parsed_text, extract_fn, section_names, prompt, model=WRITER_MODEL_NAME):
+    """Extract in a single completion, or in parallel chunks when the document is too long"""
+    if needs_chunking(parsed_text, prompt, model):
+        return extract_chunked(parsed_text, extract_fn, section_names)
+    return extract_fn(parsed_text)
@@ -0,0 +1,115 @@
+# clients.py
+# Process-wide API clients, built once and shared by every Streamlit session, thread and job
+import hashlib
+import os
+import threading
+import time
+import google.generativeai as genai
+import httpx
+from writerai import DefaultHttpxClient, Writer
+
+# Constants
+WRITER_CONNECT_TIMEOUT = 5.0
+WRITER_READ_TIMEOUT = 180.0  # Long contracts take 60-120 s to extract
+WRITER_WRITE_TIMEOUT = 60.0  # Uploads of files up to 10 MB
+WRITER_POOL_TIMEOUT = 10.0  # Wait for a free pooled connection before failing
+WRITER_MAX_RETRIES = 0  # Retries, hedging and circuit breaking are done per stage in resilience.py
+WRITER_MAX_CONNECTIONS = 32  # Enough for chunked extraction plus batch mode in one process
+WRITER_MAX_KEEPALIVE = 16
+WRITER_KEEPALIVE_EXPIRY = 120.0  # Idle connections stay open across reruns instead of re-doing TLS
+
+
+class ClientRegistry:
+    """
+    Builds each named client once per process and hands out the same object afterwards.
+    Construction time and reuse counts are kept per client for the statistics panel.
+    """
+
+    def __init__(self):
+        self._clients = {}
+        self._metrics = {}  # name -> {'build_ms', 'built_at', 'uses'}
+        self._lock = threading.Lock()
+
+    def get(self, name, factory):
+        client = self._clients.get(name)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(name)
+                if client is None:
+                    start = time.perf_counter()
+                    client = factory()
+                    self._metrics[name] = {'build_ms': (time.perf_counter() - start) * 1000,
+                                           'built_at': time.time(), 'uses': 0}
+                    self._clients[name] = client
+        self._metrics[name]['uses'] += 1
+        return client
+
+    def metrics(self):
+        """Construction cost and reuse count per client"""
+        with self._lock:
+            return {name: dict(values) for name, values in self._metrics.items()}
+
+    def close(self):
+        with self._lock:
+            for client in self._clients.values():
+                if hasattr(client, 'close'):
+                    client.close()
+            self._clients.clear()
+
+
+_registry = ClientRegistry()
+
+
+def _key_id(api_key):
+    """Short fingerprint so a rotated key gets a new client without putting the key in names or logs"""
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:12]
+
+
+def _secret(name):
+    """
+    Streamlit secret by name. Streamlit also exports root-level secrets to the environment,
+    so job worker processes read them from there without importing Streamlit.
+    """
+    if name in os.environ:
+        return os.environ[name]
+    import streamlit as st
+    return st.secrets[name]
+
+
+def get_writer_client(api_key=None):
+    """Writer client with a pooled keep-alive HTTP connection and tuned timeouts"""
+    api_key = api_key or _secret("WRITER_API_KEY")
+
+    def build():
+        http_client = DefaultHttpxClient(
+            limits=httpx.Limits(
+                max_connections=WRITER_MAX_CONNECTIONS,
+                max_keepalive_connections=WRITER_MAX_KEEPALIVE,
+                keepalive_expiry=WRITER_KEEPALIVE_EXPIRY
+            )
+        )
+        return Writer(
+            api_key=api_key,
+            timeout=httpx.Timeout(WRITER_READ_TIMEOUT, connect=WRITER_CONNECT_TIMEOUT,
+                                  write=WRITER_WRITE_TIMEOUT, pool=WRITER_POOL_TIMEOUT),
+            max_retries=WRITER_MAX_RETRIES,
+            http_client=http_client
+        )
+    return _registry.get(f"writer:{_key_id(api_key)}", build)
+
+
+def get_gemini_model(model_name, api_key=None):
+    """Gemini model; genai.configure runs once per key, so its gRPC channel is reused"""
+    api_key = api_key or _secret("GEMINI_API_KEY")
+    key_id = _key_id(api_key)
+
+    def configure():
+        genai.configure(api_key=api_key)
+        return genai
+    _registry.get(f"gemini-config:{key_id}", configure)
+    return _registry.get(f"gemini:{key_id}:{model_name}", lambda: genai.GenerativeModel(model_name))
+
+
+def client_metrics():
+    """Construction cost and reuse count of every client built in this process"""
+    return _registry.metrics()
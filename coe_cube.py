@@ -0,0 +1,111 @@
+# coe_cube.py
+# Pre-aggregated request counts for the CoE dashboards
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from calendar_features import MONTH_ORDER, UNKNOWN_VALUE
+
+# Constants
+DATE_COLUMN = 'Request Received Date'
+CUBE_DIMENSIONS = ['Region', 'Contract Request', 'Contract Type', 'Complexity', 'In COMET']
+CALENDAR_COLUMNS = ['Month', 'Year', 'MonthNum', 'Week', 'WeekOfMonth']  # Functions of the date, carried per cell
+COUNT_COLUMN = 'count'
+SLICE_CACHE_SIZE = 128  # Filter combinations whose slices are kept per data version
+
+
+class CoeCube:
+    """
+    Request counts grouped by day and every filter dimension, built once per data version.
+    A cell is one (date, Region, Contract Request, Contract Type, Complexity, In COMET)
+    combination, so the cube grows with distinct days and categories rather than with
+    requests. Filters select cells and every metric or chart sums their counts.
+    """
+
+    def __init__(self, frame, version=None):
+        self.version = version
+        self.row_count = len(frame)
+        dimensions = [column for column in CUBE_DIMENSIONS if column in frame.columns]
+        calendar = [column for column in CALENDAR_COLUMNS if column in frame.columns]
+        keys = frame[[DATE_COLUMN] + dimensions + calendar].assign(**{DATE_COLUMN: frame[DATE_COLUMN].dt.normalize()})
+        # Calendar columns depend only on the date, so grouping by them adds no cells
+        cells = (keys.groupby([DATE_COLUMN] + dimensions + calendar, observed=True, dropna=False, sort=False)
+                 .size().rename(COUNT_COLUMN).reset_index())
+        # Sorted by date (undated cells last), so a date range is a contiguous run of cells
+        self.cells = cells.sort_values(DATE_COLUMN, kind='stable', na_position='last', ignore_index=True)
+        self.dimensions = dimensions
+
+        self._dates = self.cells[DATE_COLUMN].to_numpy()
+        self._dated = int(self.cells[DATE_COLUMN].notna().sum())
+        # Integer codes per filterable column; a selection becomes a boolean lookup table over the codes
+        self._codes = {}
+        for column in dimensions + calendar:
+            codes, uniques = pd.factorize(self.cells[column])
+            self._codes[column] = (codes, pd.Index(uniques))
+
+        dates = self.cells[DATE_COLUMN]
+        self.min_date = dates.min()
+        self.max_date = dates.max()
+        self.options = {column: sorted(self.cells[column].dropna().unique().tolist()) for column in dimensions}
+        if 'Year' in self.cells:
+            self.options['Year'] = sorted((y for y in self.cells['Year'].unique().tolist() if y != 0), reverse=True)
+        if 'Month' in self.cells:
+            order = MONTH_ORDER + [UNKNOWN_VALUE]
+            months = self.cells['Month'].astype(str).unique().tolist()
+            self.options['Month'] = sorted(months, key=lambda m: order.index(m) if m in order else len(order))
+
+        self._slices = OrderedDict()
+        self._lock = threading.Lock()
+
+    def slice(self, filters, date_range=None):
+        """
+        Cells matching the filters; filters maps a column to its selected values (empty means all).
+        date_range is an inclusive (start, end) pair of dates; cells without a date are then excluded.
+        """
+        active = tuple(sorted((c, tuple(sorted(v, key=str))) for c, v in filters.items() if v and c in self.cells))
+        dates = tuple(pd.Timestamp(d) for d in date_range) if date_range and len(date_range) == 2 else None
+        key = (active, dates)
+        with self._lock:
+            cached = self._slices.get(key)
+            if cached is not None:
+                self._slices.move_to_end(key)
+                return cached
+
+        start, stop = 0, len(self.cells)
+        if dates is not None:
+            dated = self._dates[:self._dated]
+            start = int(np.searchsorted(dated, dates[0].to_datetime64(), side='left'))
+            stop = max(int(np.searchsorted(dated, dates[1].to_datetime64(), side='right')), start)
+        mask = np.ones(stop - start, dtype=bool)
+        for column, values in active:
+            codes, uniques = self._codes[column]
+            mask &= uniques.isin(values)[codes[start:stop]]
+        cells = self.cells.iloc[start + np.flatnonzero(mask)]
+
+        with self._lock:
+            self._slices[key] = cells
+            while len(self._slices) > SLICE_CACHE_SIZE:
+                self._slices.popitem(last=False)
+        return cells
+
+
+def total(cells, **conditions):
+    """Number of requests in the cells, optionally only where column == value for each condition"""
+    mask = np.ones(len(cells), dtype=bool)
+    for column, value in conditions.items():
+        mask &= (cells[column] == value).to_numpy()
+    return int(cells[COUNT_COLUMN].to_numpy()[mask].sum())
+
+
+def rollup(cells, by):
+    """Request counts per value of one or more columns, largest first, like value_counts"""
+    if isinstance(by, str) and isinstance(cells[by].dtype, pd.CategoricalDtype):
+        # One categorical column: a weighted bincount over its codes avoids the groupby machinery
+        codes = cells[by].cat.codes.to_numpy()
+        present = codes >= 0
+        categories = cells[by].cat.categories
+        sums = np.bincount(codes[present], weights=cells[COUNT_COLUMN].to_numpy()[present], minlength=len(categories))
+        counts = pd.Series(sums.astype('int64'), index=pd.Index(categories, name=by), name=COUNT_COLUMN)
+    else:
+        counts = cells.groupby(by, observed=True)[COUNT_COLUMN].sum()
+    return counts[counts > 0].sort_values(ascending=False)
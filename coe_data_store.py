@@ -0,0 +1,180 @@
+# coe_data_store.py
+# Typed columnar snapshot of for_coe_dashboard.xlsx shared by both CoE dashboards
+import hashlib
+import os
+import threading
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+from calendar_features import UNKNOWN_VALUE, calendar_columns
+
+# Constants
+COE_WORKBOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "for_coe_dashboard.xlsx")
+SNAPSHOT_FILE_NAME = "for_coe_dashboard.arrow"
+SNAPSHOT_FORMAT_VERSION = "3"  # Bump when the derived columns change, so old snapshots are rebuilt
+DATE_COLUMN = 'Request Received Date'
+CATEGORICAL_COLUMNS = ['Contract Request', 'Contract Type', 'Region', 'Complexity', 'In COMET']
+COLUMN_RENAMES = {'In_COMET': 'In COMET'}
+HASH_CHUNK_BYTES = 1024 * 1024
+
+# Keys stored in the Arrow schema metadata
+META_SOURCE_HASH = b'source_hash'
+META_SOURCE_MTIME = b'source_mtime'
+META_FORMAT_VERSION = b'format_version'
+
+
+def file_digest(path):
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class CoeSnapshot:
+    """One immutable version of the CoE workbook"""
+
+    def __init__(self, table, version, source_hash):
+        self.table = table  # Arrow table backed by the memory-mapped snapshot file
+        self.version = version  # Workbook mtime; changes whenever the snapshot does
+        self.source_hash = source_hash
+        self._frame = None
+        self._frame_lock = threading.Lock()
+
+    @property
+    def frame(self):
+        """
+        pandas view of the snapshot, built once and shared by all sessions.
+        Callers must treat it as read-only and copy before adding columns.
+        """
+        if self._frame is None:
+            with self._frame_lock:
+                if self._frame is None:
+                    self._frame = self.table.to_pandas(split_blocks=True)
+        return self._frame
+
+
+class CoeStore:
+    """
+    Converts the CoE workbook into an Arrow IPC file with typed columns, the derived
+    Month/Year/MonthNum/Week/WeekOfMonth columns and dictionary-encoded filter columns.
+    The file is keyed on the workbook's mtime and content hash: a touched but
+    unchanged workbook is only hashed, and a warm start never opens it with openpyxl.
+    """
+
+    def __init__(self, workbook_path=COE_WORKBOOK_PATH, snapshot_dir=None):
+        self.workbook_path = workbook_path
+        self.snapshot_dir = snapshot_dir or os.path.join(os.path.dirname(os.path.abspath(workbook_path)), ".cache")
+        self.snapshot_path = os.path.join(self.snapshot_dir, SNAPSHOT_FILE_NAME)
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self.last_refresh = None  # 'memory', 'warm' or 'full', for diagnostics
+
+    def snapshot(self, source_mtime=None):
+        """Return the snapshot for the current workbook, rebuilding it if the contents changed"""
+        if source_mtime is None:
+            source_mtime = os.path.getmtime(self.workbook_path)
+        current = self._snapshot
+        if current is not None and current.version == source_mtime:
+            self.last_refresh = 'memory'
+            return current
+        with self._lock:
+            if self._snapshot is None or self._snapshot.version != source_mtime:
+                self._snapshot = self._refresh(source_mtime)
+            return self._snapshot
+
+    def _refresh(self, source_mtime):
+        previous = self._snapshot.table if self._snapshot is not None else self._open_snapshot_file()
+        if previous is not None and self._meta(previous, META_FORMAT_VERSION) == SNAPSHOT_FORMAT_VERSION:
+            # Same mtime means same file; otherwise the hash decides whether a re-save changed anything
+            if self._meta(previous, META_SOURCE_MTIME) == repr(source_mtime):
+                self.last_refresh = 'warm'
+                return CoeSnapshot(previous, source_mtime, self._meta(previous, META_SOURCE_HASH))
+            source_hash = file_digest(self.workbook_path)
+            if self._meta(previous, META_SOURCE_HASH) == source_hash:
+                table = previous.replace_schema_metadata({**previous.schema.metadata,
+                                                          META_SOURCE_MTIME: repr(source_mtime)})
+                self._write_snapshot_file(table)
+                self.last_refresh = 'warm'
+                return CoeSnapshot(self._open_snapshot_file(), source_mtime, source_hash)
+        else:
+            source_hash = file_digest(self.workbook_path)
+
+        table = self._to_arrow(prepare_frame(pd.read_excel(self.workbook_path)))
+        table = table.replace_schema_metadata({
+            META_SOURCE_HASH: source_hash,
+            META_SOURCE_MTIME: repr(source_mtime),
+            META_FORMAT_VERSION: SNAPSHOT_FORMAT_VERSION,
+        })
+        self._write_snapshot_file(table)
+        self.last_refresh = 'full'
+        return CoeSnapshot(self._open_snapshot_file(), source_mtime, source_hash)
+
+    @staticmethod
+    def _to_arrow(df):
+        """Convert to Arrow; mixed-type workbook columns are stored as text"""
+        for column in df.columns:
+            if df[column].dtype == object:
+                try:
+                    pa.array(df[column])
+                except (pa.ArrowInvalid, pa.ArrowTypeError):
+                    df[column] = df[column].map(lambda v: v if pd.isna(v) else str(v)).astype('str')
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        fields = [
+            pa.field(f.name, pa.dictionary(pa.int32(), f.type.value_type)) if pa.types.is_dictionary(f.type) else f
+            for f in table.schema
+        ]
+        return table.cast(pa.schema(fields))
+
+    @staticmethod
+    def _meta(table, key):
+        value = (table.schema.metadata or {}).get(key)
+        return value.decode('utf-8') if value else None
+
+    def _open_snapshot_file(self):
+        """Memory-map the snapshot file; the returned table references the mapped pages directly"""
+        if not os.path.exists(self.snapshot_path):
+            return None
+        try:
+            return ipc.open_file(pa.memory_map(self.snapshot_path, 'r')).read_all()
+        except (pa.ArrowInvalid, OSError):
+            return None  # Corrupt or partial file; rebuilt from the workbook
+
+    def _write_snapshot_file(self, table):
+        """Write to a temporary file and rename, so open memory maps keep seeing the old version"""
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        tmp_path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, self.snapshot_path)
+
+
+def prepare_frame(df):
+    """Clean the raw workbook frame and add the derived date and categorical columns"""
+    df = df.rename(columns=COLUMN_RENAMES)
+    df[DATE_COLUMN] = pd.to_datetime(df[DATE_COLUMN], errors='coerce')
+    for column in CATEGORICAL_COLUMNS:
+        if column in df.columns:
+            values = df[column].fillna(UNKNOWN_VALUE)
+            df[column] = values.where(values.map(type) == str, values.astype(str)).astype('category')
+
+    # Month is ordered by the calendar, so sorting and groupby keep Jan..Dec without a lookup list
+    df = df.assign(**calendar_columns(df[DATE_COLUMN]))
+    df['Month'] = df['Month'].cat.remove_unused_categories()
+    return df
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_coe_store():
+    """Return the process-wide CoE store; both dashboards share it and its snapshot"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = CoeStore()
+    return _store
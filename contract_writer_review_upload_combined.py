@@ -1,14 +1,26 @@
 import streamlit as st
-import google.generativeai as genai
-import re
-from writerai import Writer
 import streamlit_authenticator as stauth
 from dotenv import load_dotenv
 from auth_manager import AuthenticationManager
+from batch_pipeline import BatchPipeline, EXTRACT_CONCURRENCY, PARSE_CONCURRENCY, UPLOAD_CONCURRENCY
+from clients import client_metrics, get_gemini_model, get_writer_client
+from chunked_extraction import extract_document, needs_chunking
+from extraction_cache import ExtractionCache, make_cache_key
+from extraction_prompts import (
+    PROMPT_VERSION, REVIEW_PROMPT, REVIEW_SECTION_NAMES, UPLOAD_PROMPT, UPLOAD_SECTION_NAMES, WRITER_MODEL_NAME
+)
+from job_queue import JobQueue, get_job_workers
+from local_pdf_parser import LOCAL_MAX_FILE_SIZE
+from rate_limiter import get_rate_limiter
+from resilience import WriterCallError, latency_summary
+from section_parser import parse_sections
+from telemetry import start_trace
+from token_accounting import count_tokens, estimate_cost, is_exact
+from writer_extraction import (
+    FileProcessor, extract_info_gemini_vision_review, extract_info_gemini_vision_upload, extract_info_streaming
+)
 from datetime import datetime
 import time
-import pypandoc  # For .doc files (requires pandoc to be installed)
-from docx2python import docx2python
 from streamlit_option_menu import option_menu
 import os
 # Load environment variables
@@ -21,6 +33,14 @@ MODEL_NAME = "gemini-1.5-flash"
 COOKIE_NAME = 'contract_extractor_cookie'
 COOKIE_KEY = "abcde"
 COOKIE_EXPIRY_DAYS = 30
+EXTRACTION_JOB_KIND = 'extraction'
+# Workers import the handler's module, which must not import Streamlit
+JOB_HANDLERS = {EXTRACTION_JOB_KIND: 'writer_extraction:run_extraction_job'}
+JOB_POLL_SECONDS = 2
+# Stages in the order the batch pipeline reports them, so the bar never moves backwards
+JOB_STAGE_PROGRESS = {'queued': 5, 'retrying': 5, 'started': 10, 'parse': 20, 'upload': 35, 'ocr': 50, 'extract': 70,
+                      'done': 100}
+JOB_STAGE_LABELS = {'ocr': 'Reading scanned pages'}
 
 class ContractExtractor:
     def __init__(self):
@@ -47,166 +67,146 @@ class ContractExtractor:
             st.session_state['parsed_text'] = None
         if 'extracted_data' not in st.session_state:
             st.session_state['extracted_data'] = None
+        if 'extracted_sections' not in st.session_state:
+            st.session_state['extracted_sections'] = {}
 
     def setup_api_clients(self):
-        # Initialize Gemini
-        api_key = st.secrets["GEMINI_API_KEY"]
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel(MODEL_NAME)
-
-        # Initialize Writer
-        writer_api_key = st.secrets["WRITER_API_KEY"]
-        self.writer_client = Writer(api_key=writer_api_key)
+        # Clients are built once per process and shared by every rerun and session
+        self.model = get_gemini_model(MODEL_NAME)
+        self.writer_client = get_writer_client()
         self.writer_completion_client = self.writer_client.completions
     
 
-class FileProcessor:
-    def __init__(self, writer_client):
-        self.writer_client = writer_client
-
-    def upload_file_to_writer(self, uploaded_file):
-        try:
-            raw_bytes = uploaded_file.read()
-            if not raw_bytes:
-                raise ValueError("The uploaded file is empty.")
-
-            file_name = uploaded_file.name
-            if not file_name:
-                raise ValueError("The uploaded file has no name.")
-
-            # Check file size
-            file_size = len(raw_bytes)
-            if file_size > 10 * 1024 * 1024:  # 10 MB limit
-                raise ValueError("File size exceeds the maximum allowed limit (10 MB).")
-
-            content_disposition = f'attachment; filename="{file_name}"'
-            content_type = "application/pdf" if file_name.endswith(".pdf") else "application/msword"
-
-            # Upload with increased timeout
-            file_response = self.writer_client.files.upload(
-                content=raw_bytes,
-                content_disposition=content_disposition,
-                content_type=content_type,
-                timeout=60  # Increase timeout to 60 seconds
-            )
-            return file_response.id
-        except Exception as e:
-            st.error(f"File Upload Error: {e}")
-            return f"File Upload Error: {e}"
-
-    def parse_file_with_writer(self, file_id, file_type):
-        try:
-            if file_type == "pdf":
-                response = self.writer_client.tools.parse_pdf(
-                    file_id=file_id,
-                    format="markdown",
-                )
-            else:
-                # For .doc and .docx files, we first extract the text and then send it to the Writer API
-                response = self.writer_client.tools.parse_text(
-                    file_id=file_id,
-                    format="markdown",
-                )
-            return response.content
-        except Exception as e:
-            return f"Error parsing file with Writer Tools API: {e}"
-    @staticmethod
-    def is_file_locked(file_path):
-        """
-        Check if a file is open or locked by another process.
-        """
-        try:
-            # Attempt to open the file in exclusive mode
-            with open(file_path, "a", encoding="utf-8") as f:
-                pass
-            return False  # File is not locked
-        except (IOError, PermissionError):
-            return True  # File is locked
-    @staticmethod
-    def extract_text_from_word_file(uploaded_file):
-        try:
-            file_name = uploaded_file.name
-            if file_name.endswith(".docx"):
-                # Use docx2python to extract text
-                with open("temp.docx", "wb") as f:
-                    f.write(uploaded_file.getbuffer())
-                document = docx2python("temp.docx")
-                full_text = document.text  # Extract all text
-                return full_text
-            elif file_name.endswith(".doc"):
-                # Use pypandoc for .doc files
-                with open("temp.doc", "wb") as f:
-                    f.write(uploaded_file.getbuffer())
-                text = pypandoc.convert_file("temp.doc", "plain")
-                return text
-            else:
-                raise ValueError("Unsupported file format")
-        except Exception as e:
-            return f"Error extracting text from Word file: {e}"
+def show_cache_warnings(extraction_cache):
+    """Show, once, the database errors the extraction cache swallowed"""
+    while extraction_cache.warnings:
+        st.warning(extraction_cache.warnings.pop(0))
 
 
-def process_file(uploaded_file, file_processor, model, auth_manager, writer_completion_client, request_type):
+def process_file(uploaded_file, file_processor, model, auth_manager, writer_completion_client, request_type,
+                 stream_results=False):
     """Process the uploaded file and store results in session state"""
+    rate_limiter = get_rate_limiter()
+    admitted = False
+    trace = None
     try:
         # Initialize progress bar
         progress_text = "Initializing file processing..."
         progress_bar = st.progress(0, text=progress_text)
         
-        start_time = datetime.now()
-        st.session_state['process_start_time'] = start_time
-        
         # Get file size before processing (10% progress)
         progress_bar.progress(10, text="Checking file size...")
         uploaded_file.seek(0, 2)
         filesize = uploaded_file.tell()
         uploaded_file.seek(0)
+        username = st.session_state.get('username')
+        file_type = "pdf" if uploaded_file.name.endswith(".pdf") else "word"
+        trace = start_trace('process', request_type=request_type, file_size=filesize, file_type=file_type,
+                            streamed=stream_results)
+        if filesize > LOCAL_MAX_FILE_SIZE:
+            progress_bar.empty()
+            trace.set_error("file too large")
+            st.error(f"File size exceeds the maximum allowed limit ({LOCAL_MAX_FILE_SIZE // (1024 * 1024)} MB).")
+            return False
+
+        # Return a previous extraction of identical content without any API calls
+        raw_bytes = uploaded_file.getvalue()
+        extraction_cache = ExtractionCache()
+        with trace.span('hash', bytes=filesize):
+            cache_key = make_cache_key(raw_bytes, request_type, PROMPT_VERSION, WRITER_MODEL_NAME)
+        with trace.span('cache_lookup') as lookup_span:
+            cached = extraction_cache.get(cache_key)
+            lookup_span.set(hit=bool(cached))
+        show_cache_warnings(extraction_cache)
+        if cached:
+            progress_bar.progress(100, text="Loaded previous extraction from cache...")
+            parsed_text = cached['parsed_text']
+            st.session_state['parsed_text'] = parsed_text
+            st.session_state['extracted_data'] = cached['extracted_data']
+            with trace.span('section_parse'):
+                st.session_state['extracted_sections'] = parse_extracted_data(cached['extracted_data'], request_type)
+            st.session_state['current_file_name'] = uploaded_file.name
+            st.session_state['upload_time'] = 0.0
+            st.session_state['parse_time'] = 0.0
+            st.session_state['extract_time'] = 0.0
+            st.session_state['first_result_time'] = None
+            st.session_state['total_process_time'] = trace.elapsed()
+
+            if username:
+                auth_manager.log_file_upload(
+                    username=username,
+                    filename=uploaded_file.name,
+                    filesize=filesize,
+                    token_count=count_tokens(parsed_text),
+                    document_length=len(parsed_text),
+                    upload_time=0.0,
+                    parse_time=0.0,
+                    extract_time=0.0,
+                    total_process_time=st.session_state['total_process_time'],
+                    request_type=request_type,
+                    cache_hits=1
+                )
+            progress_bar.empty()
+            return True
         
-        # Check upload timeout (20% progress)
+        # Check upload rate limits (20% progress)
         progress_bar.progress(20, text="Checking upload permissions...")
-        upload_start = datetime.now()
-        username = st.session_state.get('username')
-        can_upload, wait_time = auth_manager.check_upload_timeout(username)
+        can_upload, wait_time, reason = rate_limiter.try_acquire(username)
         
         if not can_upload:
             progress_bar.empty()
-            st.error(f"Please wait {wait_time} seconds before uploading another file.")
+            trace.set_error("rate limited")
+            st.error(f"{reason} Try again in {wait_time} seconds.")
             st.session_state['current_file_name'] = "clear.pdf"
             return False
+        admitted = True
         
-        # Upload to Writer API (40% progress)
-        progress_bar.progress(40, text="Uploading file to processing server...")
-        file_id = file_processor.upload_file_to_writer(uploaded_file)
-        upload_end = datetime.now()
-        st.session_state['upload_time'] = (upload_end - upload_start).total_seconds()
-        
-        if "Error" in str(file_id):
-            progress_bar.empty()
-            st.error(f"File Upload Error: {file_id}")
-            return False
+        parsed_text = None
+        st.session_state['upload_time'] = 0.0
 
-        # Parse file (60% progress)
-        progress_bar.progress(60, text="Parsing file content...")
-        parse_start = datetime.now()
-        
-        file_type = "pdf" if uploaded_file.name.endswith(".pdf") else "word"
         if file_type == "word":
-            # Extract text from .doc or .docx and send it to Writer API
-            parsed_text = file_processor.extract_text_from_word_file(uploaded_file)
+            # Word files are read locally, nothing needs to be uploaded (60% progress)
+            progress_bar.progress(60, text="Parsing file content...")
+            with trace.span('parse', source='local', bytes=filesize) as parse_span:
+                parsed_text = file_processor.extract_text_from_word_file(uploaded_file)
         else:
-            parsed_text = file_processor.parse_file_with_writer(file_id, file_type)
-        
-        parse_end = datetime.now()
-        st.session_state['parse_time'] = (parse_end - parse_start).total_seconds()
-        
+            # Text-layer PDFs are read locally; scanned PDFs fall back to Writer (40% progress)
+            progress_bar.progress(40, text="Reading PDF text...")
+            with trace.span('parse', source='local', bytes=filesize) as parse_span:
+                parsed_text = file_processor.extract_text_from_pdf_locally(raw_bytes)
+        st.session_state['parse_time'] = parse_span.duration
+
+        if parsed_text is None:
+            # Upload to Writer API (40% progress)
+            progress_bar.progress(40, text="Uploading file to processing server...")
+            try:
+                with trace.span('upload', bytes=filesize) as upload_span:
+                    file_id = file_processor.upload_file_to_writer(uploaded_file)
+                st.session_state['upload_time'] = upload_span.duration
+
+                # Parse file (60% progress)
+                progress_bar.progress(60, text="Parsing file content...")
+                with trace.span('parse', source='writer') as parse_span:
+                    parsed_text = file_processor.parse_file_with_writer(file_id, file_type)
+                st.session_state['parse_time'] += parse_span.duration
+            except (ValueError, WriterCallError) as e:
+                progress_bar.empty()
+                trace.set_error(str(e))
+                st.error(f"File Upload Error: {e}")
+                return False
+
         if not parsed_text:
             progress_bar.empty()
+            trace.set_error("empty parse")
             st.error("Error during file parsing")
             return False
+        parse_span.set(chars=len(parsed_text), tokens=count_tokens(parsed_text))
             
         # Check token limit (70% progress)
         progress_bar.progress(70, text="Checking document length...")
         if not auth_manager.check_token_limit(parsed_text):
             progress_bar.empty()
+            trace.set_error("token limit")
             st.session_state['current_file_name'] = "clear.pdf"
             return False
 
@@ -216,28 +216,79 @@ def process_file(uploaded_file, file_processor, model, auth_manager, writer_comp
         
         # Extract information (90% progress)
         progress_bar.progress(90, text="Extracting contract information...")
-        extract_start = datetime.now()
         if request_type == "Review":
-            extracted_data = extract_info_gemini_vision_review(parsed_text, writer_completion_client)
+            extract_fn = extract_info_gemini_vision_review
+            section_names, prompt = REVIEW_SECTION_NAMES, REVIEW_PROMPT
         else:
-            extracted_data = extract_info_gemini_vision_upload(parsed_text, writer_completion_client)
-        extract_end = datetime.now()
-        st.session_state['extract_time'] = (extract_end - extract_start).total_seconds()
+            extract_fn = extract_info_gemini_vision_upload
+            section_names, prompt = UPLOAD_SECTION_NAMES, UPLOAD_PROMPT
+
+        st.session_state['first_result_time'] = None
+        live_view = None
+        try:
+            with trace.span('extract', tokens=count_tokens(parsed_text)) as extract_span:
+                if needs_chunking(parsed_text, prompt):
+                    # Long contracts are split on section headings and extracted in parallel
+                    progress_bar.progress(90, text="Extracting contract information in parallel sections...")
+                    extract_span.set(chunked=True)
+                    extracted_data = extract_document(
+                        parsed_text,
+                        lambda text: extract_fn(text, writer_completion_client),
+                        section_names,
+                        prompt
+                    )
+                elif stream_results:
+                    # Fill each section in as soon as the streamed completion closes it
+                    live_view = st.empty()
+                    with live_view.container():
+                        placeholders = create_live_section_view(request_type)
+
+                    def on_section_complete(section_name, content):
+                        if st.session_state['first_result_time'] is None:
+                            st.session_state['first_result_time'] = time.perf_counter() - extract_span.start
+                        render_live_section(placeholders[section_name], content)
+
+                    extracted_data = extract_info_streaming(
+                        parsed_text, writer_completion_client, request_type, on_section_complete
+                    )
+                    live_view.empty()
+                else:
+                    extracted_data = extract_fn(parsed_text, writer_completion_client)
+                extract_span.set(output_chars=len(extracted_data or ''))
+        except WriterCallError as e:
+            # Failed extractions are reported, never cached
+            if live_view is not None:
+                live_view.empty()
+            progress_bar.empty()
+            trace.set_error(str(e))
+            st.error(f"Error querying Writer API: {e}")
+            return False
+        st.session_state['extract_time'] = extract_span.duration
         
         if not extracted_data:
             progress_bar.empty()
+            trace.set_error("empty extraction")
             st.error("Error during information extraction.")
             return False
         else:
            st.session_state['extracted_data'] = extracted_data    
+           with trace.span('section_parse'):
+               st.session_state['extracted_sections'] = parse_extracted_data(extracted_data, request_type)
+
+        # Word files that could not be read come back as error text and are not cached
+        if not parsed_text.startswith("Error"):
+            extraction_cache.put(cache_key, parsed_text, extracted_data)
+            show_cache_warnings(extraction_cache)
 
         # Finalize processing (100% progress)
         progress_bar.progress(100, text="Finalizing processing...")
         st.session_state['current_file_name'] = uploaded_file.name
 
         # Calculate metrics
-        token_count = len(parsed_text) / 4
+        token_count = count_tokens(parsed_text)
         document_length = len(parsed_text)
+        # Measured before logging, so the logged total is this run's
+        st.session_state['total_process_time'] = trace.elapsed()
 
         # Log the upload
         if username:
@@ -250,24 +301,151 @@ def process_file(uploaded_file, file_processor, model, auth_manager, writer_comp
                 upload_time=st.session_state.get('upload_time'),
                 parse_time=st.session_state.get('parse_time'),
                 extract_time=st.session_state.get('extract_time'),
-                total_process_time=st.session_state.get('total_process_time'),
-                request_type=request_type  # Add this line
+                total_process_time=st.session_state['total_process_time'],
+                request_type=request_type,  # Add this line
+                cache_misses=1,
+                first_result_time=st.session_state.get('first_result_time')
             )
-            
-        total_time = (datetime.now() - start_time).total_seconds()
-        st.session_state['total_process_time'] = total_time
         
         # Clear progress bar after completion
-        time.sleep(1)
         progress_bar.empty()
         return True
         
     except Exception as e:
         if 'progress_bar' in locals():
             progress_bar.empty()
+        if trace is not None:
+            trace.set_error(str(e))
         st.error(f"Error processing file: {e}")
         return False
+    finally:
+        if trace is not None:
+            trace.finish()
+        if admitted:
+            rate_limiter.release()
     
+def get_job_queue():
+    """Job queue for background extractions; starts the worker processes once per server process"""
+    get_job_workers(JOB_HANDLERS)
+    return JobQueue()
+
+
+def is_cached(uploaded_file, request_type):
+    """True when the extraction cache already holds this file, so it loads without a background job"""
+    cache_key = make_cache_key(uploaded_file.getvalue(), request_type, PROMPT_VERSION, WRITER_MODEL_NAME)
+    extraction_cache = ExtractionCache()
+    cached = extraction_cache.get(cache_key)
+    show_cache_warnings(extraction_cache)
+    return cached is not None
+
+
+def submit_background_job(uploaded_file, request_type):
+    """Queue the file for the worker processes; returns the job id, or None if it was refused"""
+    if uploaded_file.size > LOCAL_MAX_FILE_SIZE:
+        st.error(f"File size exceeds the maximum allowed limit ({LOCAL_MAX_FILE_SIZE // (1024 * 1024)} MB).")
+        return None
+
+    username = st.session_state.get('username')
+    rate_limiter = get_rate_limiter()
+    # Queued jobs hold no in-flight slot: workers stop claiming once MAX_IN_FLIGHT_EXTRACTIONS jobs are running
+    can_upload, wait_time, reason = rate_limiter.try_acquire(username, hold_slot=False)
+    if not can_upload:
+        st.error(f"{reason} Try again in {wait_time} seconds.")
+        return None
+
+    raw_bytes = uploaded_file.getvalue()
+    return get_job_queue().submit(
+        EXTRACTION_JOB_KIND,
+        raw_bytes,
+        username=username,
+        file_name=uploaded_file.name,
+        request_type=request_type,
+        # A re-upload of the same file while it is still processing attaches to the running job
+        dedupe_key=make_cache_key(raw_bytes, request_type, PROMPT_VERSION, WRITER_MODEL_NAME)
+    )
+
+
+def run_background_job(uploaded_file, request_type):
+    """Submit each upload once per session and show its progress until the results are loaded"""
+    # Keyed by upload rather than file name, so uploading the same file again after a failure starts a new job
+    upload_key = (uploaded_file.file_id, request_type)
+    active_job = st.session_state.get('active_job')
+    if active_job is None or active_job['key'] != upload_key:
+        job_id = submit_background_job(uploaded_file, request_type)
+        if job_id is None:
+            return
+        active_job = {'job_id': job_id, 'key': upload_key}
+        st.session_state['active_job'] = active_job
+
+    job = get_job_queue().get(active_job['job_id'])
+    if job is None:
+        st.session_state['active_job'] = None
+        st.error("The background job could not be found. Please upload the file again.")
+    elif job['status'] == 'error':
+        st.error(f"Error processing file after {job['attempts']} attempt(s): {job['error']}")
+        if st.button("Try again"):
+            st.session_state['active_job'] = None
+            st.rerun()
+    else:
+        show_job_progress(active_job['job_id'])
+
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def show_job_progress(job_id):
+    """Poll the job without rerunning the whole page; the page reruns once the results are in"""
+    job = get_job_queue().get(job_id)
+    if job is None or job['status'] in ('done', 'error'):
+        if job is not None and job['status'] == 'done':
+            load_job_results(job)
+        st.rerun()
+    stage = job['stage'] or job['status']
+    label = JOB_STAGE_LABELS.get(stage, stage.capitalize())
+    st.progress(JOB_STAGE_PROGRESS.get(stage, 0), text=f"{job['file_name']}: {label}...")
+    if job['attempts'] and job['status'] == 'queued':
+        st.caption(f"Attempt {job['attempts']} of {job['max_attempts']} failed ({job['error']}); retrying shortly.")
+    st.caption("Processing continues in the background if you leave this page.")
+
+
+def load_job_results(job):
+    """Put a finished job's results where process_file would have, so display_results can show them"""
+    result = job['result']
+    st.session_state['parsed_text'] = result['parsed_text']
+    st.session_state['extracted_data'] = result['extracted_data']
+    st.session_state['extracted_sections'] = parse_extracted_data(result['extracted_data'], job['request_type'])
+    st.session_state['current_file_name'] = job['file_name']
+    st.session_state['upload_time'] = result['upload_time']
+    st.session_state['parse_time'] = result['parse_time']
+    st.session_state['extract_time'] = result['extract_time']
+    st.session_state['first_result_time'] = None
+    st.session_state['total_process_time'] = result['total_time']
+    st.session_state['active_job'] = None
+
+
+def display_background_jobs():
+    """The user's recent background jobs, persisted across sessions"""
+    username = st.session_state.get('username')
+    if not username:
+        return
+    jobs = get_job_queue().list_for_user(username)
+    if not jobs:
+        return
+    import pandas as pd
+
+    with st.sidebar.expander("🗂️ Background jobs", expanded=False):
+        st.dataframe(pd.DataFrame([
+            {
+                'File Name': job['file_name'],
+                'Request Type': job['request_type'],
+                'Status': job['status'].capitalize(),
+                'Stage': job['stage'],
+                'Attempts': job['attempts'],
+                'Submitted': datetime.fromtimestamp(job['created_at']).strftime('%Y-%m-%d %H:%M'),
+            }
+            for job in jobs
+        ]), use_container_width=True, hide_index=True)
+        st.caption("Upload a finished file again to open its results instantly.")
+
+
 def load_css(css_file):
     current_dir = os.path.dirname(os.path.abspath(__file__))
     css_path = os.path.join(current_dir, css_file)
@@ -349,7 +527,17 @@ def main():
     else:
         request_label = "Upload a Contract"
     st.sidebar.divider()
+    batch_mode = st.sidebar.toggle("Batch mode", help="Process several contracts at once")
+    if batch_mode:
+        st.header(f"{request_label}s (Batch)")
+        run_batch_mode(file_processor, auth_manager, extractor.writer_completion_client, request_type)
+        return
+
     st.header(request_label)
+    background = st.sidebar.toggle("Process in background", value=True,
+                                   help="Keep processing if the page reruns or the tab is closed")
+    stream_results = not background and st.sidebar.toggle("Stream results", value=True,
+                                                          help="Show each section as soon as it has been extracted")
     uploaded_file = st.sidebar.file_uploader("Upload File", type=FILE_REVIEW_TYPES)
 
     st.sidebar.divider()
@@ -358,25 +546,213 @@ def main():
         st.error("Please upload a contract PDF, or DOCX to begin.")
         return
     
+    if background:
+        display_background_jobs()
+
     # Check if we need to process a new file
     if (st.session_state['current_file_name'] != uploaded_file.name and 
         uploaded_file is not None):
+        if background and not is_cached(uploaded_file, request_type):
+            # The page only polls; the job keeps running if this session goes away
+            run_background_job(uploaded_file, request_type)
+            return
         with st.spinner("Processing file..."):
-            success = process_file(uploaded_file, file_processor, extractor.model, auth_manager, extractor.writer_completion_client, request_type)
+            success = process_file(uploaded_file, file_processor, extractor.model, auth_manager, extractor.writer_completion_client, request_type,
+                                   stream_results=stream_results)
             if not success:
                 return
 
     # Display results if we have them
     if st.session_state['parsed_text'] and st.session_state['extracted_data']:
-        display_results(request_type)
+        with start_trace('render', request_type=request_type, chars=len(st.session_state['parsed_text'])):
+            display_results(request_type, auth_manager)
 
     
 
 
-def display_results(request_type):
+def run_batch_mode(file_processor, auth_manager, writer_completion_client, request_type):
+    """Upload several files, run them through the batch pipeline and show results as they finish"""
+    uploaded_files = st.sidebar.file_uploader("Upload Files", type=FILE_REVIEW_TYPES, accept_multiple_files=True)
+
+    with st.sidebar.expander("⚙️ Batch settings", expanded=False):
+        upload_concurrency = st.number_input("Parallel uploads", min_value=1, max_value=16, value=UPLOAD_CONCURRENCY)
+        parse_concurrency = st.number_input("Parallel parses", min_value=1, max_value=16, value=PARSE_CONCURRENCY)
+        extract_concurrency = st.number_input("Parallel extractions", min_value=1, max_value=16, value=EXTRACT_CONCURRENCY)
+
+    st.sidebar.divider()
+
+    if not uploaded_files:
+        st.error("Please upload one or more contract PDF or DOCX files to begin.")
+        return
+
+    batch_key = (request_type, tuple((f.name, f.size) for f in uploaded_files))
+    if st.session_state.get('batch_key') != batch_key:
+        if not st.sidebar.button(f"Process {len(uploaded_files)} file(s)", type="primary"):
+            st.info(f"{len(uploaded_files)} file(s) ready. Click **Process** in the sidebar to start.")
+            return
+        if not process_batch(uploaded_files, file_processor, auth_manager, writer_completion_client, request_type,
+                             upload_concurrency, parse_concurrency, extract_concurrency):
+            return
+        st.session_state['batch_key'] = batch_key
+
+    display_batch_results(request_type)
+
+
+def process_batch(uploaded_files, file_processor, auth_manager, writer_completion_client, request_type,
+                  upload_concurrency, parse_concurrency, extract_concurrency):
+    """Run the batch pipeline, streaming each finished document into the page"""
+    username = st.session_state.get('username')
+    rate_limiter = get_rate_limiter()
+    # The batch is admitted once; each document then holds an in-flight slot per Writer stage
+    can_upload, wait_time, reason = rate_limiter.try_acquire(username, hold_slot=False)
+    if not can_upload:
+        st.error(f"{reason} Try again in {wait_time} seconds.")
+        return False
+    return _run_batch(uploaded_files, file_processor, auth_manager, writer_completion_client, request_type,
+                      upload_concurrency, parse_concurrency, extract_concurrency, username, rate_limiter)
+
+
+def _run_batch(uploaded_files, file_processor, auth_manager, writer_completion_client, request_type,
+               upload_concurrency, parse_concurrency, extract_concurrency, username, rate_limiter):
+
+    if request_type == "Review":
+        extract_fn = extract_info_gemini_vision_review
+        section_names = REVIEW_SECTION_NAMES
+        display_fn = display_extracted_information_review
+    else:
+        extract_fn = extract_info_gemini_vision_upload
+        section_names = UPLOAD_SECTION_NAMES
+        display_fn = display_extracted_information_upload
+
+    pipeline = BatchPipeline(
+        file_processor,
+        lambda text: extract_fn(text, writer_completion_client),
+        section_names,
+        request_type,
+        upload_concurrency=upload_concurrency,
+        parse_concurrency=parse_concurrency,
+        extract_concurrency=extract_concurrency,
+        rate_limiter=rate_limiter
+    )
+    documents = [(f.name, f.getvalue()) for f in uploaded_files]
+
+    progress_bar = st.progress(0, text=f"Processing {len(documents)} files...")
+    status_placeholder = st.empty()
+    live_placeholder = st.empty()
+    live_results = live_placeholder.container()
+
+    batch_start = time.perf_counter()
+    results = []
+    for result in pipeline.run(documents):
+        results.append(result)
+        progress_bar.progress(len(results) / len(documents),
+                              text=f"Processed {len(results)} of {len(documents)} files...")
+        status_placeholder.dataframe(batch_status_frame(results), use_container_width=True, hide_index=True)
+
+        if result['status'] == 'done':
+            result['sections'] = parse_extracted_data(result['extracted_data'], request_type)
+
+        with live_results:
+            st.markdown(f"#### {result['filename']}")
+            # Pipeline threads cannot call Streamlit, so their cache warnings are shown here
+            for warning in result['warnings']:
+                st.warning(warning)
+            if result['status'] == 'done':
+                display_fn(result['sections'])
+            else:
+                st.error(result['error'])
+
+        if username and result['status'] == 'done':
+            auth_manager.log_file_upload(
+                username=username,
+                filename=result['filename'],
+                filesize=result['filesize'],
+                token_count=result['token_count'],
+                document_length=len(result['parsed_text']),
+                upload_time=result['upload_time'],
+                parse_time=result['parse_time'],
+                extract_time=result['extract_time'],
+                total_process_time=result['total_time'],
+                request_type=request_type,
+                cache_hits=int(result['cache_hit']),
+                cache_misses=int(not result['cache_hit'])
+            )
+
+    batch_time = time.perf_counter() - batch_start
+    completed = [r for r in results if r['status'] == 'done']
+
+    # One summary row for the whole batch, next to the per-file rows
+    if username:
+        auth_manager.log_file_upload(
+            username=username,
+            filename=f"Batch of {len(results)} files ({len(completed)} succeeded)",
+            filesize=sum(r['filesize'] for r in results),
+            token_count=sum(r['token_count'] for r in completed),
+            document_length=sum(len(r['parsed_text']) for r in completed),
+            upload_time=sum(r['upload_time'] for r in results),
+            parse_time=sum(r['parse_time'] for r in results),
+            extract_time=sum(r['extract_time'] for r in results),
+            total_process_time=batch_time,
+            request_type=f"{request_type} Batch",
+            cache_hits=sum(1 for r in results if r['cache_hit']),
+            cache_misses=sum(1 for r in results if not r['cache_hit'])
+        )
+
+    st.session_state['batch_results'] = results
+    st.session_state['batch_time'] = batch_time
+    progress_bar.empty()
+    status_placeholder.empty()
+    live_placeholder.empty()
+    return True
+
+
+def batch_status_frame(results):
+    """One status row per processed document"""
+    import pandas as pd
+
+    return pd.DataFrame([
+        {
+            'File Name': r['filename'],
+            'Status': ('Cached' if r['cache_hit'] else 'Done') if r['status'] == 'done' else 'Failed',
+            'Upload Time': round(r['upload_time'], 2),
+            'Parse Time': round(r['parse_time'], 2),
+            'Extract Time': round(r['extract_time'], 2),
+            'Total Time': round(r['total_time'], 2),
+            'Error': r['error'] or ''
+        }
+        for r in results
+    ])
+
+
+def display_batch_results(request_type):
+    """Display the stored batch results with a per-document viewer"""
+    results = st.session_state.get('batch_results') or []
+    completed = [r for r in results if r['status'] == 'done']
+
+    st.success(f"Processed {len(completed)} of {len(results)} files in {st.session_state.get('batch_time', 0):.1f}s")
+    st.dataframe(batch_status_frame(results), use_container_width=True, hide_index=True)
+
+    if not completed:
+        return
+
+    selected_index = st.selectbox("View document", range(len(completed)),
+                                  format_func=lambda i: completed[i]['filename'])
+    selected = completed[selected_index]
+
+    tab1, tab2 = st.tabs(["Extracted Information", "Raw Text"])
+    with tab1:
+        if request_type == "Review":
+            display_extracted_information_review(selected['sections'])
+        else:
+            display_extracted_information_upload(selected['sections'])
+    with tab2:
+        st.code(selected['parsed_text'], language="html", wrap_lines=True)
+
+
+def display_results(request_type, auth_manager):
     """Display the processed results"""
     parsed_text = st.session_state['parsed_text']
-    extracted_data = st.session_state['extracted_data']
+    extracted_sections = st.session_state['extracted_sections']
 
     st.success("PDF processed successfully!")
     
@@ -386,9 +762,9 @@ def display_results(request_type):
     # Tab 1: Extracted Information
     with tab1:
         if request_type == "Review":
-            display_extracted_information_review(extracted_data)
+            display_extracted_information_review(extracted_sections)
         else:
-            display_extracted_information_upload(extracted_data)
+            display_extracted_information_upload(extracted_sections)
     # Tab 2: Raw Text
     with tab2:
         st.markdown("### Raw Extracted Text")
@@ -396,15 +772,14 @@ def display_results(request_type):
         
     # Tab 3: Upload History
     with tab3:
-        display_upload_history()
+        display_upload_history(auth_manager)
     
     # Display token statistics in sidebar
-    display_token_statistics(parsed_text)
+    display_token_statistics(parsed_text, request_type)
 
-def display_upload_history():
+def display_upload_history(auth_manager):
     """Display upload history in a formatted table"""
     if st.session_state.get('username'):
-        auth_manager = AuthenticationManager()
         logs = auth_manager.get_user_logs(username=st.session_state['username'])
         
         if logs:
@@ -419,6 +794,7 @@ def display_upload_history():
             df['filesize'] = df['filesize'].apply(lambda x: f"{x/1024:.1f} KB")
             df['token_count'] = df['token_count'].apply(lambda x: f"{x:,}")
             df['document_length'] = df['document_length'].apply(lambda x: f"{x:,}")
+            df['cache_hits'] = df['cache_hits'].apply(lambda x: "Yes" if x else "No")
             
             # Rename columns for display
             df = df.rename(columns={
@@ -431,13 +807,16 @@ def display_upload_history():
                 'parse_time': 'Parse Time',
                 'extract_time': 'Extract Time',
                 'total_time': 'Total Time',
-                'request_type': 'Request Type'
+                'request_type': 'Request Type',
+                'cache_hits': 'Cache Hit',
+                'first_result_time': 'First Result Time'
 
             })
             
             # Reorder columns and drop ID
             columns_order = ['File Name', 'File Size', 'Request Type', 'Tokens', 'Document Length', 
-                           'Upload Date', 'Upload Time', 'Parse Time', 'Extract Time', 'Total Time']
+                           'Upload Date', 'Upload Time', 'Parse Time', 'First Result Time', 'Extract Time', 'Total Time',
+                           'Cache Hit']
             df = df[columns_order]
             
             st.markdown("### Upload History")
@@ -461,490 +840,92 @@ def display_upload_history():
         st.warning("Please log in to view upload history")
 
 
-def extract_info_gemini_vision_review(parsed_text, writer_completion_client):
-    prompt = """Analyze the provided contract document and extract the following information, highlighting relevant clauses, keywords, and details:
+def create_live_section_view(request_type):
+    """Create one placeholder per section, grouped like the final view, to fill in while streaming"""
+    section_titles = REVIEW_SECTION_TITLES if request_type == "Review" else UPLOAD_SECTION_TITLES
+    placeholders = {}
+    for title, section_names in group_sections_by_title(section_titles).items():
+        with st.expander(title, expanded=True):
+            for section_name in section_names:
+                placeholders[section_name] = st.empty()
+                placeholders[section_name].caption(f"Extracting {section_name}...")
+    return placeholders
+
+
+def render_live_section(placeholder, content):
+    with placeholder.container():
+        st.markdown(content['results'], unsafe_allow_html=True)
+        st.code(content['raw'], wrap_lines=True, language="html")
+
+
+# Display title for each review section; sections sharing a title share an expander
+REVIEW_SECTION_TITLES = {
+    'Payment Terms': '💰 Financial Terms',
+    'Rate Cards': '💰 Financial Terms',
+    'Travel and Expense Policies': '✈️ Travel & Expenses',
+    'Diverse Supplier Provisions': '🤝 Supplier Relations',
+    'Termination Clauses': '📋 Contract Terms',
+    'Limitation of Liability': '⚖️ Legal Provisions',
+    'Data Privacy': '🔒 Privacy & Security',
+    'Insurance Provisions': '🛡️ Insurance & Compliance',
+    'Background Check/Drug Screening': '🛡️ Insurance & Compliance',
+}
+
+# Display title for each upload section
+UPLOAD_SECTION_TITLES = {
+    'Service': '🏢 WTW and client info',
+    'Signed Date': '🏢 WTW and client info',
+    'Effectivity Date': '📅 Contract Duration',
+    'Expiration': '📅 Contract Duration',
+    'Termination': '⛔ Termination',
+    'Renewal': '🔄 Auto Renewal',
+    'Data privacy': '🔒 Data privacy Link',
+    'Higher Level': '📜 With a higher level agreement',
+}
+
+
+def group_sections_by_title(section_titles):
+    """Group section names by their display titles, keeping definition order"""
+    grouped_sections = {}
+    for section_name, title in section_titles.items():
+        grouped_sections.setdefault(title, []).append(section_name)
+    return grouped_sections
 
-1. Payment Terms
-Description: Identify payment terms, including standard periods (e.g., 30 days), conditions for exceeding terms, and invoice requirements. Highlight any deviations from the standard policy.
-Keywords: Pay, Payable, Invoice, Net.
-Sample Format:
-a.) Payment due within [X] days of receipt of a correct invoice.
-b.) Any deviations require [specific approval or conditions].
-
-2. Rate Cards
-Description: Extract details about rate cards, hourly rate structures, and personnel-based fees. Reference any rate tables.
-Keywords: Rate, Rate Cards, Hourly.
-Sample Format:
-a.) Fee structure for hourly rates based on personnel levels, types of work, and geographical regions.
-b.) Provide examples where applicable, including rate tables or caps.
-
-3. Client Travel and Expense Policy
-Description: Identify clauses related to travel and expense reimbursement. Note if the client's travel policy applies and highlight any restrictions or exceptions.
-Keywords: Expense, Travel, Expense Policy, Travel Guide.
-Sample Format:
-a.) Reimbursement terms for travel-related expenses, including approvals and documentation requirements.
-b.) Policies about economy fares, preferred accommodations, and non-reimbursable items.
-
-
-4. Diverse Supplier Provisions
-Description: Highlight provisions encouraging the use of diverse suppliers and related reporting requirements.
-Keywords: Diversity, Diverse Supplier, Inclusion.
-Sample Format:
-a.) Include language supporting diverse supplier inclusion and any reporting requirements (e.g., quarterly reports).
-
-
-5. Termination Clauses
-Description: Identify terms for termination, including "termination for convenience" or "material breach." Highlight any fees or specific conditions.
-Keywords: Termination for convenience, Termination without cause, Material breach.
-Sample Format:
-a.) Right to terminate with [X] days' notice or under specific conditions.
-b.) Associated termination fees, if any, and their calculation.
-
-
-6. Limitation of Liability
-Description: Extract limitations of liability clauses, including standard caps or carveouts.
-Keywords: Indirect damage exclusion, Mutual limits, Super cap.
-Sample Format:
-a.) Liability capped at [X] or a multiple of fees paid within a specific timeframe.
-b.) Uncapped liability for specific scenarios, such as gross negligence.
-
-
-7. Data Privacy
-Description: Summarize data privacy obligations, including compliance with regulations like GDPR or specific client data protection requirements.
-Keywords: Data Privacy, Data Processing, GDPR.
-Sample Format:
-a.) Outline responsibilities for protecting personal data and compliance with regulations.
-b.) Highlight any cross-border data restrictions or notification obligations in case of breaches.
-
-
-8. Insurance Provisions
-Description: Highlight insurance coverage requirements, including limits and types of coverage (e.g., liability, workers' compensation).
-Keywords: Insurance, Coverage.
-Sample Format:
-a.)Required insurance types and coverage limits.
-b.) Period of coverage and renewal obligations.
-
-
-9. Background Check/Drug Screening
-Description: Extract clauses requiring background checks or drug testing. Note any restrictions or client-specific requirements.
-Keywords: Background check, Drug, Alcohol testing.
-Sample Format:
-a.) Requirements for background checks or drug screening, including specific roles or access levels.
-
-
-
-Additional Instructions:
-
-                1. Analyze the attached contracts and extract relevant information. Ensure that the section numbers and names are accurately provided only if explicitly mentioned in the document and are directly relevant to the extracted content. If section numbers are absent or irrelevant, exclude them from the output. The focus should be on providing precise, contextually relevant details based solely on the content of the document.
-
-                2. For each of the above, only output the relevant text that was parsed from the document and format the output in the following format using these tags.
-                - In the raw relevant text thaw will be extracted if section numbers or section names are available include them in the export
-
-[Payment Terms]
-[results]
-<b>Payment Terms:</b> <Summary of payment terms> <br>
-<span style="font-size: 13px;font-style: italic;">Section no.(s): [section number(s)]<br> Section Name(s): [section name(s)]</span>
-[raw extracted]
-<relevant text from the payment terms section>
-[Payment Terms]
-
-[Rate Cards]
-[results]
-<b>Rate Cards:</b> <Summary of rate card terms> <br>
-<span style="font-size: 13px;font-style: italic;">Section no.(s): [section number(s)]<br> Section Name(s): [section name(s)]</span>
-[raw extracted]
-<relevant text from the rate cards section>
-[Rate Cards]
-
-[Travel and Expense Policies]
-[results]
-<b>Travel and Expense Policies:</b> <Summary of travel and expense policy terms> <br>
-<span style="font-size: 13px;font-style: italic;">Section no.(s): [section number(s)]<br> Section Name(s): [section name(s)]</span>
-[raw extracted]
-<relevant text from the travel and expense policies section>
-[Travel and Expense Policies]
-
-[Diverse Supplier Provisions]
-[results]
-<b>Diverse Supplier Provisions:</b> <Summary of diverse supplier clauses> <br>
-<span style="font-size: 13px;font-style: italic;">Section no.(s): [section number(s)]<br> Section Name(s): [section name(s)]</span>
-[raw extracted]
-<relevant text from the diverse supplier provisions section>
-[Diverse Supplier Provisions]
-
-[Termination Clauses]
-[results]
-<b>Termination Clauses:</b> <Summary of termination clauses> <br>
-<span style="font-size: 13px;font-style: italic;">Section no.(s): [section number(s)]<br> Section Name(s): [section name(s)]</span>
-[raw extracted]
-<relevant text from the termination clauses section>
-[Termination Clauses]
-
-[Limitation of Liability]
-[results]
-<b>Limitation of Liability:</b> <Summary of liability limitations> <br>
-<span style="font-size: 13px;font-style: italic;">Section no.(s): [section number(s)]<br> Section Name(s): [section name(s)]</span>
-[raw extracted]
-<relevant text from the limitation of liability section>
-[Limitation of Liability]
-
-[Data Privacy]
-[results]
-<b>Data Privacy:</b> <Summary of data privacy clauses> <br>
-<span style="font-size: 13px;font-style: italic;">Section no.(s): [section number(s)]<br> Section Name(s): [section name(s)]</span>
-[raw extracted]
-<relevant text from the data privacy section>
-[Data Privacy]
-
-[Insurance Provisions]
-[results]
-<b>Insurance Provisions:</b> <Summary of insurance provisions> <br>
-<span style="font-size: 13px;font-style: italic;">Section no.(s): [section number(s)]<br> Section Name(s): [section name(s)]</span>
-[raw extracted]
-<relevant text from the insurance provisions section>
-[Insurance Provisions]
-
-[Background Check/Drug Screening]
-[results]
-<b>Background Check/Drug Screening:</b> <Summary of background check or drug screening terms> <br>
-<span style="font-size: 13px;font-style: italic;">Section no.(s): [section number(s)]<br> Section Name(s): [section name(s)]</span>
-[raw extracted]
-<relevant text from the background check/drug screening section>
-[Background Check/Drug Screening]
-
-Note: The Service Provider is always Towers Watson or Willis Towers Watson. 
-"""
 
-    try:
-        completion = writer_completion_client.create(
-            model="palmyra-x-004",
-            prompt=f"{prompt}\n\nDocument Content:\n{parsed_text}",
-            #max_tokens=50000,
-            temperature=0.0,
-            stream=False
-        )
-        return completion.choices[0].text
-    except Exception as e:
-        return f"Error querying Writer API: {e}"
-
-def display_extracted_information_review(extracted_data):
-    # Define sections with their patterns and display titles
-    sections = {
-        'Payment Terms': {
-            'title': '💰 Financial Terms',
-            'pattern': r'\[Payment Terms\]\s+\[results\]\s+<b>Payment Terms:</b>.*?\[raw extracted\].*?\[Payment Terms\]',
-            'expanded': False
-        },
-        'Rate Cards': {
-            'title': '💰 Financial Terms',
-            'pattern': r'\[Rate Cards\]\s+\[results\]\s+<b>Rate Cards:</b>.*?\[raw extracted\].*?\[Rate Cards\]',
-            'expanded': False
-        },
-        'Travel and Expense Policies': {
-            'title': '✈️ Travel & Expenses',
-            'pattern': r'\[Travel and Expense Policies\]\s+\[results\]\s+<b>Travel and Expense Policies:</b>.*?\[raw extracted\].*?\[Travel and Expense Policies\]',
-            'expanded': False
-        },
-        'Diverse Supplier Provisions': {
-            'title': '🤝 Supplier Relations',
-            'pattern': r'\[Diverse Supplier Provisions\]\s+\[results\]\s+<b>Diverse Supplier Provisions:</b>.*?\[raw extracted\].*?\[Diverse Supplier Provisions\]',
-            'expanded': False
-        },
-        'Termination Clauses': {
-            'title': '📋 Contract Terms',
-            'pattern': r'\[Termination Clauses\]\s+\[results\]\s+<b>Termination Clauses:</b>.*?\[raw extracted\].*?\[Termination Clauses\]',
-            'expanded': False
-        },
-        'Limitation of Liability': {
-            'title': '⚖️ Legal Provisions',
-            'pattern': r'\[Limitation of Liability\]\s+\[results\]\s+<b>Limitation of Liability:</b>.*?\[raw extracted\].*?\[Limitation of Liability\]',
-            'expanded': False
-        },
-        'Data Privacy': {
-            'title': '🔒 Privacy & Security',
-            'pattern': r'\[Data Privacy\]\s+\[results\]\s+<b>Data Privacy:</b>.*?\[raw extracted\].*?\[Data Privacy\]',
-            'expanded': False
-        },
-        'Insurance Provisions': {
-            'title': '🛡️ Insurance & Compliance',
-            'pattern': r'\[Insurance Provisions\]\s+\[results\]\s+<b>Insurance Provisions:</b>.*?\[raw extracted\].*?\[Insurance Provisions\]',
-            'expanded': False
-        },
-        'Background Check/Drug Screening': {
-            'title': '🛡️ Insurance & Compliance',
-            'pattern': r'\[Background Check/Drug Screening\]\s+\[results\]\s+<b>Background Check/Drug Screening:</b>.*?\[raw extracted\].*?\[Background Check/Drug Screening\]',
-            'expanded': False
-        }
-    }
-
-    def extract_content(text, section_name):
-        pattern = sections[section_name]['pattern']
-        match = re.search(pattern, text, re.DOTALL)
-        if match:
-            full_text = match.group(0)
-            results_match = re.search(r'\[results\]\s+(.*?)\s+\[raw extracted\]', full_text, re.DOTALL)
-            raw_match = re.search(r'\[raw extracted\]\s+(.*?)\s+\[' + section_name + '\]', full_text, re.DOTALL)
-            
-            if results_match and raw_match:
-                return {
-                    'results': results_match.group(1).strip(),
-                    'raw': raw_match.group(1).strip()
-                }
-        return None
+def parse_extracted_data(extracted_data, request_type):
+    """Parse the completion markup once; the display functions only render the result"""
+    section_names = REVIEW_SECTION_NAMES if request_type == "Review" else UPLOAD_SECTION_NAMES
+    return parse_sections(extracted_data, section_names)
 
-    # Group sections by their display titles
-    grouped_sections = {}
-    for section_name, section_info in sections.items():
-        title = section_info['title']
-        if title not in grouped_sections:
-            grouped_sections[title] = []
-        grouped_sections[title].append(section_name)
 
+def display_extracted_information_review(extracted_sections):
     # Display sections grouped by title
-    for title, section_names in grouped_sections.items():
+    for title, section_names in group_sections_by_title(REVIEW_SECTION_TITLES).items():
         with st.expander(title, expanded=False):
             for section_name in section_names:
-                content = extract_content(extracted_data, section_name)
+                content = extracted_sections.get(section_name)
                 if content:
                     st.markdown(content['results'], unsafe_allow_html=True)
                     st.code(content['raw'], wrap_lines=True, language="html")
                 else:
                     st.write(f"No information found for {section_name}")
-    #st.code(extracted_data)
-
-def extract_info_gemini_vision_upload(parsed_text, writer_completion_client):
-    prompt = f"""
-            Analyze the following contract document below and extract the following information: 
-
-    1. Termination Notice No. of Days: Specify the termination notice period mentioned in the contract. Include whether the notice is for cause or without cause, and highlight any associated termination fees or conditions.
-    2. Auto Renewal Clause: Determine if the contract includes an auto-renewal clause. If present, provide details about the clause, including the notice period required to prevent renewal.
-    3. Signed Date of the Client: Extract the date when the client signed the contract (if available in the document).
-    4. Effective Date: Identify and extract the effective date of the agreement. Include details about initial terms and any mentioned renewal periods.
-    5. Service Provider: Extract the name of the vendor or service provider involved in the agreement, including any affiliated entities referenced. Start by examining the signed section of the document for the entity name. If the service provider is not found in the signed section, check other sections of the document, such as the introduction, definitions, or relevant clauses, for mentions of the vendor or its affiliated entities.
-    6. Data Privacy Link: Search for the presence of the specific link mentioned in the contract: https://www.willistowerswatson.com/en-gb/notices/global-data-processing-protocol. If it exists, extract it; if not, indicate as no Data Privacy link found.
-    7. Associated or connected with a Higher-Level Agreement: Identify whether the contract references another related or higher-level agreement, such as a Master Services Agreement (MSA). 
-    For example, clauses such as:
-    "The services described in this Scope of Work will be provided subject to the Master Services Agreement (MSA) between service provider and client dated (date agreement) and any subsequent amendments." 
-    Extract such references if available and dont be to specific from this example find something like this.
-
-    8. Duration or Expiration Date: Extract the duration of the contract, including its start date and end date or Provide any information related to the expiration date or potential conditions for renewal or termination.
-
-            Additional instructions:
-
-                1. Analyze the attached contracts and extract relevant information. Ensure that the section numbers and names are accurately provided only if explicitly mentioned in the document and are directly relevant to the extracted content. If section numbers are absent or irrelevant, exclude them from the output. The focus should be on providing precise, contextually relevant details based solely on the content of the document.
-                
-                2. For each of the above, only output the relevant text that was parsed from the document and format the output in the following format using these tags.
-                        - In the raw relevant text thaw will be extracted if section numbers or section names are available include them in the export
-
-                    [Service]
-
-                    [results]
-
-                    <b>WTW Entity:</b> <Service provider>
-
-                    [raw extracted]
-
-                    <relevant text from the signature section>
-
-                    [Service]
-
-                    [Termination]
-
-                    [results]
-
-                    <b>Termination Notice No. of Days:</b> <Termination Notice and which party is giving the notice> <br>
-
-                    <span style="font-size: 13px;font-style: italic;">Section no.(s): [section number(s)]<br> Section Name(s): [section name(s)]</span>
-
-                    [raw extracted]
-
-                    <relevant text from the termination section>
-
-                    [Termination]
-
-                    [Renewal]
-
-                    [results]
-
-                    <b>Auto Renewal:</b> <Renewal Clause Details> <br>
-
-                    <span style="font-size: 13px;font-style: italic;">Section no.(s): [section number(s)]<br> Section Name(s): [section name(s)]</span>an>
-
-                    [raw extracted]
-
-                    <relevant text from the renewal section>
-
-                    [Renewal]
-
-                    [Signed Date]
-
-                    [results]
-
-                    <b>Signed Date of the Client (<client name>):</b> <Date of the client signing> <br>
-
-                    <span style="font-size: 13px;font-style: italic;">Section no.(s): [section number(s)]<br> Section Name(s): [section name(s)]</span>
-
-                    [raw extracted]
-
-                    <relevant text from the signature section>
-
-                    [Signed Date]
-
-                    [Effectivity Date]
-
-                    [results]
-
-                    <b>Effectivity Date:</b> <Effectivity Date> <br>
-
-                    <span style="font-size: 13px;font-style: italic;">Section no.(s): [section number(s)]<br> Section Name(s): [section name(s)]</span>
-                    [raw extracted]
-
-                    <relevant text from the Effectivity section>
-
-                    [Effectivity Date]
 
-                    [Data privacy]
-
-                    [results]
-
-                    <b>Data privacy Link:</b> <Data privacy if link is found or not> <br>
-
-                    <span style="font-size: 13px;font-style: italic;">Section no.(s): [section number(s)]<br> Section Name(s): [section name(s)]</span>
-
-                    [raw extracted]
-
-                    <relevant text from the Data privacy section>
-
-                    [Data privacy]
-
-                    [Higher Level]
-
-                    [results]
-
-                    <b>Associated with a Higher Level agreement:</b> <Add summary here if the current document is Associated with a Higher Level agreement> <br>
-
-                    <span style="font-size: 13px;font-style: italic;">Section no.(s): [section number(s)]<br> Section Name(s): [section name(s)]</span>
-
-                    [raw extracted]
-
-                    <relevant text from the Associated with a Higher Level agreement section>
-
-                    [Higher Level]
-
-                    [Expiration]
-
-                    [results]
-
-                    <b>Expiration Date:</b> <Duration or Expiration Date information> <br>
-
-                        <span style="font-size: 13px;font-style: italic;">Section no.(s): [section number(s)]<br> Section Name(s): [section name(s)]</span>
-
-                    [raw extracted]
-
-                    <relevant text from the Duration or Expiration Date date section>
-
-                    [Expiration]
-
-
-
-            Note: The Service Provider is always Towers Watson or Willis Towers Watson. Please extract only the Client's Signature Date.
-                """
-    try:
-        completion = writer_completion_client.create(
-            model="palmyra-x-004",
-            prompt=f"{prompt}\n\nDocument Content:\n{parsed_text}",
-            max_tokens=50000,
-            temperature=0.0,
-            stream=False
-        )
-        return completion.choices[0].text
-    except Exception as e:
-        return f"Error querying Writer API: {e}"
-
-def display_extracted_information_upload(extracted_data):
-    # Define sections with their patterns and display titles
-    sections = {
-        'Service': {
-            'title': '🏢 WTW and client info',
-            'pattern': r'\[Service\]\s+\[results\]\s+<b>WTW Entity:</b>.*?\[raw extracted\].*?\[Service\]',
-            'expanded': True
-        },
-        'Signed Date': {
-            'title': '🏢 WTW and client info',
-            'pattern': r'\[Signed Date\]\s+\[results\]\s+<b>Signed Date of the Client \(.*?\):</b>.*?\[raw extracted\].*?\[Signed Date\]',
-            'expanded': True
-        },
-        'Effectivity Date': {
-            'title': '📅 Contract Duration',
-            'pattern': r'\[Effectivity Date\]\s+\[results\]\s+<b>Effectivity Date:</b>.*?\[raw extracted\].*?\[Effectivity Date\]',
-            'expanded': True
-        },
-        'Expiration': {
-            'title': '📅 Contract Duration',
-            'pattern': r'\[Expiration\]\s+\[results\]\s+<b>Expiration Date:</b>.*?\[raw extracted\].*?\[Expiration\]',
-            'expanded': True
-        },
-        'Termination': {
-            'title': '⛔ Termination',
-            'pattern': r'\[Termination\]\s+\[results\]\s+<b>Termination Notice No\. of Days:</b>.*?\[raw extracted\].*?\[Termination\]',
-            'expanded': True
-        },
-        'Renewal': {
-            'title': '🔄 Auto Renewal',
-            'pattern': r'\[Renewal\]\s+\[results\]\s+<b>Auto Renewal:</b>.*?\[raw extracted\].*?\[Renewal\]',
-            'expanded': True
-        },
-        'Data privacy': {
-            'title': '🔒 Data privacy Link',
-            'pattern': r'\[Data privacy\]\s+\[results\]\s+<b>Data privacy Link:</b>.*?\[raw extracted\].*?\[Data privacy\]',
-            'expanded': True
-        },
-        'Higher Level': {
-            'title': '📜 With a higher level agreement',
-            'pattern': r'\[Higher Level\]\s+\[results\]\s+<b>Associated with a Higher Level agreement:</b>.*?\[raw extracted\].*?\[Higher Level\]',
-            'expanded': True
-        }
-    }
-
-    def extract_content(text, section_name):
-        pattern = sections[section_name]['pattern']
-        match = re.search(pattern, text, re.DOTALL)
-        if match:
-            full_text = match.group(0)
-            results_match = re.search(r'\[results\]\s+(.*?)\s+\[raw extracted\]', full_text, re.DOTALL)
-            raw_match = re.search(r'\[raw extracted\]\s+(.*?)\s+\[' + section_name + '\]', full_text, re.DOTALL)
-            
-            if results_match and raw_match:
-                return {
-                    'results': results_match.group(1).strip(),
-                    'raw': raw_match.group(1).strip()
-                }
-        return None
-
-    # Group sections by their display titles
-    grouped_sections = {}
-    
-    for section_name, section_info in sections.items():
-        title = section_info['title']
-        if title not in grouped_sections:
-            grouped_sections[title] = []
-        grouped_sections[title].append(section_name)
-    #grouped_sections
+def display_extracted_information_upload(extracted_sections):
     # Display sections grouped by title
-    for title, section_names in grouped_sections.items():
+    for title, section_names in group_sections_by_title(UPLOAD_SECTION_TITLES).items():
         with st.expander(title, expanded=True):
             cols = st.columns(len(section_names))
             for col, section_name in zip(cols, section_names):
                 with col:
-                    content = extract_content(extracted_data, section_name)
-                    
+                    content = extracted_sections.get(section_name)
+
                     if content:
                         st.markdown(content['results'], unsafe_allow_html=True)
                         st.code(content['raw'], wrap_lines=True, language="html")
                     else:
                         st.write("Not found")
-                            
-def display_token_statistics(parsed_text):
+
+def display_token_statistics(parsed_text, request_type):
   with st.sidebar:
      with st.expander("📊 Statistics", expanded=False):   
         # Processing Statistics Section
@@ -956,6 +937,7 @@ def display_token_statistics(parsed_text):
             'Upload time': st.session_state.get('upload_time'),
             'Parse time': st.session_state.get('parse_time'),
             'Extract time': st.session_state.get('extract_time'),
+            'First result time': st.session_state.get('first_result_time'),
             'Total time': st.session_state.get('total_process_time')
         }
         
@@ -974,22 +956,48 @@ def display_token_statistics(parsed_text):
         st.markdown("### Document Statistics")
         st.markdown("<div class='stats-container'>", unsafe_allow_html=True)
         
-        # Token count and document length
+        # Token count, document length and what the extraction cost
+        token_count = count_tokens(parsed_text)
         doc_metrics = {
-            'Token count': len(parsed_text) / 4,
-            'Document length': len(parsed_text)
+            'Token count' if is_exact() else 'Token count (estimated)': f"{token_count:,}",
+            'Document length': f"{len(parsed_text):,}"
         }
+        prompt = REVIEW_PROMPT if request_type == "Review" else UPLOAD_PROMPT
+        cost = estimate_cost(count_tokens(prompt) + token_count,
+                             count_tokens(st.session_state.get('extracted_data') or ''), WRITER_MODEL_NAME)
+        if cost is not None:
+            doc_metrics['Estimated cost'] = f"${cost:.3f}"
         
         for label, value in doc_metrics.items():
             st.markdown(f"""
                 <div class='stat-card document-stat'>
                     <div class='stat-label'>{label}</div>
-                    <div class='stat-value document-value'>{value:.0f}</div>
+                    <div class='stat-value document-value'>{value}</div>
                 </div>
             """, unsafe_allow_html=True)
             
         st.markdown("</div>", unsafe_allow_html=True)
 
+        # API Client Statistics Section
+        st.markdown("### API Clients")
+        st.markdown("<div class='stats-container'>", unsafe_allow_html=True)
+        for name, metrics in client_metrics().items():
+            st.markdown(f"""
+                <div class='stat-card processing-stat'>
+                    <div class='stat-label'>{name.split(':')[0]} (built in {metrics['build_ms']:.0f} ms)</div>
+                    <div class='stat-value processing-value'>{metrics['uses']} uses</div>
+                </div>
+            """, unsafe_allow_html=True)
+        st.markdown("</div>", unsafe_allow_html=True)
+
+        # Writer API Latency Section
+        latency_rows = latency_summary()
+        if latency_rows:
+            import pandas as pd
+
+            st.markdown("### Writer API Latency")
+            st.dataframe(pd.DataFrame(latency_rows).set_index('stage').round(2), use_container_width=True)
+
 if __name__ == '__main__':
     
     main()
@@ -0,0 +1,113 @@
+# db.py
+# Process-wide SQLite connection pools shared by every Streamlit session
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# Constants
+POOL_SIZE = 8
+BUSY_TIMEOUT_SECONDS = 10
+STATEMENT_CACHE_SIZE = 256  # Prepared statements kept per connection, reused for identical SQL
+PRAGMAS = [
+    'PRAGMA journal_mode=WAL',  # Readers no longer block the writer
+    'PRAGMA synchronous=NORMAL',  # Safe with WAL, avoids an fsync per commit
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-16000',  # 16 MB page cache per connection
+    f'PRAGMA busy_timeout={BUSY_TIMEOUT_SECONDS * 1000}',
+]
+
+_pools = {}
+_pools_lock = threading.Lock()
+_bootstrapped = set()
+_bootstrap_lock = threading.Lock()
+
+
+class ConnectionPool:
+    def __init__(self, db_path, max_size=POOL_SIZE):
+        self.db_path = db_path
+        self.max_size = max_size
+        self._idle = queue.LifoQueue()  # Most recently used first, so its page cache is warm
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _create_connection(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=BUSY_TIMEOUT_SECONDS,
+            check_same_thread=False,  # Connections move between script threads, never used by two at once
+            cached_statements=STATEMENT_CACHE_SIZE
+        )
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.max_size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                return self._create_connection()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        try:
+            return self._idle.get(timeout=BUSY_TIMEOUT_SECONDS)
+        except queue.Empty:
+            # Raised as a database error, which is what every caller already handles
+            raise sqlite3.OperationalError("connection pool exhausted") from None
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a connection for one unit of work.
+        Commits when the block succeeds and rolls back if it raises.
+        """
+        conn = self._acquire()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._idle.put(conn)
+
+
+def get_pool(db_path):
+    """Return the shared pool for a database file, creating it on first use"""
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(key)
+            _pools[key] = pool
+        return pool
+
+
+def bootstrap_once(db_path, bootstrap_fn):
+    """
+    Run schema creation/migrations for a database once per process.
+    Each bootstrap function runs once per file, so several modules can own tables in one database.
+    bootstrap_fn receives a pooled connection; a failed bootstrap is retried on the next call.
+    """
+    path = os.path.abspath(db_path)
+    key = (path, bootstrap_fn.__module__, bootstrap_fn.__qualname__)
+    if key in _bootstrapped:
+        return
+    with _bootstrap_lock:
+        if key in _bootstrapped:
+            return
+        with get_pool(path).connection() as conn:
+            bootstrap_fn(conn)
+        _bootstrapped.add(key)
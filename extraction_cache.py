@@ -0,0 +1,123 @@
+# extraction_cache.py
+import hashlib
+import sqlite3
+import time
+from db import bootstrap_once, get_pool
+
+# Constants
+CACHE_DB_PATH = 'extraction_cache.db'
+CACHE_MAX_BYTES = 256 * 1024 * 1024  # Evict least recently used entries above 256 MB
+CACHE_TTL_SECONDS = 30 * 24 * 60 * 60  # Entries older than 30 days are treated as missing
+
+
+def make_cache_key(raw_bytes, request_type, prompt_version, model_name):
+    """
+    Build a content-addressed cache key.
+    Identical file bytes processed with the same request type, prompt version
+    and model always map to the same key, regardless of the file name.
+    """
+    content_hash = hashlib.sha256(raw_bytes).hexdigest()
+    key_material = f"{content_hash}|{request_type}|{prompt_version}|{model_name}"
+    return hashlib.sha256(key_material.encode('utf-8')).hexdigest()
+
+
+class ExtractionCache:
+    """
+    SQLite cache of finished extractions. Database errors never fail the extraction: they are
+    collected in self.warnings for the caller to show, since worker threads must not call Streamlit.
+    """
+
+    def __init__(self, db_path=CACHE_DB_PATH, max_bytes=CACHE_MAX_BYTES, ttl_seconds=CACHE_TTL_SECONDS):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.warnings = []
+        self.pool = get_pool(db_path)
+        self._ensure_table()
+
+    def _ensure_table(self):
+        """Create the cache table once per process"""
+        bootstrap_once(self.db_path, self._create_table)
+
+    @staticmethod
+    def _create_table(conn):
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS extraction_cache (
+                cache_key TEXT PRIMARY KEY,
+                parsed_text TEXT NOT NULL,
+                extracted_data TEXT NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_accessed REAL NOT NULL
+            )
+        ''')
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_extraction_cache_last_accessed
+            ON extraction_cache (last_accessed)
+        ''')
+
+    def get(self, cache_key):
+        """
+        Return the cached entry for a key or None.
+        Returns: dict with 'parsed_text' and 'extracted_data'
+        """
+        try:
+            with self.pool.connection() as conn:
+                row = conn.execute(
+                    'SELECT parsed_text, extracted_data, created_at FROM extraction_cache WHERE cache_key = ?',
+                    (cache_key,)
+                ).fetchone()
+                if row is None:
+                    return None
+
+                now = time.time()
+                if now - row[2] > self.ttl_seconds:
+                    conn.execute('DELETE FROM extraction_cache WHERE cache_key = ?', (cache_key,))
+                    return None
+
+                # Touch the entry so LRU eviction keeps it
+                conn.execute(
+                    'UPDATE extraction_cache SET last_accessed = ? WHERE cache_key = ?',
+                    (now, cache_key)
+                )
+                return {'parsed_text': row[0], 'extracted_data': row[1]}
+        except sqlite3.Error as e:
+            self.warnings.append(f"Extraction cache unavailable: {e}")
+            return None
+
+    def put(self, cache_key, parsed_text, extracted_data):
+        """Store an extraction result and evict old entries if the cache is too large"""
+        size_bytes = len(parsed_text.encode('utf-8')) + len(extracted_data.encode('utf-8'))
+        if size_bytes > self.max_bytes:
+            return False
+        try:
+            with self.pool.connection() as conn:
+                now = time.time()
+                conn.execute('''
+                    INSERT OR REPLACE INTO extraction_cache
+                    (cache_key, parsed_text, extracted_data, size_bytes, created_at, last_accessed)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (cache_key, parsed_text, extracted_data, size_bytes, now, now))
+                self._evict(conn, now)
+            return True
+        except sqlite3.Error as e:
+            self.warnings.append(f"Could not write to extraction cache: {e}")
+            return False
+
+    def _evict(self, conn, now):
+        """Drop expired entries, then least recently used entries until under max_bytes"""
+        conn.execute('DELETE FROM extraction_cache WHERE created_at < ?', (now - self.ttl_seconds,))
+
+        total_bytes = conn.execute('SELECT COALESCE(SUM(size_bytes), 0) FROM extraction_cache').fetchone()[0]
+        if total_bytes <= self.max_bytes:
+            return
+
+        stale_keys = []
+        for cache_key, size_bytes in conn.execute(
+            'SELECT cache_key, size_bytes FROM extraction_cache ORDER BY last_accessed ASC'
+        ):
+            if total_bytes <= self.max_bytes:
+                break
+            stale_keys.append((cache_key,))
+            total_bytes -= size_bytes
+        conn.executemany('DELETE FROM extraction_cache WHERE cache_key = ?', stale_keys)
@@ -0,0 +1,326 @@
+# extraction_prompts.py
+# Prompts and section tags shared by the single-pass and chunked extractors
+
+WRITER_MODEL_NAME = "palmyra-x-004"
+PROMPT_VERSION = "1"  # Bump whenever a prompt changes so cached extractions are not reused
+
+# Section tags the model wraps each answer in, in prompt order
+REVIEW_SECTION_NAMES = [
+    'Payment Terms',
+    'Rate Cards',
+    'Travel and Expense Policies',
+    'Diverse Supplier Provisions',
+    'Termination Clauses',
+    'Limitation of Liability',
+    'Data Privacy',
+    'Insurance Provisions',
+    'Background Check/Drug Screening',
+]
+
+UPLOAD_SECTION_NAMES = [
+    'Service',
+    'Termination',
+    'Renewal',
+    'Signed Date',
+    'Effectivity Date',
+    'Data privacy',
+    'Higher Level',
+    'Expiration',
+]
+
+
+def build_prompt(prompt, parsed_text):
+    """Append the document text to an extraction prompt"""
+    return f"{prompt}\n\nDocument Content:\n{parsed_text}"
+
+
+REVIEW_PROMPT = """Analyze the provided contract document and extract the following information, highlighting relevant clauses, keywords, and details:
+
+1. Payment Terms
+Description: Identify payment terms, including standard periods (e.g., 30 days), conditions for exceeding terms, and invoice requirements. Highlight any deviations from the standard policy.
+Keywords: Pay, Payable, Invoice, Net.
+Sample Format:
+a.) Payment due within [X] days of receipt of a correct invoice.
+b.) Any deviations require [specific approval or conditions].
+
+2. Rate Cards
+Description: Extract details about rate cards, hourly rate structures, and personnel-based fees. Reference any rate tables.
+Keywords: Rate, Rate Cards, Hourly.
+Sample Format:
+a.) Fee structure for hourly rates based on personnel levels, types of work, and geographical regions.
+b.) Provide examples where applicable, including rate tables or caps.
+
+3. Client Travel and Expense Policy
+Description: Identify clauses related to travel and expense reimbursement. Note if the client's travel policy applies and highlight any restrictions or exceptions.
+Keywords: Expense, Travel, Expense Policy, Travel Guide.
+Sample Format:
+a.) Reimbursement terms for travel-related expenses, including approvals and documentation requirements.
+b.) Policies about economy fares, preferred accommodations, and non-reimbursable items.
+
+
+4. Diverse Supplier Provisions
+Description: Highlight provisions encouraging the use of diverse suppliers and related reporting requirements.
+Keywords: Diversity, Diverse Supplier, Inclusion.
+Sample Format:
+a.) Include language supporting diverse supplier inclusion and any reporting requirements (e.g., quarterly reports).
+
+
+5. Termination Clauses
+Description: Identify terms for termination, including "termination for convenience" or "material breach." Highlight any fees or specific conditions.
+Keywords: Termination for convenience, Termination without cause, Material breach.
+Sample Format:
+a.) Right to terminate with [X] days' notice or under specific conditions.
+b.) Associated termination fees, if any, and their calculation.
+
+
+6. Limitation of Liability
+Description: Extract limitations of liability clauses, including standard caps or carveouts.
+Keywords: Indirect damage exclusion, Mutual limits, Super cap.
+Sample Format:
+a.) Liability capped at [X] or a multiple of fees paid within a specific timeframe.
+b.) Uncapped liability for specific scenarios, such as gross negligence.
+
+
+7. Data Privacy
+Description: Summarize data privacy obligations, including compliance with regulations like GDPR or specific client data protection requirements.
+Keywords: Data Privacy, Data Processing, GDPR.
+Sample Format:
+a.) Outline responsibilities for protecting personal data and compliance with regulations.
+b.) Highlight any cross-border data restrictions or notification obligations in case of breaches.
+
+
+8. Insurance Provisions
+Description: Highlight insurance coverage requirements, including limits and types of coverage (e.g., liability, workers' compensation).
+Keywords: Insurance, Coverage.
+Sample Format:
+a.)Required insurance types and coverage limits.
+b.) Period of coverage and renewal obligations.
+
+
+9. Background Check/Drug Screening
+Description: Extract clauses requiring background checks or drug testing. Note any restrictions or client-specific requirements.
+Keywords: Background check, Drug, Alcohol testing.
+Sample Format:
+a.) Requirements for background checks or drug screening, including specific roles or access levels.
+
+
+
+Additional Instructions:
+
+                1. Analyze the attached contracts and extract relevant information. Ensure that the section numbers and names are accurately provided only if explicitly mentioned in the document and are directly relevant to the extracted content. If section numbers are absent or irrelevant, exclude them from the output. The focus should be on providing precise, contextually relevant details based solely on the content of the document.
+
+                2. For each of the above, only output the relevant text that was parsed from the document and format the output in the following format using these tags.
+                - In the raw relevant text thaw will be extracted if section numbers or section names are available include them in the export
+
+[Payment Terms]
+[results]
+<b>Payment Terms:</b> <Summary of payment terms> <br>
+<span style="font-size: 13px;font-style: italic;">Section no.(s): [section number(s)]<br> Section Name(s): [section name(s)]</span>
+[raw extracted]
+<relevant text from the payment terms section>
+[Payment Terms]
+
+[Rate Cards]
+[results]
+<b>Rate Cards:</b> <Summary of rate card terms> <br>
+<span style="font-size: 13px;font-style: italic;">Section no.(s): [section number(s)]<br> Section Name(s): [section name(s)]</span>
+[raw extracted]
+<relevant text from the rate cards section>
+[Rate Cards]
+
+[Travel and Expense Policies]
+[results]
+<b>Travel and Expense Policies:</b> <Summary of travel and expense policy terms> <br>
+<span style="font-size: 13px;font-style: italic;">Section no.(s): [section number(s)]<br> Section Name(s): [section name(s)]</span>
+[raw extracted]
+<relevant text from the travel and expense policies section>
+[Travel and Expense Policies]
+
+[Diverse Supplier Provisions]
+[results]
+<b>Diverse Supplier Provisions:</b> <Summary of diverse supplier clauses> <br>
+<span style="font-size: 13px;font-style: italic;">Section no.(s): [section number(s)]<br> Section Name(s): [section name(s)]</span>
+[raw extracted]
+<relevant text from the diverse supplier provisions section>
+[Diverse Supplier Provisions]
+
+[Termination Clauses]
+[results]
+<b>Termination Clauses:</b> <Summary of termination clauses> <br>
+<span style="font-size: 13px;font-style: italic;">Section no.(s): [section number(s)]<br> Section Name(s): [section name(s)]</span>
+[raw extracted]
+<relevant text from the termination clauses section>
+[Termination Clauses]
+
+[Limitation of Liability]
+[results]
+<b>Limitation of Liability:</b> <Summary of liability limitations> <br>
+<span style="font-size: 13px;font-style: italic;">Section no.(s): [section number(s)]<br> Section Name(s): [section name(s)]</span>
+[raw extracted]
+<relevant text from the limitation of liability section>
+[Limitation of Liability]
+
+[Data Privacy]
+[results]
+<b>Data Privacy:</b> <Summary of data privacy clauses> <br>
+<span style="font-size: 13px;font-style: italic;">Section no.(s): [section number(s)]<br> Section Name(s): [section name(s)]</span>
+[raw extracted]
+<relevant text from the data privacy section>
+[Data Privacy]
+
+[Insurance Provisions]
+[results]
+<b>Insurance Provisions:</b> <Summary of insurance provisions> <br>
+<span style="font-size: 13px;font-style: italic;">Section no.(s): [section number(s)]<br> Section Name(s): [section name(s)]</span>
+[raw extracted]
+<relevant text from the insurance provisions section>
+[Insurance Provisions]
+
+[Background Check/Drug Screening]
+[results]
+<b>Background Check/Drug Screening:</b> <Summary of background check or drug screening terms> <br>
+<span style="font-size: 13px;font-style: italic;">Section no.(s): [section number(s)]<br> Section Name(s): [section name(s)]</span>
+[raw extracted]
+<relevant text from the background check/drug screening section>
+[Background Check/Drug Screening]
+
+Note: The Service Provider is always Towers Watson or Willis Towers Watson. 
+"""
+
+
+UPLOAD_PROMPT = """
+            Analyze the following contract document below and extract the following information: 
+
+    1. Termination Notice No. of Days: Specify the termination notice period mentioned in the contract. Include whether the notice is for cause or without cause, and highlight any associated termination fees or conditions.
+    2. Auto Renewal Clause: Determine if the contract includes an auto-renewal clause. If present, provide details about the clause, including the notice period required to prevent renewal.
+    3. Signed Date of the Client: Extract the date when the client signed the contract (if available in the document).
+    4. Effective Date: Identify and extract the effective date of the agreement. Include details about initial terms and any mentioned renewal periods.
+    5. Service Provider: Extract the name of the vendor or service provider involved in the agreement, including any affiliated entities referenced. Start by examining the signed section of the document for the entity name. If the service provider is not found in the signed section, check other sections of the document, such as the introduction, definitions, or relevant clauses, for mentions of the vendor or its affiliated entities.
+    6. Data Privacy Link: Search for the presence of the specific link mentioned in the contract: https://www.willistowerswatson.com/en-gb/notices/global-data-processing-protocol. If it exists, extract it; if not, indicate as no Data Privacy link found.
+    7. Associated or connected with a Higher-Level Agreement: Identify whether the contract references another related or higher-level agreement, such as a Master Services Agreement (MSA). 
+    For example, clauses such as:
+    "The services described in this Scope of Work will be provided subject to the Master Services Agreement (MSA) between service provider and client dated (date agreement) and any subsequent amendments." 
+    Extract such references if available and dont be to specific from this example find something like this.
+
+    8. Duration or Expiration Date: Extract the duration of the contract, including its start date and end date or Provide any information related to the expiration date or potential conditions for renewal or termination.
+
+            Additional instructions:
+
+                1. Analyze the attached contracts and extract relevant information. Ensure that the section numbers and names are accurately provided only if explicitly mentioned in the document and are directly relevant to the extracted content. If section numbers are absent or irrelevant, exclude them from the output. The focus should be on providing precise, contextually relevant details based solely on the content of the document.
+                
+                2. For each of the above, only output the relevant text that was parsed from the document and format the output in the following format using these tags.
+                        - In the raw relevant text thaw will be extracted if section numbers or section names are available include them in the export
+
+                    [Service]
+
+                    [results]
+
+                    <b>WTW Entity:</b> <Service provider>
+
+                    [raw extracted]
+
+                    <relevant text from the signature section>
+
+                    [Service]
+
+                    [Termination]
+
+                    [results]
+
+                    <b>Termination Notice No. of Days:</b> <Termination Notice and which party is giving the notice> <br>
+
+                    <span style="font-size: 13px;font-style: italic;">Section no.(s): [section number(s)]<br> Section Name(s): [section name(s)]</span>
+
+                    [raw extracted]
+
+                    <relevant text from the termination section>
+
+                    [Termination]
+
+                    [Renewal]
+
+                    [results]
+
+                    <b>Auto Renewal:</b> <Renewal Clause Details> <br>
+
+                    <span style="font-size: 13px;font-style: italic;">Section no.(s): [section number(s)]<br> Section Name(s): [section name(s)]</span>an>
+
+                    [raw extracted]
+
+                    <relevant text from the renewal section>
+
+                    [Renewal]
+
+                    [Signed Date]
+
+                    [results]
+
+                    <b>Signed Date of the Client (<client name>):</b> <Date of the client signing> <br>
+
+                    <span style="font-size: 13px;font-style: italic;">Section no.(s): [section number(s)]<br> Section Name(s): [section name(s)]</span>
+
+                    [raw extracted]
+
+                    <relevant text from the signature section>
+
+                    [Signed Date]
+
+                    [Effectivity Date]
+
+                    [results]
+
+                    <b>Effectivity Date:</b> <Effectivity Date> <br>
+
+                    <span style="font-size: 13px;font-style: italic;">Section no.(s): [section number(s)]<br> Section Name(s): [section name(s)]</span>
+                    [raw extracted]
+
+                    <relevant text from the Effectivity section>
+
+                    [Effectivity Date]
+
+                    [Data privacy]
+
+                    [results]
+
+                    <b>Data privacy Link:</b> <Data privacy if link is found or not> <br>
+
+                    <span style="font-size: 13px;font-style: italic;">Section no.(s): [section number(s)]<br> Section Name(s): [section name(s)]</span>
+
+                    [raw extracted]
+
+                    <relevant text from the Data privacy section>
+
+                    [Data privacy]
+
+                    [Higher Level]
+
+                    [results]
+
+                    <b>Associated with a Higher Level agreement:</b> <Add summary here if the current document is Associated with a Higher Level agreement> <br>
+
+                    <span style="font-size: 13px;font-style: italic;">Section no.(s): [section number(s)]<br> Section Name(s): [section name(s)]</span>
+
+                    [raw extracted]
+
+                    <relevant text from the Associated with a Higher Level agreement section>
+
+                    [Higher Level]
+
+                    [Expiration]
+
+                    [results]
+
+                    <b>Expiration Date:</b> <Duration or Expiration Date information> <br>
+
+                        <span style="font-size: 13px;font-style: italic;">Section no.(s): [section number(s)]<br> Section Name(s): [section name(s)]</span>
+
+                    [raw extracted]
+
+                    <relevant text from the Duration or Expiration Date date section>
+
+                    [Expiration]
+
+
+
+            Note: The Service Provider is always Towers Watson or Willis Towers Watson. Please extract only the Client's Signature Date.
+                """
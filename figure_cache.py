@@ -0,0 +1,92 @@
+# figure_cache.py
+# LRU cache of built Plotly figures with per-figure build and serialise timings.
+# Only the build is cached: st.plotly_chart still converts and serialises the figure to JSON on every
+# rerun, and Streamlit has no public way to pass it a pre-serialised spec, so that cost remains.
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+import pandas as pd
+
+# Constants
+FIGURE_CACHE_SIZE = 64  # Figures kept across all sessions
+
+
+def data_digest(data):
+    """Stable hash of a chart's aggregated input (Series, DataFrame, array or plain values)"""
+    digest = hashlib.sha256()
+    if isinstance(data, (pd.Series, pd.DataFrame)):
+        names = list(data.columns) if isinstance(data, pd.DataFrame) else [data.name]
+        digest.update(repr((type(data).__name__, names, list(data.index.names))).encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+        if isinstance(data, pd.DataFrame):
+            # Row hashes ignore column order, so the order is hashed separately
+            digest.update(repr(list(map(str, data.columns))).encode('utf-8'))
+    elif hasattr(data, 'tobytes'):
+        digest.update(repr((data.dtype, data.shape)).encode('utf-8'))
+        digest.update(data.tobytes())
+    else:
+        digest.update(json.dumps(data, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def spec_digest(spec):
+    """Stable hash of a layout spec dict"""
+    return hashlib.sha256(json.dumps(spec, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class FigureCache:
+    """
+    Built figures keyed on (chart name, hash of the aggregated input, hash of the layout spec).
+    Identical inputs from any session reuse the same figure object, so callers must not
+    modify a figure they get back. Timings are kept per chart name for the debug panel.
+    """
+
+    def __init__(self, max_size=FIGURE_CACHE_SIZE):
+        self.max_size = max_size
+        self._figures = OrderedDict()
+        self._timings = {}  # name -> {'hits', 'misses', 'build_ms', 'serialise_ms'}
+        self._lock = threading.Lock()
+
+    def _record(self, name, **values):
+        with self._lock:
+            timing = self._timings.setdefault(name, {'hits': 0, 'misses': 0, 'build_ms': None, 'serialise_ms': None})
+            for field, value in values.items():
+                timing[field] = timing[field] + value if field in ('hits', 'misses') else value
+
+    def get(self, name, data, spec, build_fn):
+        """Return the figure for data and spec, calling build_fn(data, spec) only on a miss"""
+        key = (name, data_digest(data), spec_digest(spec))
+        with self._lock:
+            figure = self._figures.get(key)
+            if figure is not None:
+                self._figures.move_to_end(key)
+        if figure is not None:
+            self._record(name, hits=1)
+            return figure
+
+        start = time.perf_counter()
+        figure = build_fn(data, spec)
+        self._record(name, misses=1, build_ms=(time.perf_counter() - start) * 1000)
+        with self._lock:
+            self._figures[key] = figure
+            while len(self._figures) > self.max_size:
+                self._figures.popitem(last=False)
+        return figure
+
+    def show(self, name, figure, draw_fn, **kwargs):
+        """
+        Draw a figure with draw_fn (st.plotly_chart or a container's plotly_chart) and time it.
+        Streamlit validates and serialises the figure to JSON inside that call, on hits as well as
+        misses, so its time is reported as the figure's serialise time: the per-rerun cost left over.
+        """
+        start = time.perf_counter()
+        result = draw_fn(figure, **kwargs)
+        self._record(name, serialise_ms=(time.perf_counter() - start) * 1000)
+        return result
+
+    def timings(self):
+        """Latest timings per chart, as rows for st.dataframe"""
+        with self._lock:
+            return [{'chart': name, **timing} for name, timing in sorted(self._timings.items())]
@@ -0,0 +1,382 @@
+# job_queue.py
+# Durable background jobs in SQLite, executed by a pool of worker processes.
+# Jobs outlive the Streamlit rerun (and the browser tab) that submitted them.
+import atexit
+import importlib
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from db import bootstrap_once, get_pool
+from rate_limiter import MAX_IN_FLIGHT_EXTRACTIONS
+
+# Constants
+JOBS_DB_PATH = 'userdata.db'
+# Scales with cores, capped at the number of extractions allowed in flight
+JOB_WORKERS = max(1, min(os.cpu_count() or 1, MAX_IN_FLIGHT_EXTRACTIONS))
+MAX_ATTEMPTS = 3
+RETRY_BASE_SECONDS = 5  # Backoff before attempt n+1 is RETRY_BASE_SECONDS * 2**(n-1), plus jitter
+RETRY_MAX_SECONDS = 300
+POLL_INTERVAL_SECONDS = 0.5  # How often an idle worker looks for work
+HEARTBEAT_SECONDS = 10
+LEASE_SECONDS = 60  # A running job without a heartbeat for this long is requeued
+USER_JOB_HISTORY = 20  # Jobs listed per user in the UI
+JOB_RETENTION_DAYS = 7  # Finished and failed jobs, with their results, are deleted after this long
+PURGE_INTERVAL_SECONDS = 3600  # How often each worker deletes expired jobs
+
+JOB_COLUMNS = ('job_id', 'username', 'kind', 'file_name', 'request_type', 'payload', 'status', 'stage', 'attempts',
+               'max_attempts', 'next_attempt_at', 'created_at', 'started_at', 'finished_at', 'heartbeat_at',
+               'worker_pid', 'error', 'result')
+SELECT_JOB_SQL = f"SELECT {', '.join(JOB_COLUMNS)} FROM background_jobs"
+# One statement, so two workers can never claim the same job. Nothing is claimed while max_running jobs
+# are running, which caps concurrent Writer work across every worker (and every server sharing the database).
+CLAIM_JOB_SQL = f'''
+    UPDATE background_jobs
+    SET status = 'running', stage = 'started', attempts = attempts + 1,
+        started_at = ?, heartbeat_at = ?, worker_pid = ?, error = NULL
+    WHERE job_id = (
+        SELECT job_id FROM background_jobs
+        WHERE status = 'queued' AND next_attempt_at <= ?
+        ORDER BY next_attempt_at, created_at
+        LIMIT 1
+    )
+    AND (SELECT COUNT(*) FROM background_jobs WHERE status = 'running') < ?
+    RETURNING {', '.join(JOB_COLUMNS)}
+'''
+
+# A worker only updates a job it still holds: the claim is identified by the attempt number it started,
+# so a worker whose job was requeued as stale (and possibly claimed again) cannot overwrite the new run
+CLAIM_GUARD_SQL = "job_id = ? AND status = 'running' AND attempts = ?"
+
+PURGE_JOBS_SQL = "DELETE FROM background_jobs WHERE status IN ('done', 'error') AND finished_at < ?"
+# Inputs are deleted when a job finishes; this also catches any left behind by older versions
+PURGE_INPUTS_SQL = '''
+    DELETE FROM background_job_inputs
+    WHERE job_id NOT IN (SELECT job_id FROM background_jobs WHERE status IN ('queued', 'running'))
+'''
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler for failures that a retry cannot fix, e.g. a document over the token limit"""
+
+
+def retry_delay(attempts):
+    """Seconds to wait before the next attempt, exponential with jitter"""
+    delay = min(RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0), RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _row_to_job(row):
+    job = dict(zip(JOB_COLUMNS, row))
+    job['payload'] = json.loads(job['payload']) if job['payload'] else {}
+    job['result'] = json.loads(job['result']) if job['result'] else None
+    return job
+
+
+class JobQueue:
+    """
+    Jobs table plus the input blobs for jobs that have not finished.
+    Finished jobs are kept for JOB_RETENTION_DAYS so users can see them in their history.
+    Every method opens its own pooled connection, so the same queue object is used
+    by Streamlit sessions (submit and poll) and by worker processes (claim and finish).
+    """
+
+    def __init__(self, db_path=JOBS_DB_PATH):
+        self.db_path = db_path
+        self.pool = get_pool(db_path)
+        bootstrap_once(db_path, self._create_tables)
+
+    @staticmethod
+    def _create_tables(conn):
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS background_jobs (
+                job_id TEXT PRIMARY KEY,
+                username TEXT,
+                kind TEXT NOT NULL,
+                file_name TEXT,
+                request_type TEXT,
+                payload TEXT,
+                status TEXT NOT NULL,
+                stage TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                next_attempt_at REAL NOT NULL,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                heartbeat_at REAL,
+                worker_pid INTEGER,
+                error TEXT,
+                result TEXT
+            )
+        ''')
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_background_jobs_claim
+            ON background_jobs (status, next_attempt_at, created_at)
+        ''')
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_background_jobs_user
+            ON background_jobs (username, created_at)
+        ''')
+        # Inputs are kept apart so polling never reads document bytes
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS background_job_inputs (
+                job_id TEXT PRIMARY KEY,
+                raw_bytes BLOB NOT NULL
+            )
+        ''')
+        JobQueue._purge_expired(conn)
+
+    @staticmethod
+    def _purge_expired(conn):
+        conn.execute(PURGE_JOBS_SQL, (time.time() - JOB_RETENTION_DAYS * 86400,))
+        conn.execute(PURGE_INPUTS_SQL)
+
+    def purge_expired(self):
+        """Delete jobs that finished more than JOB_RETENTION_DAYS ago, and inputs of jobs that are not pending"""
+        with self.pool.connection() as conn:
+            self._purge_expired(conn)
+
+    def submit(self, kind, raw_bytes, username=None, file_name=None, request_type=None, payload=None,
+               max_attempts=MAX_ATTEMPTS, dedupe_key=None):
+        """
+        Queue a job and return its id.
+        With a dedupe_key, a queued or running job of the same user and key is returned instead.
+        """
+        payload = dict(payload or {})
+        if dedupe_key is not None:
+            payload['dedupe_key'] = dedupe_key
+        now = time.time()
+        with self.pool.connection() as conn:
+            if dedupe_key is not None:
+                row = conn.execute('''
+                    SELECT job_id FROM background_jobs
+                    WHERE username IS ? AND status IN ('queued', 'running')
+                    AND json_extract(payload, '$.dedupe_key') = ?
+                ''', (username, dedupe_key)).fetchone()
+                if row is not None:
+                    return row[0]
+            job_id = uuid.uuid4().hex
+            conn.execute('''
+                INSERT INTO background_jobs
+                (job_id, username, kind, file_name, request_type, payload, status, stage,
+                 max_attempts, next_attempt_at, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, 'queued', 'queued', ?, ?, ?)
+            ''', (job_id, username, kind, file_name, request_type, json.dumps(payload), max_attempts, now, now))
+            conn.execute('INSERT INTO background_job_inputs (job_id, raw_bytes) VALUES (?, ?)',
+                         (job_id, sqlite3.Binary(raw_bytes)))
+        return job_id
+
+    def get(self, job_id):
+        """Return one job as a dict (payload and result decoded), or None"""
+        with self.pool.connection() as conn:
+            row = conn.execute(f"{SELECT_JOB_SQL} WHERE job_id = ?", (job_id,)).fetchone()
+        return _row_to_job(row) if row else None
+
+    def list_for_user(self, username, limit=USER_JOB_HISTORY):
+        """Most recent jobs of a user, without their results"""
+        with self.pool.connection() as conn:
+            rows = conn.execute(f'''
+                SELECT {', '.join(c if c != 'result' else 'NULL' for c in JOB_COLUMNS)}
+                FROM background_jobs WHERE username IS ? ORDER BY created_at DESC LIMIT ?
+            ''', (username, limit)).fetchall()
+        return [_row_to_job(row) for row in rows]
+
+    def claim(self, worker_pid, max_running=MAX_IN_FLIGHT_EXTRACTIONS):
+        """Take the next due job for a worker; returns (job, raw_bytes) or None, also when max_running are running"""
+        now = time.time()
+        with self.pool.connection() as conn:
+            # Drain RETURNING before commit
+            rows = conn.execute(CLAIM_JOB_SQL, (now, now, worker_pid, now, max_running)).fetchall()
+            if not rows:
+                return None
+            row = rows[0]
+            raw = conn.execute('SELECT raw_bytes FROM background_job_inputs WHERE job_id = ?', (row[0],)).fetchone()
+        job = _row_to_job(row)
+        return job, bytes(raw[0]) if raw else b''
+
+    def set_stage(self, job_id, attempt, stage):
+        """Record the stage a running job is in; also counts as a heartbeat"""
+        with self.pool.connection() as conn:
+            conn.execute(f'UPDATE background_jobs SET stage = ?, heartbeat_at = ? WHERE {CLAIM_GUARD_SQL}',
+                         (stage, time.time(), job_id, attempt))
+
+    def heartbeat(self, claims):
+        """claims: (job_id, attempt) pairs of the jobs this worker is running"""
+        with self.pool.connection() as conn:
+            conn.executemany(f'UPDATE background_jobs SET heartbeat_at = ? WHERE {CLAIM_GUARD_SQL}',
+                             [(time.time(), job_id, attempt) for job_id, attempt in claims])
+
+    def complete(self, job_id, attempt, result):
+        """Store the result; False if this claim was lost (requeued as stale or claimed again) meanwhile"""
+        with self.pool.connection() as conn:
+            updated = conn.execute(f'''
+                UPDATE background_jobs SET status = 'done', stage = 'done', finished_at = ?, result = ?, error = NULL
+                WHERE {CLAIM_GUARD_SQL}
+            ''', (time.time(), json.dumps(result), job_id, attempt)).rowcount
+            if not updated:
+                return False
+            conn.execute('DELETE FROM background_job_inputs WHERE job_id = ?', (job_id,))
+            return True
+
+    def fail(self, job_id, attempt, error, retry=True, stale_before=None):
+        """
+        Requeue with backoff while attempts remain, otherwise mark the job failed.
+        Returns 'queued' or 'error', or None if this claim was lost meanwhile. With stale_before,
+        the job is only touched if its last heartbeat is older than that.
+        """
+        now = time.time()
+        guard_sql, guard_args = CLAIM_GUARD_SQL, (job_id, attempt)
+        if stale_before is not None:
+            guard_sql, guard_args = f"{CLAIM_GUARD_SQL} AND heartbeat_at < ?", (job_id, attempt, stale_before)
+        with self.pool.connection() as conn:
+            row = conn.execute(f'SELECT max_attempts FROM background_jobs WHERE {guard_sql}', guard_args).fetchone()
+            if row is None:
+                return None
+            if retry and attempt < row[0]:
+                updated = conn.execute(f'''
+                    UPDATE background_jobs SET status = 'queued', stage = 'retrying', error = ?, next_attempt_at = ?
+                    WHERE {guard_sql}
+                ''', (error, now + retry_delay(attempt)) + guard_args).rowcount
+                return 'queued' if updated else None
+            updated = conn.execute(f'''
+                UPDATE background_jobs SET status = 'error', stage = 'failed', error = ?, finished_at = ?
+                WHERE {guard_sql}
+            ''', (error, now) + guard_args).rowcount
+            if not updated:
+                return None
+            conn.execute('DELETE FROM background_job_inputs WHERE job_id = ?', (job_id,))
+            return 'error'
+
+    def requeue_stale(self):
+        """Jobs whose worker stopped heartbeating (crash, restart) go back to the queue or fail"""
+        cutoff = time.time() - LEASE_SECONDS
+        with self.pool.connection() as conn:
+            stale = conn.execute(
+                "SELECT job_id, attempts FROM background_jobs WHERE status = 'running' AND heartbeat_at < ?", (cutoff,)
+            ).fetchall()
+        # A job that heartbeats between the SELECT and its update is left alone
+        error = "The worker processing this job stopped responding."
+        outcomes = [self.fail(job_id, attempt, error, stale_before=cutoff) for job_id, attempt in stale]
+        return sum(outcome is not None for outcome in outcomes)
+
+
+def _resolve_handler(handler_path):
+    """'module:function' -> the callable; the module is imported inside the worker process"""
+    module_name, _, function_name = handler_path.partition(':')
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def _worker_main(db_path, handlers, poll_interval, parent_pid):
+    """Worker process loop: claim a job, run its handler, record the outcome"""
+    job_queue = JobQueue(db_path)
+    resolved = {}
+    running = set()
+    running_lock = threading.Lock()
+    stop = threading.Event()
+
+    def heartbeat_loop():
+        while not stop.wait(HEARTBEAT_SECONDS):
+            with running_lock:
+                claims = list(running)
+            if claims:
+                try:
+                    job_queue.heartbeat(claims)
+                except sqlite3.Error:
+                    pass  # The next beat or the stage update will get through
+    threading.Thread(target=heartbeat_loop, name='job-heartbeat', daemon=True).start()
+
+    last_sweep = last_purge = 0.0
+    while os.getppid() == parent_pid:  # Exit if the Streamlit server went away
+        try:
+            if time.time() - last_sweep > LEASE_SECONDS / 2:
+                job_queue.requeue_stale()
+                last_sweep = time.time()
+            if time.time() - last_purge > PURGE_INTERVAL_SECONDS:
+                job_queue.purge_expired()
+                last_purge = time.time()
+            claimed = job_queue.claim(os.getpid())
+        except sqlite3.Error:
+            claimed = None
+        if claimed is None:
+            time.sleep(poll_interval)
+            continue
+
+        job, raw_bytes = claimed
+        claim = (job['job_id'], job['attempts'])
+        with running_lock:
+            running.add(claim)
+        try:
+            handler = resolved.get(job['kind'])
+            if handler is None:
+                handler = resolved[job['kind']] = _resolve_handler(handlers[job['kind']])
+            result = handler(job, raw_bytes, lambda stage: job_queue.set_stage(*claim, stage))
+            job_queue.complete(*claim, result)
+        except PermanentJobError as e:
+            job_queue.fail(*claim, str(e), retry=False)
+        except Exception as e:
+            job_queue.fail(*claim, str(e) or type(e).__name__)
+        finally:
+            with running_lock:
+                running.discard(claim)
+    stop.set()
+
+
+class JobWorkers:
+    """
+    Worker processes for the job queue, started once per Streamlit server process.
+    Processes are spawned rather than forked so they do not inherit the server's threads.
+    handlers maps a job kind to 'module:function'; the function is called as
+    handler(job, raw_bytes, report_stage) and returns a JSON-serialisable result.
+    """
+
+    def __init__(self, handlers, db_path=JOBS_DB_PATH, workers=JOB_WORKERS, poll_interval=POLL_INTERVAL_SECONDS):
+        self.handlers = dict(handlers)
+        self.db_path = db_path
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._context = multiprocessing.get_context('spawn')
+        self._processes = []
+        self._lock = threading.Lock()
+        atexit.register(self.stop)
+
+    def ensure_running(self):
+        """Start workers, replacing any that exited"""
+        with self._lock:
+            self._processes = [p for p in self._processes if p.is_alive()]
+            while len(self._processes) < self.workers:
+                process = self._context.Process(
+                    target=_worker_main,
+                    args=(self.db_path, self.handlers, self.poll_interval, os.getpid()),
+                    name=f'job-worker-{len(self._processes)}',
+                    daemon=True
+                )
+                process.start()
+                self._processes.append(process)
+
+    def stop(self):
+        with self._lock:
+            for process in self._processes:
+                process.terminate()
+            for process in self._processes:
+                process.join(timeout=5)
+            self._processes = []
+
+
+_workers = None
+_workers_lock = threading.Lock()
+
+
+def get_job_workers(handlers):
+    """Return the process-wide worker pool, starting it on first use"""
+    global _workers
+    if _workers is None:
+        with _workers_lock:
+            if _workers is None:
+                _workers = JobWorkers(handlers)
+    _workers.ensure_running()
+    return _workers
@@ -0,0 +1,77 @@
+# local_pdf_parser.py
+# In-process PDF text extraction for PDFs that already have a text layer.
+# Scanned or image-only PDFs return None so callers fall back to the Writer parse_pdf tool.
+import io
+import re
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # Optional dependency; without it every PDF goes to Writer
+    PdfReader = None
+
+# Constants
+LOCAL_MAX_FILE_SIZE = 50 * 1024 * 1024  # Local parsing has no upload, so larger files are fine
+MIN_CHARS_PER_PAGE = 200  # Fewer extracted characters than this per page looks like a scan
+MIN_PRINTABLE_RATIO = 0.9  # Lower ratios mean broken font encodings, better left to Writer
+
+HEADING_PATTERN = re.compile(
+    r'^(?:(?:ARTICLE|SECTION|SCHEDULE|EXHIBIT|APPENDIX)\b.*'
+    r'|\d+(?:\.\d+)*\.?\s+[A-Z][^.]{0,80}'
+    r'|[A-Z][A-Z0-9 ,&/()\'-]{3,80})$'
+)
+
+
+def is_available():
+    """True when the local PDF engine can be used"""
+    return PdfReader is not None
+
+
+def _to_markdown(page_text):
+    """Turn heading-like lines into markdown headings and normalise whitespace"""
+    lines = []
+    for line in page_text.splitlines():
+        line = re.sub(r'[ \t]+', ' ', line).strip()
+        if not line:
+            if lines and lines[-1] != "":
+                lines.append("")
+            continue
+        if len(line) <= 90 and HEADING_PATTERN.match(line):
+            if lines and lines[-1] != "":
+                lines.append("")
+            lines.append(f"## {line}")
+            lines.append("")
+        else:
+            lines.append(line)
+    return "\n".join(lines).strip()
+
+
+def looks_like_scanned(text, page_count):
+    """True if the extracted text is too sparse or too garbled to trust"""
+    if page_count == 0 or not text.strip():
+        return True
+    if len(text) / page_count < MIN_CHARS_PER_PAGE:
+        return True
+    printable = sum(1 for ch in text if ch.isprintable() or ch in '\n\t')
+    return printable / len(text) < MIN_PRINTABLE_RATIO
+
+
+def extract_pdf_markdown(raw_bytes):
+    """
+    Extract markdown-style text from a PDF's text layer.
+    Returns: str, or None when the PDF should be parsed remotely instead
+    """
+    if PdfReader is None or len(raw_bytes) > LOCAL_MAX_FILE_SIZE:
+        return None
+    try:
+        reader = PdfReader(io.BytesIO(raw_bytes))
+        if reader.is_encrypted:
+            return None
+        pages = [_to_markdown(page.extract_text() or "") for page in reader.pages]
+    except Exception:
+        # Anything pypdf cannot read is handed to Writer
+        return None
+
+    text = "\n\n".join(page for page in pages if page)
+    if looks_like_scanned(text, len(pages)):
+        return None
+    return text
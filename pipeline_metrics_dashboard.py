@@ -0,0 +1,113 @@
+import time
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import streamlit as st
+from auth_manager import AuthenticationManager
+from telemetry import LATENCY_BUCKETS, SIZE_BUCKETS, TRACE_SAMPLE_RATES, get_metrics, get_span_store
+
+# Constants
+TIME_WINDOWS = {'Last 24 hours': 1, 'Last 7 days': 7, 'Last 30 days': 30}
+SPAN_CACHE_SECONDS = 30
+ROOT_SPANS = ['process', 'render']
+SIZE_ORDER = [label for _, label in SIZE_BUCKETS] + ['unknown']
+BUCKET_LABELS = [f"≤{upper:g}s" for upper in LATENCY_BUCKETS] + [f">{LATENCY_BUCKETS[-1]:g}s"]
+
+
+st.set_page_config(page_title="Extraction Pipeline Metrics", page_icon="📈", layout="wide")
+
+
+@st.cache_data(ttl=SPAN_CACHE_SECONDS, show_spinner=False)
+def load_spans(since_epoch):
+    """Spans from every process since since_epoch, one row per span with duration in seconds"""
+    spans = pd.DataFrame(get_span_store().spans_since(since_epoch))
+    if spans.empty:
+        return spans
+    spans['duration_s'] = spans['duration_ms'] / 1000
+    spans['request_type'] = spans['request_type'].fillna('unknown')
+    spans['size_bucket'] = pd.Categorical(spans['size_bucket'].fillna('unknown'), categories=SIZE_ORDER, ordered=True)
+    spans['started'] = pd.to_datetime(spans['start_epoch'], unit='s')
+    return spans
+
+
+def percentile_table(spans):
+    grouped = spans.groupby(['name', 'request_type', 'size_bucket'], observed=True)['duration_s']
+    table = grouped.agg(
+        count='count',
+        p50=lambda s: s.quantile(0.50),
+        p95=lambda s: s.quantile(0.95),
+        p99=lambda s: s.quantile(0.99),
+    )
+    return table.reset_index().round(3)
+
+
+def latency_histogram(spans):
+    """Counts per latency bucket (the same buckets as the Prometheus export), by request type and size"""
+    edges = [0] + list(LATENCY_BUCKETS) + [np.inf]
+    binned = spans.assign(latency=pd.cut(spans['duration_s'], edges, labels=BUCKET_LABELS, right=True,
+                                         include_lowest=True))
+    counts = binned.groupby(['request_type', 'size_bucket', 'latency'], observed=True).size().rename('spans')
+    return counts.reset_index()
+
+
+def main():
+    auth_manager = AuthenticationManager()
+    if not auth_manager.setup_authentication():
+        return
+    if st.session_state.get('username') not in st.secrets.get("ADMIN_USERNAMES", []):
+        st.error("This page is only available to administrators.")
+        return
+
+    st.title("Extraction Pipeline Metrics")
+    window = st.sidebar.selectbox("Time window", list(TIME_WINDOWS), index=1)
+    # Rounded to the cache lifetime so reruns within it share one query
+    now = int(time.time()) // SPAN_CACHE_SECONDS * SPAN_CACHE_SECONDS
+    spans = load_spans(now - TIME_WINDOWS[window] * 86400)
+    if spans.empty:
+        st.info("No pipeline spans recorded in this window yet.")
+        return
+
+    documents = spans[spans['name'] == 'process']
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Documents processed", f"{len(documents):,}")
+    col2.metric("Failed", f"{int((documents['status'] == 'error').sum()):,}")
+    col3.metric("p50 total", f"{documents['duration_s'].quantile(0.5):.1f}s" if len(documents) else "-")
+    col4.metric("p95 total", f"{documents['duration_s'].quantile(0.95):.1f}s" if len(documents) else "-")
+
+    stages = [name for name in ROOT_SPANS if name in set(spans['name'])] + \
+        sorted(set(spans['name']) - set(ROOT_SPANS))
+    stage = st.sidebar.selectbox("Stage", stages)
+    stage_spans = spans[spans['name'] == stage]
+
+    st.markdown(f"### {stage} latency by request type and file size")
+    if stage in TRACE_SAMPLE_RATES:
+        st.caption(f"Only {TRACE_SAMPLE_RATES[stage]:.0%} of {stage} traces are stored (plus every failed one); "
+                   "the Prometheus metrics count all of them.")
+    histogram = latency_histogram(stage_spans)
+    fig = px.bar(
+        histogram, x='latency', y='spans', color='size_bucket', facet_col='request_type', barmode='group',
+        category_orders={'latency': BUCKET_LABELS, 'size_bucket': SIZE_ORDER},
+        labels={'latency': 'Latency', 'spans': 'Spans', 'size_bucket': 'File size'}
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+    st.markdown("### Percentiles (seconds)")
+    st.dataframe(percentile_table(spans), use_container_width=True, hide_index=True)
+
+    st.markdown("### Slowest documents")
+    slowest = documents.nlargest(20, 'duration_s')[['started', 'request_type', 'size_bucket', 'duration_s', 'status',
+                                                    'trace_id']]
+    st.dataframe(slowest, use_container_width=True, hide_index=True)
+    trace_id = st.selectbox("Trace", slowest['trace_id'], index=None, placeholder="Pick a trace to see its spans")
+    if trace_id:
+        trace = spans[spans['trace_id'] == trace_id].sort_values('start_epoch')
+        st.dataframe(trace[['span_id', 'parent_id', 'name', 'duration_s', 'status', 'attributes']],
+                     use_container_width=True, hide_index=True)
+
+    with st.expander("Prometheus metrics (this server process)"):
+        metrics_text = get_metrics().render()
+        st.download_button("Download metrics", metrics_text, "pipeline_metrics.prom", "text/plain")
+        st.code(metrics_text, language="text")
+
+
+main()
@@ -0,0 +1,206 @@
+# rate_limiter.py
+# In-memory admission control shared by every Streamlit session in the process
+import atexit
+import sqlite3
+import threading
+import time
+from db import bootstrap_once, get_pool
+
+# Constants
+RATE_LIMIT_DB_PATH = 'userdata.db'
+USER_BUCKET_CAPACITY = 1  # One upload...
+USER_REFILL_SECONDS = 60  # ...per user per minute
+GLOBAL_BUCKET_CAPACITY = 20  # Burst of admissions across all users
+GLOBAL_REFILL_PER_SECOND = 0.5  # 30 admissions per minute sustained, kept under the Writer API quota
+MAX_IN_FLIGHT_EXTRACTIONS = 8  # Uploads that may be parsing/extracting at the same time
+PERSIST_INTERVAL_SECONDS = 15
+GLOBAL_BUCKET_KEY = '__global__'
+
+
+class TokenBucket:
+    __slots__ = ('capacity', 'refill_rate', 'tokens', 'updated_at')
+
+    def __init__(self, capacity, refill_rate, tokens=None, updated_at=None):
+        self.capacity = capacity
+        self.refill_rate = refill_rate  # Tokens per second
+        self.tokens = capacity if tokens is None else min(tokens, capacity)
+        self.updated_at = time.time() if updated_at is None else updated_at
+
+    def refill(self, now):
+        if now > self.updated_at:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+            self.updated_at = now
+
+    def wait_time(self, now, amount=1):
+        """Seconds until `amount` tokens are available (0 if they already are)"""
+        self.refill(now)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.refill_rate
+
+    def consume(self, amount=1):
+        self.tokens -= amount
+
+
+class RateLimiter:
+    """
+    Per-user and global token buckets plus a cap on in-flight extractions.
+    Tokens are taken when a job is admitted, so failed and still-running jobs count.
+    Bucket state lives in memory and is written to SQLite every few seconds, so
+    a restart does not hand every user a fresh allowance.
+    """
+
+    def __init__(self, db_path=RATE_LIMIT_DB_PATH, user_capacity=USER_BUCKET_CAPACITY,
+                 user_refill_seconds=USER_REFILL_SECONDS, global_capacity=GLOBAL_BUCKET_CAPACITY,
+                 global_refill_per_second=GLOBAL_REFILL_PER_SECOND, max_in_flight=MAX_IN_FLIGHT_EXTRACTIONS,
+                 persist_interval=PERSIST_INTERVAL_SECONDS):
+        self.db_path = db_path
+        self.user_capacity = user_capacity
+        self.user_refill_rate = user_capacity / user_refill_seconds
+        self.max_in_flight = max_in_flight
+        self.persist_interval = persist_interval
+        self.pool = get_pool(db_path)
+
+        self._lock = threading.Lock()
+        self._user_buckets = {}
+        self._global_bucket = TokenBucket(global_capacity, global_refill_per_second)
+        self._in_flight = 0
+        self._slot_free = threading.Condition(self._lock)
+        self._dirty = set()
+
+        bootstrap_once(db_path, self._create_table)
+        self._load()
+
+        self._stop = threading.Event()
+        self._persister = threading.Thread(target=self._persist_loop, name='rate-limiter-persist', daemon=True)
+        self._persister.start()
+        atexit.register(self.close)
+
+    @staticmethod
+    def _create_table(conn):
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                bucket_key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+
+    def _load(self):
+        """Restore bucket levels saved by a previous process"""
+        try:
+            with self.pool.connection() as conn:
+                rows = conn.execute('SELECT bucket_key, tokens, updated_at FROM rate_limit_buckets').fetchall()
+        except sqlite3.Error:
+            return  # Start with full buckets rather than refusing every upload
+        with self._lock:
+            for bucket_key, tokens, updated_at in rows:
+                if bucket_key == GLOBAL_BUCKET_KEY:
+                    self._global_bucket.tokens = min(tokens, self._global_bucket.capacity)
+                    self._global_bucket.updated_at = updated_at
+                else:
+                    self._user_buckets[bucket_key] = TokenBucket(
+                        self.user_capacity, self.user_refill_rate, tokens, updated_at
+                    )
+
+    def _user_bucket(self, username):
+        bucket = self._user_buckets.get(username)
+        if bucket is None:
+            bucket = TokenBucket(self.user_capacity, self.user_refill_rate)
+            self._user_buckets[username] = bucket
+        return bucket
+
+    def try_acquire(self, username, hold_slot=True):
+        """
+        Admit one upload for a user.
+        Returns: (allowed, wait_seconds, reason) - call release() once an admitted job finishes.
+        With hold_slot=False only the buckets are charged and there is nothing to release; background
+        jobs use this, their in-flight cap is enforced when a worker process claims them.
+        """
+        now = time.time()
+        with self._lock:
+            if hold_slot and self._in_flight >= self.max_in_flight:
+                return False, 5, "The service is busy processing other documents."
+
+            user_bucket = self._user_bucket(username)
+            user_wait = user_bucket.wait_time(now)
+            if user_wait > 0:
+                return False, int(user_wait) + 1, "Please wait before uploading another file."
+
+            global_wait = self._global_bucket.wait_time(now)
+            if global_wait > 0:
+                return False, int(global_wait) + 1, "The service is handling a burst of uploads."
+
+            user_bucket.consume()
+            self._global_bucket.consume()
+            if hold_slot:
+                self._in_flight += 1
+            self._dirty.update((username, GLOBAL_BUCKET_KEY))
+            return True, 0, None
+
+    def acquire_slot(self):
+        """
+        Wait for a free in-flight slot and take it, without charging the buckets.
+        For work inside an upload that was already admitted, e.g. each document of a batch.
+        """
+        with self._slot_free:
+            while self._in_flight >= self.max_in_flight:
+                self._slot_free.wait()
+            self._in_flight += 1
+
+    def release(self):
+        """Free the in-flight slot taken by an admitted job"""
+        with self._slot_free:
+            self._in_flight = max(0, self._in_flight - 1)
+            self._slot_free.notify()
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def persist(self):
+        """Write changed bucket levels to SQLite"""
+        with self._lock:
+            # A bucket that has refilled completely is the same as a new one, so drop it from memory
+            now = time.time()
+            for username in [u for u, b in self._user_buckets.items() if u not in self._dirty
+                             and b.wait_time(now, self.user_capacity) == 0]:
+                del self._user_buckets[username]
+            if not self._dirty:
+                return
+            rows = []
+            for bucket_key in self._dirty:
+                bucket = self._global_bucket if bucket_key == GLOBAL_BUCKET_KEY else self._user_buckets[bucket_key]
+                rows.append((bucket_key, bucket.tokens, bucket.updated_at))
+            self._dirty.clear()
+        try:
+            with self.pool.connection() as conn:
+                conn.executemany(
+                    'INSERT OR REPLACE INTO rate_limit_buckets (bucket_key, tokens, updated_at) VALUES (?, ?, ?)',
+                    rows
+                )
+        except sqlite3.Error:
+            with self._lock:
+                self._dirty.update(row[0] for row in rows)  # Retry on the next tick
+
+    def _persist_loop(self):
+        while not self._stop.wait(self.persist_interval):
+            self.persist()
+
+    def close(self):
+        self._stop.set()
+        self.persist()
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """Return the process-wide rate limiter, creating it on first use"""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = RateLimiter()
+    return _limiter
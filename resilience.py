@@ -0,0 +1,252 @@
+# resilience.py
+# Retries, hedged requests and circuit breakers for Writer API calls, with per-stage latency percentiles.
+# Nothing in here touches Streamlit widgets, so it is safe to run on worker threads.
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import writerai
+
+# Constants
+RETRY_BASE_SECONDS = 1.0
+RETRY_MAX_SECONDS = 20.0
+RETRY_AFTER_MAX_SECONDS = 60.0  # Longest server-requested Retry-After that is honoured
+LATENCY_WINDOW = 500  # Successful calls kept per stage for the percentiles
+HEDGE_MIN_SAMPLES = 20  # No hedging until the stage's p95 is known
+HEDGE_MIN_DELAY_SECONDS = 1.0
+HEDGE_WORKERS = 16
+CIRCUIT_FAILURE_THRESHOLD = 5  # Consecutive transient failures that open a stage's circuit
+CIRCUIT_RESET_SECONDS = 30.0  # Time an open circuit fast-fails before letting one probe call through
+RETRYABLE_STATUS_CODES = {408, 409, 429}  # Plus every 5xx
+
+# Attempts and hedging per stage. Only parse is hedged: it re-reads a file that is already uploaded.
+# Uploads would store the file twice, and a duplicate completion is a second paid call that the
+# rate limiter never counted. Streams are not hedged either, the caller is already rendering the first one.
+STAGE_POLICIES = {
+    'upload': {'max_attempts': 3, 'hedge': False},
+    'parse': {'max_attempts': 3, 'hedge': True},
+    'completion': {'max_attempts': 3, 'hedge': False},
+    'completion_stream': {'max_attempts': 2, 'hedge': False},
+}
+DEFAULT_POLICY = {'max_attempts': 3, 'hedge': False}
+
+
+class WriterCallError(Exception):
+    """A Writer API call that failed after the resilience layer gave up"""
+    retryable = True
+
+    def __init__(self, stage, message):
+        super().__init__(message)
+        self.stage = stage
+
+
+class TransientWriterError(WriterCallError):
+    """Timeouts, connection errors, 408/409/429 and 5xx that outlasted every attempt"""
+
+
+class PermanentWriterError(WriterCallError):
+    """Rejected requests (bad input, auth, not found) that no retry can fix"""
+    retryable = False
+
+
+class CircuitOpenError(TransientWriterError):
+    """The stage's circuit is open, so the call was not attempted"""
+
+
+def is_transient(error):
+    if isinstance(error, writerai.APIConnectionError):  # Includes APITimeoutError
+        return True
+    if isinstance(error, writerai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES or error.status_code >= 500
+    return False
+
+
+def retry_delay(attempt, error=None):
+    """Full-jitter exponential backoff; a 429/503 Retry-After header is used when the server sends one"""
+    response = getattr(error, 'response', None)
+    retry_after = response.headers.get('retry-after') if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), RETRY_AFTER_MAX_SECONDS)
+        except ValueError:
+            pass
+    return random.uniform(0, min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** attempt))
+
+
+class LatencyTracker:
+    """Latency of recent successful calls per stage"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.window = window
+        self._samples = {}
+        self._counters = {}  # stage -> {'calls', 'retries', 'hedges', 'failures'}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self._samples.setdefault(stage, deque(maxlen=self.window)).append(seconds)
+
+    def count(self, stage, counter):
+        with self._lock:
+            counters = self._counters.setdefault(stage, {'calls': 0, 'retries': 0, 'hedges': 0, 'failures': 0})
+            counters[counter] += 1
+
+    def percentile(self, stage, q):
+        """q-th percentile (0-100) of the stage's recent latencies, or None with too few samples"""
+        with self._lock:
+            samples = sorted(self._samples.get(stage, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * q / 100))]
+
+    def summary(self):
+        """p50/p95/p99 and counters per stage, as rows for st.dataframe"""
+        with self._lock:
+            stages = sorted(set(self._samples) | set(self._counters))
+            rows = []
+            for stage in stages:
+                samples = sorted(self._samples.get(stage, ()))
+                row = {'stage': stage, 'samples': len(samples)}
+                for q in (50, 95, 99):
+                    row[f'p{q}'] = samples[min(len(samples) - 1, int(len(samples) * q / 100))] if samples else None
+                row.update(self._counters.get(stage, {}))
+                rows.append(row)
+        return rows
+
+
+class CircuitBreaker:
+    """
+    closed: calls go through; CIRCUIT_FAILURE_THRESHOLD consecutive transient failures open it.
+    open: calls fail fast until CIRCUIT_RESET_SECONDS have passed.
+    half_open: one probe call goes through; success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_seconds=CIRCUIT_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = 'half_open'
+                self._probing = False
+            if self.state == 'closed':
+                return True
+            if self.state == 'half_open' and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self._probing = False
+
+    def cancel_probe(self):
+        """Free the half-open probe slot after a call that failed for reasons unrelated to the backend"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+                self._probing = False
+
+
+_latency = LatencyTracker()
+_breakers = {}
+_breakers_lock = threading.Lock()
+_hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix='writer-hedge')
+
+
+def get_breaker(stage):
+    with _breakers_lock:
+        if stage not in _breakers:
+            _breakers[stage] = CircuitBreaker()
+        return _breakers[stage]
+
+
+def _timed(fn):
+    """Run fn and return (result, seconds), timed from when it actually starts rather than when it was queued"""
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def _hedged(stage, fn, delay):
+    """Run fn; if it has not finished after delay seconds, start a duplicate and keep whichever succeeds first"""
+    first = _hedge_executor.submit(fn)
+    done, _ = wait([first], timeout=delay)
+    if done:
+        return first.result()
+    _latency.count(stage, 'hedges')
+    pending = {first, _hedge_executor.submit(fn)}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                # The slower call keeps running in the background; its result is dropped
+                return future.result()
+            error = future.exception()
+    raise error
+
+
+def call_writer(stage, fn, policy=None):
+    """
+    Call fn() for a Writer API stage ('upload', 'parse', 'completion', ...) with retries,
+    optional hedging and the stage's circuit breaker. Returns fn's result or raises a WriterCallError;
+    exceptions that are not Writer API errors are raised unchanged.
+    """
+    policy = policy or STAGE_POLICIES.get(stage, DEFAULT_POLICY)
+    breaker = get_breaker(stage)
+    _latency.count(stage, 'calls')
+    for attempt in range(policy['max_attempts']):
+        if not breaker.allow():
+            _latency.count(stage, 'failures')
+            raise CircuitOpenError(stage, f"Writer API {stage} is unavailable, try again in a minute.")
+        hedge_delay = None
+        if policy['hedge'] and breaker.state == 'closed':
+            p95 = _latency.percentile(stage, 95)
+            hedge_delay = max(p95, HEDGE_MIN_DELAY_SECONDS) if p95 is not None else None
+
+        try:
+            result, seconds = _hedged(stage, lambda: _timed(fn), hedge_delay) if hedge_delay else _timed(fn)
+        except writerai.APIError as e:
+            if not is_transient(e):
+                breaker.record_success()  # The backend answered, it just rejected the request
+                _latency.count(stage, 'failures')
+                raise PermanentWriterError(stage, f"Writer API rejected the {stage} request: {e}") from e
+            breaker.record_failure()
+            if attempt + 1 == policy['max_attempts']:
+                _latency.count(stage, 'failures')
+                raise TransientWriterError(stage, f"Writer API {stage} failed after {attempt + 1} attempts: {e}") from e
+            _latency.count(stage, 'retries')
+            time.sleep(retry_delay(attempt, e))
+            continue
+        except Exception:
+            breaker.cancel_probe()
+            raise
+        _latency.record(stage, seconds)
+        breaker.record_success()
+        return result
+
+
+def latency_summary():
+    """Per-stage latency percentiles and retry/hedge/failure counters for this process"""
+    return _latency.summary()
+
+
+def breaker_states():
+    with _breakers_lock:
+        return {stage: breaker.state for stage, breaker in _breakers.items()}
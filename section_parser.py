@@ -0,0 +1,94 @@
+# section_parser.py
+# Single-pass parser for the '[Section] [results] ... [raw extracted] ... [Section]' completion markup
+import re
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def _tag_pattern(section_names):
+    """One compiled alternation matching every tag we care about"""
+    names = sorted(section_names, key=len, reverse=True)
+    alternatives = ['results', 'raw extracted'] + [re.escape(name) for name in names]
+    return re.compile(r'\[(' + '|'.join(alternatives) + r')\]')
+
+
+def _at_line_start(text, pos):
+    """True if only spaces or tabs come between the previous newline (or the start) and pos"""
+    line_start = text.rfind('\n', 0, pos) + 1
+    return not text[line_start:pos].strip(' \t')
+
+
+class StreamingSectionParser:
+    """
+    Incremental section parser.
+    Feed completion text as it arrives; a section is reported as soon as its closing tag is seen.
+    Section tags count only at the start of a line, so bracketed names quoted inside raw text
+    (e.g. "[Renewal]" in a termination clause) stay part of that text.
+    """
+
+    def __init__(self, section_names):
+        section_names = tuple(section_names)
+        self.pattern = _tag_pattern(section_names)
+        # A tag split across two chunks can start at most this far before the end of the buffer
+        self.max_tag_length = max([len('raw extracted')] + [len(name) for name in section_names]) + 2
+        self.text = ""
+        self.sections = {}
+        self._scan_pos = 0
+        self._current = None  # Section currently open
+        self._results_start = None
+        self._results_end = None
+        self._raw_start = None
+
+    def _reset_block(self, current=None):
+        self._current = current
+        self._results_start = self._results_end = self._raw_start = None
+
+    def feed(self, chunk):
+        """
+        Append text and advance the scan.
+        Returns: list of section names completed by this chunk
+        """
+        completed = []
+        if not chunk:
+            return completed
+
+        self.text += chunk
+        text = self.text
+        for match in self.pattern.finditer(text, self._scan_pos):
+            tag = match.group(1)
+            if tag == 'results':
+                if self._current is not None and self._results_start is None:
+                    self._results_start = match.end()
+            elif tag == 'raw extracted':
+                if self._current is not None and self._results_start is not None and self._raw_start is None:
+                    self._results_end = match.start()
+                    self._raw_start = match.end()
+            elif not _at_line_start(text, match.start()):
+                pass  # A bracketed name inside the text, not a section tag
+            elif tag == self._current and self._raw_start is not None:
+                # Closing tag: the block is complete
+                if tag not in self.sections:
+                    self.sections[tag] = {
+                        'results': text[self._results_start:self._results_end].strip(),
+                        'raw': text[self._raw_start:match.start()].strip()
+                    }
+                    completed.append(tag)
+                self._reset_block()
+            else:
+                # Opening tag (or a new section starting before the last one closed)
+                self._reset_block(current=tag)
+            self._scan_pos = match.end()
+
+        # Only rescan the tail that could hold the start of a partial tag
+        self._scan_pos = max(self._scan_pos, len(text) - self.max_tag_length)
+        return completed
+
+
+def parse_sections(text, section_names):
+    """
+    Parse every section block in one linear scan over the text.
+    Returns: dict of section name -> {'results': str, 'raw': str}; missing sections are absent
+    """
+    parser = StreamingSectionParser(section_names)
+    parser.feed(text)
+    return parser.sections
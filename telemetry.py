@@ -0,0 +1,349 @@
+# telemetry.py
+# Monotonic-clock spans for the extraction pipeline, stored in SQLite and exported as Prometheus text.
+# Nothing in here touches Streamlit widgets, so it is safe to run on worker threads and job workers.
+import atexit
+import bisect
+import contextvars
+import itertools
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from db import bootstrap_once, get_pool
+
+# Constants
+TELEMETRY_DB_PATH = 'userdata.db'
+SPAN_RETENTION_DAYS = 30
+SPAN_PRUNE_SECONDS = 3600  # How often each process deletes spans older than SPAN_RETENTION_DAYS
+# Share of traces whose spans are stored, per trace name (default 1). Render traces run on every rerun,
+# so only a sample is stored; failed traces and the in-memory metrics always cover every trace.
+TRACE_SAMPLE_RATES = {'render': 0.05}
+METRICS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'metrics')
+METRICS_EXPORT_SECONDS = 15
+LATENCY_BUCKETS = (0.005, 0.025, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+# Upper bound in bytes and label of each file size bucket
+SIZE_BUCKETS = [(100 * 1024, '<100 KB'), (1024 * 1024, '100 KB-1 MB'), (5 * 1024 * 1024, '1-5 MB'),
+                (float('inf'), '>5 MB')]
+
+INSERT_SPAN_SQL = '''
+    INSERT INTO pipeline_spans
+    (trace_id, span_id, parent_id, name, start_epoch, duration_ms, status,
+    request_type, size_bucket, attributes)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+PRUNE_SPANS_SQL = 'DELETE FROM pipeline_spans WHERE start_epoch < ?'
+SPANS_SINCE_SQL = '''
+    SELECT trace_id, span_id, parent_id, name, start_epoch, duration_ms, status,
+    request_type, size_bucket, attributes
+    FROM pipeline_spans
+    WHERE start_epoch >= ?
+    ORDER BY start_epoch
+'''
+
+_current_trace = contextvars.ContextVar('current_trace', default=None)
+_current_span = contextvars.ContextVar('current_span', default=None)  # (trace, span) of the innermost open span
+
+
+def size_bucket(num_bytes):
+    if num_bytes is None:
+        return 'unknown'
+    for upper, label in SIZE_BUCKETS:
+        if num_bytes < upper:
+            return label
+
+
+class Span:
+    def __init__(self, name, span_id, parent_id, attributes):
+        self.name = name
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.status = 'ok'
+        self.start_epoch = time.time()
+        self.start = time.perf_counter()
+        self.duration = None
+
+    def set(self, **attributes):
+        """Attach attributes known only once the step has run, such as bytes or token counts"""
+        self.attributes.update(attributes)
+
+
+class Trace:
+    """
+    One document's trip through the pipeline. Spans nest through a context variable, so steps run
+    on worker threads with a copied context (contextvars.copy_context) record the correct parent;
+    threads without one attach to the root. Started with start_trace and closed with finish(),
+    or used as a context manager.
+    """
+
+    def __init__(self, name, request_type=None, file_size=None, **attributes):
+        self.trace_id = uuid.uuid4().hex
+        self.sampled = random.random() < TRACE_SAMPLE_RATES.get(name, 1.0)
+        self.request_type = request_type
+        self.size_bucket = size_bucket(file_size)
+        self.spans = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.root = Span(name, 0, None, dict(attributes, bytes=file_size) if file_size is not None else attributes)
+        self._token = None
+        self.finished = False
+
+    @contextmanager
+    def span(self, name, **attributes):
+        current = _current_span.get()
+        parent = current[1] if current is not None and current[0] is self else self.root
+        span = Span(name, next(self._ids), parent.span_id, attributes)
+        token = _current_span.set((self, span))
+        try:
+            yield span
+        except BaseException:
+            span.status = 'error'
+            raise
+        finally:
+            span.duration = time.perf_counter() - span.start
+            _current_span.reset(token)
+            with self._lock:
+                self.spans.append(span)
+            get_metrics().observe(span, self.request_type, self.size_bucket)
+
+    def set_error(self, message):
+        """Mark the trace failed without an exception, for steps that report errors as values"""
+        self.root.status = 'error'
+        self.root.attributes['error'] = message
+
+    def elapsed(self):
+        """Seconds since the trace started, on the monotonic clock"""
+        return time.perf_counter() - self.root.start
+
+    def finish(self, status=None):
+        """Close the root span and store every span; returns the total duration in seconds"""
+        if self.finished:
+            return self.root.duration
+        self.finished = True
+        self.root.duration = self.elapsed()
+        if self._token is not None:
+            _current_trace.reset(self._token)
+        if status:
+            self.root.status = status
+        get_metrics().observe(self.root, self.request_type, self.size_bucket)
+        if not self.sampled and self.root.status != 'error':
+            return self.root.duration
+        try:
+            get_span_store().record(self)
+        except sqlite3.Error:
+            pass  # Telemetry must never fail the extraction
+        return self.root.duration
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.finish('error' if exc_type else None)
+        return False
+
+
+def start_trace(name, request_type=None, file_size=None, **attributes):
+    """Start a trace and make it the current one, so span() calls deeper in the stack attach to it"""
+    trace = Trace(name, request_type, file_size, **attributes)
+    trace._token = _current_trace.set(trace)
+    return trace
+
+
+@contextmanager
+def span(name, **attributes):
+    """Span on the trace active in this context; a no-op Span outside any trace"""
+    trace = _current_trace.get()
+    if trace is None:
+        detached = Span(name, None, None, attributes)
+        try:
+            yield detached
+        finally:
+            detached.duration = time.perf_counter() - detached.start
+        return
+    with trace.span(name, **attributes) as active:
+        yield active
+
+
+class SpanStore:
+    """Finished spans from every process (Streamlit and job workers), kept for SPAN_RETENTION_DAYS"""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or TELEMETRY_DB_PATH
+        self.pool = get_pool(self.db_path)
+        bootstrap_once(self.db_path, self._create_table)
+
+    @staticmethod
+    def _create_table(conn):
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS pipeline_spans (
+                trace_id TEXT NOT NULL,
+                span_id INTEGER NOT NULL,
+                parent_id INTEGER,
+                name TEXT NOT NULL,
+                start_epoch REAL NOT NULL,
+                duration_ms REAL NOT NULL,
+                status TEXT NOT NULL,
+                request_type TEXT,
+                size_bucket TEXT,
+                attributes TEXT,
+                PRIMARY KEY (trace_id, span_id)
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_pipeline_spans_start ON pipeline_spans (start_epoch)')
+        conn.execute(PRUNE_SPANS_SQL, (time.time() - SPAN_RETENTION_DAYS * 86400,))
+
+    def prune(self):
+        """Delete spans older than SPAN_RETENTION_DAYS"""
+        with self.pool.connection() as conn:
+            conn.execute(PRUNE_SPANS_SQL, (time.time() - SPAN_RETENTION_DAYS * 86400,))
+
+    def record(self, trace):
+        rows = [
+            (trace.trace_id, span.span_id, span.parent_id, span.name, span.start_epoch,
+             span.duration * 1000, span.status, trace.request_type, trace.size_bucket,
+             json.dumps(span.attributes, default=str))
+            for span in [trace.root] + trace.spans
+        ]
+        with self.pool.connection() as conn:
+            conn.executemany(INSERT_SPAN_SQL, rows)
+
+    def spans_since(self, since_epoch):
+        """Spans started at or after since_epoch, as dicts with attributes decoded"""
+        with self.pool.connection() as conn:
+            cursor = conn.execute(SPANS_SINCE_SQL, (since_epoch,))
+            columns = [column[0] for column in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        for row in rows:
+            row['attributes'] = json.loads(row['attributes']) if row['attributes'] else {}
+        return rows
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class PipelineMetrics:
+    """In-process stage latency histograms and byte/token counters, rendered as Prometheus text"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._histograms = {}  # (stage, request_type, size_bucket, status) -> [bucket counts..., +Inf], sum
+        self._counters = {}  # (metric, stage, request_type) -> value
+        self._lock = threading.Lock()
+
+    def observe(self, span, request_type, size_label):
+        key = (span.name, request_type or 'unknown', size_label, span.status)
+        with self._lock:
+            counts, total = self._histograms.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, span.duration)] += 1
+            self._histograms[key] = (counts, total + span.duration)
+            for attribute in ('bytes', 'tokens'):
+                value = span.attributes.get(attribute)
+                if isinstance(value, (int, float)):
+                    counter = (attribute, span.name, request_type or 'unknown')
+                    self._counters[counter] = self._counters.get(counter, 0) + value
+
+    def render(self, extra_labels=None):
+        extra = ''.join(f',{name}="{_escape(value)}"' for name, value in (extra_labels or {}).items())
+        lines = [
+            '# HELP pipeline_stage_duration_seconds Time spent in each extraction pipeline stage',
+            '# TYPE pipeline_stage_duration_seconds histogram',
+        ]
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+        for (stage, request_type, size_label, status), (counts, total) in histograms:
+            labels = (f'stage="{_escape(stage)}",request_type="{_escape(request_type)}",'
+                      f'size_bucket="{_escape(size_label)}",status="{status}"{extra}')
+            cumulative = 0
+            for upper, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'pipeline_stage_duration_seconds_bucket{{{labels},le="{upper}"}} {cumulative}')
+            lines.append(f'pipeline_stage_duration_seconds_sum{{{labels}}} {total:.6f}')
+            lines.append(f'pipeline_stage_duration_seconds_count{{{labels}}} {cumulative}')
+        for metric in ('bytes', 'tokens'):
+            lines.append(f'# HELP pipeline_stage_{metric}_total {metric.capitalize()} handled per pipeline stage')
+            lines.append(f'# TYPE pipeline_stage_{metric}_total counter')
+            for (name, stage, request_type), value in counters:
+                if name == metric:
+                    lines.append(f'pipeline_stage_{metric}_total{{stage="{_escape(stage)}",'
+                                 f'request_type="{_escape(request_type)}"{extra}}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsFileExporter:
+    """
+    Writes this process's metrics to METRICS_DIR/pipeline-<pid>.prom every METRICS_EXPORT_SECONDS,
+    for the node_exporter textfile collector. Series carry a pid label so the Streamlit process
+    and each job worker export side by side; the file is removed when the process exits cleanly.
+    The same thread prunes expired spans every SPAN_PRUNE_SECONDS, off the request path.
+    """
+
+    def __init__(self, metrics, directory=None, interval=METRICS_EXPORT_SECONDS):
+        self.metrics = metrics
+        self.directory = directory or METRICS_DIR
+        self.interval = interval
+        self.path = os.path.join(self.directory, f'pipeline-{os.getpid()}.prom')
+        self._last_prune = time.monotonic()  # The span table is pruned when it is created
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._export_loop, name='metrics-exporter', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def export(self):
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = f'{self.path}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(self.metrics.render({'pid': os.getpid()}))
+        os.replace(temp_path, self.path)  # The collector never sees a half-written file
+
+    def _export_loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.export()
+            except OSError:
+                pass
+            if time.monotonic() - self._last_prune >= SPAN_PRUNE_SECONDS:
+                self._last_prune = time.monotonic()
+                try:
+                    get_span_store().prune()
+                except sqlite3.Error:
+                    pass
+
+    def close(self):
+        self._stop.set()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+_metrics = None
+_exporter = None
+_span_store = None
+_telemetry_lock = threading.Lock()
+
+
+def get_metrics():
+    """Process-wide metrics registry; starts the metrics file exporter on first use"""
+    global _metrics, _exporter
+    if _metrics is None:
+        with _telemetry_lock:
+            if _metrics is None:
+                metrics = PipelineMetrics()
+                _exporter = MetricsFileExporter(metrics)
+                _metrics = metrics
+    return _metrics
+
+
+def get_span_store():
+    global _span_store
+    if _span_store is None:
+        with _telemetry_lock:
+            if _span_store is None:
+                _span_store = SpanStore()
+    return _span_store
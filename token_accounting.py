@@ -0,0 +1,131 @@
+# token_accounting.py
+# Token counts for documents and prompts, output budgets for Writer completions and cost estimates.
+# Counts come from a local BPE tokenizer whose vocabulary is downloaded once and cached next to the app.
+# Without the tokenizer, counts fall back to a pre-tokenizer estimate and are reported as inexact.
+import functools
+import math
+import os
+import re
+import threading
+
+# tiktoken reads its cache location when the encoding is loaded, so set it before any load
+TOKENIZER_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'tiktoken')
+os.environ.setdefault('TIKTOKEN_CACHE_DIR', TOKENIZER_CACHE_DIR)
+
+try:
+    import tiktoken
+except ImportError:  # Optional dependency; without it token counts are estimates
+    tiktoken = None
+
+# Constants
+# Writer does not publish the Palmyra tokenizer; o200k_base is a close public BPE
+# (multilingual, digits split in threes), and EXACT_SAFETY_TOKENS covers the difference.
+TOKENIZER_ENCODING = 'o200k_base'
+MODEL_CONTEXT_TOKENS = {'palmyra-x-004': 128000}
+DEFAULT_CONTEXT_TOKENS = 128000
+MAX_OUTPUT_TOKENS = 50000  # Upper bound for one completion's answer
+MIN_OUTPUT_TOKENS = 4096  # Less room than this and the document has to be chunked
+MAX_DOCUMENT_TOKENS = 500000  # Longest document accepted at all; longer ones than the context are chunked
+EXACT_SAFETY_TOKENS = 512  # Difference between o200k_base and the model's own tokenizer
+ESTIMATE_SAFETY_RATIO = 0.15  # Estimated counts get a wider margin
+COUNT_CACHE_SIZE = 32  # Documents whose counts are kept; the statistics panel recounts on every rerun
+# Writer list price in USD per million tokens; update when the contract changes
+MODEL_PRICES = {'palmyra-x-004': {'input': 5.00, 'output': 12.00}}
+
+# Pieces the estimate counts separately; mirrors how BPE vocabularies split text
+CJK_RANGES = '\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff'
+CJK_PATTERN = re.compile(f'[{CJK_RANGES}]')
+WORD_PATTERN = re.compile(f'[^\\W\\d_{CJK_RANGES}]+')  # Letter runs in alphabetic scripts, accented or not
+DIGIT_PATTERN = re.compile(r'\d+')
+SYMBOL_PATTERN = re.compile(r'[^\w\s]+')  # Punctuation and markdown table/heading markup
+NEWLINE_PATTERN = re.compile(r'\n+')
+
+_encoding = None
+_encoding_error = None
+_encoding_lock = threading.Lock()
+
+
+def get_encoding():
+    """The BPE encoding, loaded once per process; None when tiktoken or its vocabulary is unavailable"""
+    global _encoding, _encoding_error
+    if _encoding is None and _encoding_error is None and tiktoken is not None:
+        with _encoding_lock:
+            if _encoding is None and _encoding_error is None:
+                try:
+                    _encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+                except Exception as e:  # Vocabulary not cached and no network
+                    _encoding_error = e
+    return _encoding
+
+
+def is_exact():
+    """True when counts come from the BPE tokenizer rather than the estimate"""
+    return get_encoding() is not None
+
+
+def tokenizer_name():
+    return TOKENIZER_ENCODING if is_exact() else 'estimate'
+
+
+def estimate_tokens(text):
+    """
+    Token count without a vocabulary, erring high so budgets stay safe. English words are mostly
+    one token each, longer ones split every ~6 letters; accented and non-Latin words every ~5;
+    Chinese, Japanese and Korean characters are a token each; digits go in groups of three;
+    markup runs such as '|---|' cost one token per 2 characters; spaces merge into the next
+    word, newline runs are one token each.
+    """
+    tokens = sum((len(word) + 5) // 6 if word.isascii() else (len(word) + 4) // 5
+                 for word in WORD_PATTERN.findall(text))
+    tokens += len(CJK_PATTERN.findall(text))
+    tokens += sum((len(digits) + 2) // 3 for digits in DIGIT_PATTERN.findall(text))
+    tokens += sum((len(symbols) + 1) // 2 for symbols in SYMBOL_PATTERN.findall(text))
+    tokens += len(NEWLINE_PATTERN.findall(text))
+    return tokens
+
+
+@functools.lru_cache(maxsize=COUNT_CACHE_SIZE)
+def count_tokens(text):
+    """Number of tokens in text; exact with the BPE tokenizer, otherwise estimated"""
+    if not text:
+        return 0
+    encoding = get_encoding()
+    if encoding is None:
+        return estimate_tokens(text)
+    # Contracts may quote strings like '<|endoftext|>'; they are text here, not control tokens
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def chars_per_token(text):
+    """Characters per token of this document, for turning token targets into character lengths"""
+    tokens = count_tokens(text)
+    return len(text) / tokens if tokens else 4.0
+
+
+def estimate_cost(input_tokens, output_tokens, model):
+    """Estimated USD cost of a completion, or None when the model has no price on file"""
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        return None
+    return (input_tokens * prices['input'] + output_tokens * prices['output']) / 1_000_000
+
+
+def plan_completion(prompt, document, model):
+    """
+    Token budget for a completion over prompt + document: how many tokens the input takes,
+    how many are left for the answer, and whether a single completion fits at all.
+    """
+    # Counted separately so the document's count is shared with admission, chunking and logging
+    input_tokens = count_tokens(prompt) + count_tokens(document)
+    exact = is_exact()
+    margin = EXACT_SAFETY_TOKENS if exact else math.ceil(input_tokens * ESTIMATE_SAFETY_RATIO)
+    context = MODEL_CONTEXT_TOKENS.get(model, DEFAULT_CONTEXT_TOKENS)
+    available = context - input_tokens - margin
+    max_output_tokens = max(0, min(MAX_OUTPUT_TOKENS, available))
+    return {
+        'input_tokens': input_tokens,
+        'max_output_tokens': max_output_tokens,
+        'fits': max_output_tokens >= MIN_OUTPUT_TOKENS,
+        'exact': exact,
+        'max_cost': estimate_cost(input_tokens, max_output_tokens, model),
+    }
@@ -0,0 +1,31 @@
+# userlogs.py
+# Rows of the userlogs table. No Streamlit import, so job worker processes can log the uploads they finish.
+from datetime import datetime, timezone
+
+# Constants
+USERLOGS_DB_PATH = 'userdata.db'
+
+
+# Statements used on every rerun are kept as constants so each pooled connection reuses its prepared copy
+INSERT_USERLOG_SQL = '''
+    INSERT INTO userlogs 
+    (username, filename, filesize, token_count, document_length, 
+    upload_time, parse_time, extract_time, total_process_time, 
+    upload_timestamp, request_type, cache_hits, cache_misses, first_result_time,
+    upload_epoch)  -- Add request_type to the query
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+def insert_userlog(pool, username, filename, filesize, token_count, document_length,
+                   upload_time=None, parse_time=None, extract_time=None, total_process_time=None,
+                   request_type=None, cache_hits=0, cache_misses=0, first_result_time=None):
+    """Log one processed file, stamped with the current UTC time (raises sqlite3.Error)"""
+    current_time = datetime.now(timezone.utc)
+    with pool.connection() as conn:
+        conn.execute(INSERT_USERLOG_SQL, (
+            username, filename, filesize, token_count, document_length,
+            upload_time, parse_time, extract_time, total_process_time,
+            current_time.strftime('%Y-%m-%d %H:%M:%S %z'), request_type, cache_hits, cache_misses,
+            first_result_time, int(current_time.timestamp())
+        ))
@@ -0,0 +1,249 @@
+# writer_extraction.py
+# Writer upload, parse and completion calls, and the background extraction job built on them.
+# Nothing in here imports Streamlit, so job worker processes load this module instead of the page.
+import io
+import os
+import sqlite3
+import tempfile
+import httpx
+import pypandoc  # For .doc files (requires pandoc to be installed)
+import writerai
+from docx2python import docx2python
+from batch_pipeline import BatchPipeline
+from clients import get_writer_client
+from db import get_pool
+from extraction_prompts import (
+    REVIEW_PROMPT, REVIEW_SECTION_NAMES, UPLOAD_PROMPT, UPLOAD_SECTION_NAMES, WRITER_MODEL_NAME, build_prompt
+)
+from job_queue import PermanentJobError
+from local_pdf_parser import extract_pdf_markdown
+from resilience import PermanentWriterError, TransientWriterError, call_writer
+from section_parser import StreamingSectionParser
+from telemetry import span
+from token_accounting import plan_completion
+from userlogs import USERLOGS_DB_PATH, insert_userlog
+
+# Constants
+UPLOAD_CONNECT_TIMEOUT = 5
+UPLOAD_TIMEOUT_BASE = 20  # Seconds allowed for any upload, plus the size-based share below
+UPLOAD_MIN_BYTES_PER_SECOND = 64 * 1024  # Slowest link an upload should still finish on
+
+
+class FileProcessor:
+    def __init__(self, writer_client):
+        self.writer_client = writer_client
+
+    def upload_file_to_writer(self, uploaded_file):
+        return self.upload_bytes_to_writer(uploaded_file.read(), uploaded_file.name)
+
+    def upload_bytes_to_writer(self, raw_bytes, file_name):
+        """Upload raw file bytes to Writer and return the file id (raises ValueError or WriterCallError)"""
+        if not raw_bytes:
+            raise ValueError("The uploaded file is empty.")
+
+        if not file_name:
+            raise ValueError("The uploaded file has no name.")
+
+        # Check file size
+        file_size = len(raw_bytes)
+        if file_size > 10 * 1024 * 1024:  # 10 MB limit
+            raise ValueError("File size exceeds the maximum allowed limit (10 MB).")
+
+        content_disposition = f'attachment; filename="{file_name}"'
+        content_type = "application/pdf" if file_name.endswith(".pdf") else "application/msword"
+
+        # Timeout grows with the file, so large scans on slow links are not cut off at a fixed limit
+        timeout = httpx.Timeout(UPLOAD_TIMEOUT_BASE + file_size / UPLOAD_MIN_BYTES_PER_SECOND,
+                                connect=UPLOAD_CONNECT_TIMEOUT)
+        file_response = call_writer('upload', lambda: self.writer_client.files.upload(
+            content=raw_bytes,
+            content_disposition=content_disposition,
+            content_type=content_type,
+            timeout=timeout
+        ))
+        return file_response.id
+
+    def parse_file_with_writer(self, file_id, file_type):
+        """Parse an uploaded file to markdown (raises WriterCallError)"""
+        if file_type == "pdf":
+            parse = self.writer_client.tools.parse_pdf
+        else:
+            # For .doc and .docx files, we first extract the text and then send it to the Writer API
+            parse = self.writer_client.tools.parse_text
+        response = call_writer('parse', lambda: parse(file_id=file_id, format="markdown"))
+        return response.content
+    @staticmethod
+    def is_file_locked(file_path):
+        """
+        Check if a file is open or locked by another process.
+        """
+        try:
+            # Attempt to open the file in exclusive mode
+            with open(file_path, "a", encoding="utf-8") as f:
+                pass
+            return False  # File is not locked
+        except (IOError, PermissionError):
+            return True  # File is locked
+    @staticmethod
+    def extract_text_from_pdf_locally(raw_bytes):
+        """
+        Read a text-layer PDF without calling Writer.
+        Returns None for scanned/empty PDFs, which must go through upload + parse_pdf.
+        """
+        return extract_pdf_markdown(raw_bytes)
+
+    @staticmethod
+    def extract_text_from_word_file(uploaded_file):
+        return FileProcessor.extract_text_from_word_bytes(uploaded_file.getvalue(), uploaded_file.name)
+
+    @staticmethod
+    def extract_text_from_word_bytes(raw_bytes, file_name):
+        """Extract text from .docx/.doc bytes; safe to call from several threads at once"""
+        try:
+            if file_name.endswith(".docx"):
+                # Use docx2python to extract text straight from memory
+                document = docx2python(io.BytesIO(raw_bytes))
+                full_text = document.text  # Extract all text
+                return full_text
+            elif file_name.endswith(".doc"):
+                # Use pypandoc for .doc files, via a per-call temp file
+                with tempfile.NamedTemporaryFile(suffix=".doc", delete=False) as f:
+                    f.write(raw_bytes)
+                try:
+                    text = pypandoc.convert_file(f.name, "plain")
+                finally:
+                    os.remove(f.name)
+                return text
+            else:
+                raise ValueError("Unsupported file format")
+        except Exception as e:
+            return f"Error extracting text from Word file: {e}"
+
+
+def extract_info_gemini_vision_review(parsed_text, writer_completion_client):
+    """Single completion for the whole document (raises WriterCallError)"""
+    with span('prompt_build') as prompt_span:
+        prompt = build_prompt(REVIEW_PROMPT, parsed_text)
+        plan = plan_completion(REVIEW_PROMPT, parsed_text, WRITER_MODEL_NAME)
+        prompt_span.set(chars=len(prompt), tokens=plan['input_tokens'])
+    if not plan['fits']:
+        raise PermanentWriterError('completion', f"{plan['input_tokens']:,} tokens leave no room for the answer")
+    with span('completion', tokens=plan['input_tokens']) as completion_span:
+        completion = call_writer('completion', lambda: writer_completion_client.create(
+            model=WRITER_MODEL_NAME,
+            prompt=prompt,
+            max_tokens=plan['max_output_tokens'],
+            temperature=0.0,
+            stream=False
+        ))
+        completion_span.set(output_chars=len(completion.choices[0].text or ''))
+    return completion.choices[0].text
+
+
+def extract_info_gemini_vision_upload(parsed_text, writer_completion_client):
+    """Single completion for the whole document (raises WriterCallError)"""
+    with span('prompt_build') as prompt_span:
+        prompt = build_prompt(UPLOAD_PROMPT, parsed_text)
+        plan = plan_completion(UPLOAD_PROMPT, parsed_text, WRITER_MODEL_NAME)
+        prompt_span.set(chars=len(prompt), tokens=plan['input_tokens'])
+    if not plan['fits']:
+        raise PermanentWriterError('completion', f"{plan['input_tokens']:,} tokens leave no room for the answer")
+    with span('completion', tokens=plan['input_tokens']) as completion_span:
+        completion = call_writer('completion', lambda: writer_completion_client.create(
+            model=WRITER_MODEL_NAME,
+            prompt=prompt,
+            max_tokens=plan['max_output_tokens'],
+            temperature=0.0,
+            stream=False
+        ))
+        completion_span.set(output_chars=len(completion.choices[0].text or ''))
+    return completion.choices[0].text
+
+
+def extract_info_streaming(parsed_text, writer_completion_client, request_type, on_section_complete):
+    """
+    Stream the completion and call on_section_complete(section_name, content)
+    as soon as each section's closing tag arrives. Returns the full completion text (raises WriterCallError).
+    """
+    if request_type == "Review":
+        prompt, section_names = REVIEW_PROMPT, REVIEW_SECTION_NAMES
+    else:
+        prompt, section_names = UPLOAD_PROMPT, UPLOAD_SECTION_NAMES
+
+    parser = StreamingSectionParser(section_names)
+    with span('prompt_build') as prompt_span:
+        full_prompt = build_prompt(prompt, parsed_text)
+        plan = plan_completion(prompt, parsed_text, WRITER_MODEL_NAME)
+        prompt_span.set(chars=len(full_prompt), tokens=plan['input_tokens'])
+    if not plan['fits']:
+        raise PermanentWriterError('completion_stream', f"{plan['input_tokens']:,} tokens leave no room for the answer")
+    with span('completion', tokens=plan['input_tokens'], streamed=True) as completion_span:
+        # Only opening the stream is retried; a stream that breaks midway raises TransientWriterError
+        stream = call_writer('completion_stream', lambda: writer_completion_client.create(
+            model=WRITER_MODEL_NAME,
+            prompt=full_prompt,
+            temperature=0.0,
+            stream=True,
+            max_tokens=plan['max_output_tokens']
+        ))
+        try:
+            for chunk in stream:
+                for section_name in parser.feed(chunk.value):
+                    on_section_complete(section_name, parser.sections[section_name])
+        except writerai.APIError as e:
+            raise TransientWriterError('completion_stream', f"Writer API stream broke off: {e}") from e
+        completion_span.set(output_chars=len(parser.text))
+    return parser.text
+
+
+def run_extraction_job(job, raw_bytes, report_stage):
+    """
+    Job handler, run in a worker process: the batch pipeline's upload -> parse -> extract
+    stages for one document. Failures raise, so the queue retries them with backoff, except those
+    the pipeline marks as not retryable (bad input, requests Writer rejected), which fail the job at once.
+    """
+    writer_client = get_writer_client()
+    request_type = job['request_type']
+    if request_type == "Review":
+        extract_fn = extract_info_gemini_vision_review
+        section_names = REVIEW_SECTION_NAMES
+    else:
+        extract_fn = extract_info_gemini_vision_upload
+        section_names = UPLOAD_SECTION_NAMES
+
+    pipeline = BatchPipeline(
+        FileProcessor(writer_client),
+        lambda text: extract_fn(text, writer_client.completions),
+        section_names,
+        request_type,
+        upload_concurrency=1,
+        parse_concurrency=1,
+        extract_concurrency=1
+    )
+    result = pipeline.process_document(job['file_name'], raw_bytes, on_stage=report_stage)
+    if result['status'] != 'done':
+        error = result['error'] or "Error during information extraction."
+        if not result['retryable']:
+            raise PermanentJobError(error)
+        raise RuntimeError(error)
+
+    if job['username']:
+        try:
+            insert_userlog(
+                get_pool(USERLOGS_DB_PATH),
+                username=job['username'],
+                filename=job['file_name'],
+                filesize=result['filesize'],
+                token_count=result['token_count'],
+                document_length=len(result['parsed_text']),
+                upload_time=result['upload_time'],
+                parse_time=result['parse_time'],
+                extract_time=result['extract_time'],
+                total_process_time=result['total_time'],
+                request_type=request_type,
+                cache_hits=int(result['cache_hit']),
+                cache_misses=int(not result['cache_hit'])
+            )
+        except sqlite3.Error:
+            pass  # The extraction itself succeeded; a missing history row is not worth a paid retry
+    return result